@@ -1,28 +1,50 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List
-import uuid
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from contextlib import asynccontextmanager
 import json
-from datetime import datetime
+from datetime import date, datetime
 import os
 
 # Import from parent directory
 import sys
 sys.path.append('..')
 
-from database import get_db, create_tables
+from database import get_async_db, create_tables, async_engine, AsyncSessionLocal
 from schemas import (
     ChatMessage, ChatResponse, Doctor, DoctorCreate, Patient, PatientCreate,
     Appointment, AppointmentCreate, DoctorAvailability, DoctorAvailabilityCreate
 )
-from services import DoctorService, PatientService, AppointmentService, ChatbotService
-from openai_service import OpenAIService
+from services import AsyncDoctorService, AsyncPatientService, AsyncAppointmentService, AsyncChatbotService, DataVersionService
+from openai_service import AsyncOpenAIService
+from chat_engine import ChatEngine
+from session_store import create_session_store, SessionBusyError
+from pagination import InvalidCursorError
+from schedule_index import schedule_index
+from config import PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT, DIRECTORY_CACHE_MAX_AGE
+from http_cache import cache_headers, not_modified
+from serialization import json_response, rows_to_dicts, objects_to_dicts
+from compression import CompressionMiddleware
 
 # Create tables
 create_tables()
 
-app = FastAPI(title="Doctor's Assistant Chatbot", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Initialize database with sample data
+    try:
+        from init_db import init_database
+        init_database()
+    except Exception as e:
+        print(f"Database initialization error: {e}")
+    yield
+    # Close pooled OpenAI and database connections
+    await openai_service.aclose()
+    await async_engine.dispose()
+
+app = FastAPI(title="Doctor's Assistant Chatbot", version="1.0.0", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -36,31 +58,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets browsers read the cursor of the next page
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+# br/gzip for large listings
+app.add_middleware(CompressionMiddleware)
 
-# Initialize OpenAI service
-openai_service = OpenAIService()
-
-# Store chat sessions (in production, use Redis or database)
-chat_sessions = {}
+# Initialize OpenAI service (async so slow completions don't block the event loop)
+openai_service = AsyncOpenAIService()
 
-@app.get("/")
-async def root():
-    return {"message": "Doctor's Assistant Chatbot API"}
+# Store chat sessions (bounded in memory, or SQLite when SESSION_STORE=sqlite)
+chat_sessions = create_session_store()
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat(message: ChatMessage, db: Session = Depends(get_db)):
-    """Main chat endpoint for the chatbot"""
-    try:
-        # Generate or get session ID
-        session_id = message.session_id or str(uuid.uuid4())
-        
-        # Initialize or get chat history
-        if session_id not in chat_sessions:
-            chat_sessions[session_id] = [
-                {
-                    "role": "system",
-                    "content": """You are a helpful assistant for Super Clinic. You help patients book appointments with doctors. 
+SYSTEM_PROMPT = """You are a helpful assistant for Super Clinic. You help patients book appointments with doctors. 
                     
                     You can:
                     - Check doctor availability
@@ -71,189 +81,147 @@ async def chat(message: ChatMessage, db: Session = Depends(get_db)):
                     Always be polite and helpful. When booking appointments, collect patient information like name and phone number.
                     
                     If a patient asks about symptoms, suggest appropriate specialists but note that you cannot provide medical advice."""
-                }
-            ]
-        
-        # Limit chat history to prevent token overflow
-        if len(chat_sessions[session_id]) > 20:
-            # Keep system message and last 18 messages
-            chat_sessions[session_id] = [chat_sessions[session_id][0]] + chat_sessions[session_id][-18:]
-        
-        # Add user message to history
-        chat_sessions[session_id].append({
-            "role": "user",
-            "content": message.message
-        })
-        
-        # Get response from OpenAI
-        chatbot_service = ChatbotService(db)
-        response = openai_service.get_chat_completion(chat_sessions[session_id])
-        
-        if not response["success"]:
-            # If OpenAI fails, provide a fallback response
-            fallback_response = "I apologize, but I'm experiencing some technical difficulties. Please try again in a moment, or contact our clinic directly for assistance."
-            chat_sessions[session_id].append({
-                "role": "assistant",
-                "content": fallback_response
-            })
-            return ChatResponse(
-                response=fallback_response,
-                session_id=session_id
-            )
-        
-        openai_message = response["response"]
-        
-        # Check if function was called
-        if openai_message.function_call:
-            try:
-                function_name = openai_message.function_call.name
-                function_args = json.loads(openai_message.function_call.arguments)
-                
-                # Process function call
-                function_result = chatbot_service.process_function_call(function_name, function_args)
-                
-                # Add function call and result to chat history
-                chat_sessions[session_id].append({
-                    "role": "assistant",
-                    "content": None,
-                    "function_call": {
-                        "name": function_name,
-                        "arguments": openai_message.function_call.arguments
-                    }
-                })
-                
-                chat_sessions[session_id].append({
-                    "role": "function",
-                    "name": function_name,
-                    "content": json.dumps(function_result)
-                })
-                
-                # Get final response
-                final_response = openai_service.get_simple_completion(chat_sessions[session_id])
-                
-                if final_response["success"]:
-                    chat_sessions[session_id].append({
-                        "role": "assistant",
-                        "content": final_response["response"]
-                    })
-                    
-                    return ChatResponse(
-                        response=final_response["response"],
-                        session_id=session_id,
-                        function_called=function_name,
-                        function_result=function_result
-                    )
-                else:
-                    # If final response fails, provide a fallback
-                    fallback_response = "I understand your request, but I'm having trouble processing it right now. Please try rephrasing your question or contact our clinic directly."
-                    chat_sessions[session_id].append({
-                        "role": "assistant",
-                        "content": fallback_response
-                    })
-                    return ChatResponse(
-                        response=fallback_response,
-                        session_id=session_id
-                    )
-            except Exception as e:
-                # If function calling fails, provide a fallback response
-                fallback_response = "I understand your request, but I'm having some technical difficulties. Please try again or contact our clinic directly for assistance."
-                chat_sessions[session_id].append({
-                    "role": "assistant",
-                    "content": fallback_response
-                })
-                return ChatResponse(
-                    response=fallback_response,
-                    session_id=session_id
-                )
-        else:
-            # Simple response without function calling
-            chat_sessions[session_id].append({
-                "role": "assistant",
-                "content": openai_message.content
-            })
-            
-            return ChatResponse(
-                response=openai_message.content,
-                session_id=session_id
-            )
-    
+
+chat_engine = ChatEngine(openai_service, chat_sessions, SYSTEM_PROMPT)
+
+@app.get("/")
+async def root():
+    return {"message": "Doctor's Assistant Chatbot API"}
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(message: ChatMessage, db: AsyncSession = Depends(get_async_db)):
+    """Main chat endpoint for the chatbot"""
+    try:
+        chatbot_service = AsyncChatbotService(db)
+        return await chat_engine.run_turn(message, chatbot_service)
+    except SessionBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat/stream")
+async def chat_stream(message: ChatMessage):
+    """Streaming chat endpoint that sends the reply as Server-Sent Events"""
+    async def event_stream():
+        # The response outlives the request dependencies, so own the session here
+        async with AsyncSessionLocal() as db:
+            try:
+                chatbot_service = AsyncChatbotService(db)
+                async for event in chat_engine.stream_turn(message, chatbot_service):
+                    yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+            except Exception as e:
+                yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def paginated(response: Response, page) -> Response:
+    """A page of rows as JSON; the next page's cursor goes in the X-Next-Cursor header"""
+    try:
+        rows, next_cursor = await page
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    # Rows hold exactly the response_model fields, so they skip its validation
+    return json_response(rows_to_dicts(rows), response.headers)
+
+async def directory_not_modified(request: Request, response: Response, doctor_service: AsyncDoctorService) -> Optional[Response]:
+    """304 if the client's copy of a directory listing is current; otherwise tags the response with its ETag"""
+    version = await doctor_service.directory_version()
+    return not_modified(request, response, cache_headers(DataVersionService.DIRECTORY, version, DIRECTORY_CACHE_MAX_AGE))
+
 # Doctor management endpoints
 @app.post("/doctors/", response_model=Doctor)
-async def create_doctor(doctor: DoctorCreate, db: Session = Depends(get_db)):
+async def create_doctor(doctor: DoctorCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new doctor"""
-    doctor_service = DoctorService(db)
-    return doctor_service.create_doctor(doctor)
+    doctor_service = AsyncDoctorService(db)
+    return await doctor_service.create_doctor(doctor)
 
 @app.get("/doctors/", response_model=List[Doctor])
-async def get_doctors(db: Session = Depends(get_db)):
-    """Get all doctors"""
-    doctor_service = DoctorService(db)
-    return doctor_service.get_all_doctors()
+async def get_doctors(request: Request, response: Response, specialty: Optional[str] = None,
+                      cursor: Optional[str] = None, limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+                      db: AsyncSession = Depends(get_async_db)):
+    """Get doctors a page at a time, optionally of one specialty"""
+    doctor_service = AsyncDoctorService(db)
+    unchanged = await directory_not_modified(request, response, doctor_service)
+    if unchanged:
+        return unchanged
+    return await paginated(response, doctor_service.list_doctors(specialty, cursor, limit))
 
 @app.get("/doctors/specialty/{specialty}", response_model=List[Doctor])
-async def get_doctors_by_specialty(specialty: str, db: Session = Depends(get_db)):
+async def get_doctors_by_specialty(request: Request, response: Response, specialty: str,
+                                   db: AsyncSession = Depends(get_async_db)):
     """Get doctors by specialty"""
-    doctor_service = DoctorService(db)
-    return doctor_service.get_doctors_by_specialty(specialty)
+    doctor_service = AsyncDoctorService(db)
+    unchanged = await directory_not_modified(request, response, doctor_service)
+    if unchanged:
+        return unchanged
+    doctors = await doctor_service.get_doctors_by_specialty(specialty)
+    return json_response(objects_to_dicts(doctors, Doctor), response.headers)
 
 # Patient management endpoints
 @app.post("/patients/", response_model=Patient)
-async def create_patient(patient: PatientCreate, db: Session = Depends(get_db)):
+async def create_patient(patient: PatientCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new patient"""
-    patient_service = PatientService(db)
-    return patient_service.create_patient(patient)
+    patient_service = AsyncPatientService(db)
+    return await patient_service.create_patient(patient)
 
 @app.get("/patients/", response_model=List[Patient])
-async def get_patients(db: Session = Depends(get_db)):
-    """Get all patients"""
-    patient_service = PatientService(db)
-    return patient_service.db.query(Patient).all()
+async def get_patients(response: Response, cursor: Optional[str] = None,
+                       limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+                       db: AsyncSession = Depends(get_async_db)):
+    """Get patients a page at a time"""
+    patient_service = AsyncPatientService(db)
+    return await paginated(response, patient_service.list_patients(cursor, limit))
 
 # Appointment management endpoints
+BOOKING_STATUS_CODES = {schedule_index.BOOKED: 409, schedule_index.DAY_OFF: 422, schedule_index.OUTSIDE_HOURS: 422}
+
 @app.post("/appointments/", response_model=Appointment)
-async def create_appointment(appointment: AppointmentCreate, db: Session = Depends(get_db)):
+async def create_appointment(appointment: AppointmentCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new appointment"""
-    appointment_service = AppointmentService(db)
-    return appointment_service.book_appointment(
-        appointment.doctor_id,
-        appointment.patient_id,
-        appointment.appointment_date,
-        appointment.notes
-    )
+    appointment_service = AsyncAppointmentService(db)
+    result = await appointment_service.create_appointment(appointment)
+    if not result["success"]:
+        # 409 only for a slot another appointment holds; a time the doctor doesn't
+        # work is a bad request, and an unknown doctor or patient has no reason
+        status_code = BOOKING_STATUS_CODES.get(result.get("reason"), 404)
+        raise HTTPException(status_code=status_code, detail={k: v for k, v in result.items() if k != "success"})
+    return result["appointment"]
 
 @app.get("/appointments/", response_model=List[Appointment])
-async def get_appointments(db: Session = Depends(get_db)):
-    """Get all appointments"""
-    appointment_service = AppointmentService(db)
-    return appointment_service.db.query(Appointment).all()
+async def get_appointments(response: Response, doctor_id: Optional[int] = None, patient_id: Optional[int] = None,
+                           date_from: Optional[date] = None, date_to: Optional[date] = None,
+                           status: Optional[str] = None, cursor: Optional[str] = None,
+                           limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+                           db: AsyncSession = Depends(get_async_db)):
+    """Get appointments in date order a page at a time, filtered by doctor, patient, dates (inclusive) or status"""
+    appointment_service = AsyncAppointmentService(db)
+    return await paginated(response, appointment_service.list_appointments(
+        doctor_id, patient_id, date_from, date_to, status, cursor, limit
+    ))
 
 # Doctor availability endpoints
 @app.post("/doctor-availability/", response_model=DoctorAvailability)
-async def create_doctor_availability(availability: DoctorAvailabilityCreate, db: Session = Depends(get_db)):
+async def create_doctor_availability(availability: DoctorAvailabilityCreate, db: AsyncSession = Depends(get_async_db)):
     """Create doctor availability"""
-    db_availability = DoctorAvailability(**availability.dict())
-    db.add(db_availability)
-    db.commit()
-    db.refresh(db_availability)
-    return db_availability
+    doctor_service = AsyncDoctorService(db)
+    return await doctor_service.create_availability(availability)
 
 @app.get("/doctor-availability/", response_model=List[DoctorAvailability])
-async def get_doctor_availability(db: Session = Depends(get_db)):
-    """Get all doctor availability"""
-    return db.query(DoctorAvailability).all()
-
-# Initialize database on startup
-@app.on_event("startup")
-async def startup_event():
-    """Initialize database with sample data"""
-    try:
-        from init_db import init_database
-        init_database()
-    except Exception as e:
-        print(f"Database initialization error: {e}")
+async def get_doctor_availability(request: Request, response: Response, doctor_id: Optional[int] = None,
+                                  cursor: Optional[str] = None, limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+                                  db: AsyncSession = Depends(get_async_db)):
+    """Get doctor availability a page at a time, optionally of one doctor"""
+    doctor_service = AsyncDoctorService(db)
+    unchanged = await directory_not_modified(request, response, doctor_service)
+    if unchanged:
+        return unchanged
+    return await paginated(response, doctor_service.list_availability(doctor_id, cursor, limit))
 
 if __name__ == "__main__":
     import uvicorn
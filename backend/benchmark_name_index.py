@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Time doctor name lookups through the trigram index and check them against a full scan.
+
+Queries are drawn from the directory in DATABASE_URL: full names, first and
+last name, last name only, the same with a letter dropped, and names nobody
+has. Every answer is compared with scoring each doctor in turn, so dropped
+matches show up as mismatches. The target is well under a millisecond per
+lookup with 10,000 doctors:
+
+    python seed_data.py --doctors 10000 --patients 0 --appointments 0
+    python benchmark_name_index.py
+"""
+import argparse
+import random
+import time
+from typing import Dict, List
+
+from database import SessionLocal
+from models import Doctor
+from name_index import DoctorNameIndex, scan_entries, scan_scores
+
+
+def _queries(names: List[str], count: int, seed: int) -> Dict[str, List[str]]:
+    rnd = random.Random(seed)
+
+    def typo(text: str) -> str:
+        position = rnd.randrange(1, len(text) - 1)
+        return text[:position] + text[position + 1:]
+
+    kinds: Dict[str, List[str]] = {"full": [], "first last": [], "last": [], "typo": [], "unknown": []}
+    for name in rnd.sample(names, min(count, len(names))):
+        tokens = name.replace("Dr.", "").split()
+        kinds["full"].append(name)
+        kinds["first last"].append(f"{tokens[0]} {tokens[-1]}")
+        kinds["last"].append(f"Dr {tokens[-1]}")
+        kinds["typo"].append(typo(f"{tokens[0]} {tokens[-1]}"))
+        kinds["unknown"].append("".join(rnd.choice("bcdfghjklmnpqrstvwxz") for _ in range(7)))
+    return kinds
+
+
+def benchmark(count: int, seed: int) -> List[dict]:
+    db = SessionLocal()
+    try:
+        rows = db.query(Doctor.id, Doctor.name).order_by(Doctor.id).all()
+        if not rows:
+            raise SystemExit("No doctors in DATABASE_URL; seed some first, e.g. "
+                             "python seed_data.py --doctors 10000 --patients 0 --appointments 0")
+        index = DoctorNameIndex(refresh_seconds=3600)
+        started = time.perf_counter()
+        index.search(db, "warm up")
+        build_ms = (time.perf_counter() - started) * 1000
+        entries = scan_entries(rows)
+
+        results = [{"kind": "build", "doctors": len(rows), "ms": build_ms}]
+        for kind, queries in _queries([name for _, name in rows], count, seed).items():
+            timings = []
+            for query in queries:
+                started = time.perf_counter()
+                index.search(db, query)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            mismatches = sum(
+                1 for query in queries
+                if [(c["id"], c["score"]) for c in index.search(db, query)]
+                != scan_scores(entries, query, index.min_score)
+            )
+            results.append({
+                "kind": kind, "queries": len(queries), "mean_ms": sum(timings) / len(timings),
+                "p50_ms": timings[len(timings) // 2], "p99_ms": timings[min(len(timings) - 1, len(timings) * 99 // 100)],
+                "mismatches": mismatches,
+            })
+        return results
+    finally:
+        db.close()
+
+
+def _report(results: List[dict]):
+    build, lookups = results[0], results[1:]
+    print(f"index of {build['doctors']} doctors built in {build['ms']:.0f} ms")
+    print(f"{'query':<12}{'count':>7}{'mean ms':>10}{'p50 ms':>9}{'p99 ms':>9}{'mismatches':>12}")
+    for r in lookups:
+        print(f"{r['kind']:<12}{r['queries']:>7}{r['mean_ms']:>10.3f}{r['p50_ms']:>9.3f}{r['p99_ms']:>9.3f}{r['mismatches']:>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=500, help="queries of each kind (default 500)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    _report(benchmark(args.queries, args.seed))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Compare the list endpoints' fast serialization path with the one it replaced.
+
+For a page of each listing, the previous path loads ORM objects, validates
+them against the response schema with from_attributes and dumps the JSON,
+which is what a response_model does. The fast path selects the schema's
+columns, turns the rows into dicts and encodes them with orjson. Both run
+against DATABASE_URL; a large one makes the difference visible:
+
+    python seed_data.py --doctors 2000 --patients 200000 --appointments 1000000
+    python benchmark_serialization.py --limit 1000
+
+The two bodies are compared byte for byte, and the sizes and times of
+gzip and br for the page are printed too.
+"""
+import argparse
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, List
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+import schemas
+from compression import StreamCompressor, brotli
+from database import AsyncSessionLocal
+from models import Doctor, Patient, Appointment, DoctorAvailability
+from serialization import FastJSONResponse, rows_to_dicts
+from services import DOCTOR_COLUMNS, PATIENT_COLUMNS, APPOINTMENT_COLUMNS, AVAILABILITY_COLUMNS
+
+# (listing, model, response schema, columns of the fast path)
+LISTINGS = [
+    ("doctors", Doctor, schemas.Doctor, DOCTOR_COLUMNS),
+    ("patients", Patient, schemas.Patient, PATIENT_COLUMNS),
+    ("appointments", Appointment, schemas.Appointment, APPOINTMENT_COLUMNS),
+    ("availability", DoctorAvailability, schemas.DoctorAvailability, AVAILABILITY_COLUMNS),
+]
+
+
+async def _timed(call: Callable[[], Awaitable[Any]], repeat: int) -> tuple:
+    """Milliseconds per call, after one warm-up call, and the last result"""
+    result = await call()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = await call()
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+
+def _compressed(body: bytes, encoding: str, repeat: int) -> tuple:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        compressed = StreamCompressor(encoding).compress(body, final=True)
+    return (time.perf_counter() - started) / repeat * 1000, len(compressed)
+
+
+async def benchmark(limit: int, repeat: int) -> List[dict]:
+    results = []
+    async with AsyncSessionLocal() as db:
+        for name, model, schema, columns in LISTINGS:
+            adapter = TypeAdapter(List[schema])
+            statement = select(model).order_by(model.id).limit(limit)
+            fast_statement = select(*columns).order_by(model.id).limit(limit)
+
+            async def previous() -> bytes:
+                objects = (await db.scalars(statement)).all()
+                # Fresh objects each time, as for a new request's session
+                db.expunge_all()
+                return adapter.dump_json(adapter.validate_python(objects, from_attributes=True))
+
+            async def fast() -> bytes:
+                rows = (await db.execute(fast_statement)).all()
+                return FastJSONResponse(rows_to_dicts(rows)).body
+
+            previous_ms, previous_body = await _timed(previous, repeat)
+            fast_ms, fast_body = await _timed(fast, repeat)
+            result = {
+                "listing": name, "rows": len(adapter.validate_json(fast_body)), "bytes": len(fast_body),
+                "previous_ms": previous_ms, "fast_ms": fast_ms, "identical": previous_body == fast_body,
+            }
+            for encoding in ("gzip", "br") if brotli is not None else ("gzip",):
+                result[f"{encoding}_ms"], result[f"{encoding}_bytes"] = _compressed(fast_body, encoding, repeat)
+            results.append(result)
+    return results
+
+
+def _report(results: List[dict]):
+    print(f"{'listing':<14}{'rows':>6}{'KB':>8}{'previous ms':>13}{'fast ms':>9}{'speedup':>9}"
+          f"{'gzip KB/ms':>14}{'br KB/ms':>13}  identical")
+    for r in results:
+        compression = "".join(
+            f"{r[f'{encoding}_bytes'] / 1024:>8.1f}/{r[f'{encoding}_ms']:<5.1f}" if f"{encoding}_ms" in r else f"{'-':>14}"
+            for encoding in ("gzip", "br")
+        )
+        print(f"{r['listing']:<14}{r['rows']:>6}{r['bytes'] / 1024:>8.1f}{r['previous_ms']:>13.2f}{r['fast_ms']:>9.2f}"
+              f"{r['previous_ms'] / r['fast_ms']:>8.1f}x{compression}  {r['identical']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--limit", type=int, default=1000, help="rows per page (default 1000)")
+    parser.add_argument("--repeat", type=int, default=20, help="timed calls per path (default 20)")
+    args = parser.parse_args()
+    _report(asyncio.run(benchmark(args.limit, args.repeat)))
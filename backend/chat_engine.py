@@ -0,0 +1,371 @@
+import json
+import time
+import uuid
+from typing import Dict, List, Any, AsyncIterator, Optional
+
+from schemas import ChatMessage, ChatResponse
+from services import AsyncChatbotService
+from openai_service import AsyncOpenAIService
+from session_store import SessionStore, SessionLocks
+from history_manager import HistoryManager
+from intent_router import IntentRouter
+
+OPENAI_FAILURE_RESPONSE = "I apologize, but I'm experiencing some technical difficulties. Please try again in a moment, or contact our clinic directly for assistance."
+FINAL_RESPONSE_FAILURE_RESPONSE = "I understand your request, but I'm having trouble processing it right now. Please try rephrasing your question or contact our clinic directly."
+FUNCTION_FAILURE_RESPONSE = "I understand your request, but I'm having some technical difficulties. Please try again or contact our clinic directly for assistance."
+# Sent before a fallback reply when tokens of the failed completion already went out
+RESET_EVENT = {"event": "reset", "data": {"reason": "completion_failed"}}
+
+
+class ChatEngine:
+    """Runs chat turns against the stored session history.
+
+    The blocking and streaming endpoints share this class so that a turn
+    leaves exactly the same messages in the session either way. Turns for
+    the same session are serialized, across workers too when the store is
+    shared; SessionBusyError is raised when a turn cannot start within
+    SESSION_LOCK_TIMEOUT.
+    """
+
+    def __init__(self, openai_service: AsyncOpenAIService, sessions: SessionStore, system_prompt: str):
+        self.openai_service = openai_service
+        self.sessions = sessions
+        self.system_prompt = system_prompt
+        self.locks = SessionLocks(sessions)
+        self.history_manager = HistoryManager()
+        self.router = IntentRouter()
+
+    async def _start_turn(self, session_id: str, message: ChatMessage) -> List[Dict]:
+        """Load the session, append the user message and compact the history.
+
+        The returned history is a working copy; callers must hand it back
+        to the session store once the turn is finished.
+        """
+        # Initialize or get chat history
+        history = await self.sessions.get(session_id)
+        if history is None:
+            history = [
+                {
+                    "role": "system",
+                    "content": self.system_prompt
+                }
+            ]
+
+        # Add user message to history
+        history.append({
+            "role": "user",
+            "content": message.message
+        })
+
+        # Keep the prompt within the token budget
+        return self.history_manager.compact(history)
+
+    def _record_tool_calls(self, history: List[Dict], tool_calls: List[Dict[str, Any]], results: List[Dict[str, Any]]):
+        """Add the tool calls of one model turn and their results to chat history"""
+        history.append({
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": call["id"],
+                    "type": "function",
+                    "function": {
+                        "name": call["name"],
+                        "arguments": call["arguments"]
+                    }
+                }
+                for call in tool_calls
+            ]
+        })
+
+        for call, result in zip(tool_calls, results):
+            history.append({
+                "role": "tool",
+                "tool_call_id": call["id"],
+                "content": json.dumps(result)
+            })
+
+    @staticmethod
+    def _tool_fields(tool_calls: List[Dict[str, Any]], results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """ChatResponse fields describing the tools run in a turn"""
+        return {
+            "function_called": ", ".join(call["name"] for call in tool_calls),
+            "function_result": results[0] if len(results) == 1 else {"results": results},
+            "tool_calls": [
+                {"name": call["name"], "arguments": call["parsed_arguments"], "result": result}
+                for call, result in zip(tool_calls, results)
+            ]
+        }
+
+    @staticmethod
+    def _parse_tool_calls(tool_calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Decode the JSON arguments of each tool call; raises ValueError if any is malformed"""
+        return [dict(call, parsed_arguments=json.loads(call["arguments"])) for call in tool_calls]
+
+    async def _run_tools(self, history: List[Dict], tool_calls: List[Dict[str, Any]], chatbot_service: AsyncChatbotService) -> List[Dict[str, Any]]:
+        """Execute all tool calls of a turn concurrently and record them"""
+        results = await chatbot_service.process_tool_calls(
+            [{"name": call["name"], "arguments": call["parsed_arguments"]} for call in tool_calls]
+        )
+        await chatbot_service.release_connection()
+        self._record_tool_calls(history, tool_calls, results)
+        return results
+
+    async def _try_route(self, history: List[Dict], chatbot_service: AsyncChatbotService) -> Optional[Dict[str, Any]]:
+        """Answer the latest user message locally when the intent router is confident.
+
+        On a hit the tool call, its result and the templated reply are
+        recorded just as if the model had made the call.
+        """
+        started = time.perf_counter()
+        call = self.router.classify(history[-1]["content"])
+        if call is None:
+            self.router.metrics.record_miss()
+            return None
+
+        function_result = await chatbot_service.process_function_call(call["name"], call["arguments"])
+        reply = self.router.render(call["name"], call["arguments"], function_result)
+        if reply is None:
+            self.router.metrics.record_miss()
+            return None
+
+        tool_calls = [{
+            "id": f"call_{uuid.uuid4().hex[:24]}",
+            "name": call["name"],
+            "arguments": json.dumps(call["arguments"]),
+            "parsed_arguments": call["arguments"]
+        }]
+        self._record_tool_calls(history, tool_calls, [function_result])
+        history.append({
+            "role": "assistant",
+            "content": reply
+        })
+        self.router.metrics.record_hit(call["name"], time.perf_counter() - started)
+        return {"tool_calls": tool_calls, "results": [function_result], "reply": reply}
+
+    async def run_turn(self, message: ChatMessage, chatbot_service: AsyncChatbotService) -> ChatResponse:
+        """Run one turn and return the complete response.
+
+        When the model asks for several tools at once they run concurrently,
+        followed by a single completion to phrase the answer, so a turn
+        never needs more than two model round-trips.
+        """
+        # Generate or get session ID
+        session_id = message.session_id or str(uuid.uuid4())
+        async with self.locks.hold(session_id):
+            history = await self._start_turn(session_id, message)
+            try:
+                return await self._run_turn(session_id, history, chatbot_service)
+            finally:
+                await self.sessions.save(session_id, history)
+
+    async def _run_turn(self, session_id: str, history: List[Dict], chatbot_service: AsyncChatbotService) -> ChatResponse:
+        # Answer clear directory questions without a model round-trip
+        routed = await self._try_route(history, chatbot_service)
+        if routed:
+            return ChatResponse(
+                response=routed["reply"],
+                session_id=session_id,
+                **self._tool_fields(routed["tool_calls"], routed["results"])
+            )
+
+        # Identical requests against the same data share one completion
+        cache_stamp = await chatbot_service.data_version_stamp()
+        await chatbot_service.release_connection()
+
+        # Get response from OpenAI
+        llm_started = time.perf_counter()
+        response = await self.openai_service.get_chat_completion(history, cache_stamp=cache_stamp)
+
+        if not response["success"]:
+            # If OpenAI fails, provide a fallback response
+            history.append({
+                "role": "assistant",
+                "content": OPENAI_FAILURE_RESPONSE
+            })
+            return ChatResponse(
+                response=OPENAI_FAILURE_RESPONSE,
+                session_id=session_id
+            )
+
+        openai_message = response["response"]
+
+        # Check if tools were called
+        if openai_message.tool_calls:
+            try:
+                tool_calls = self._parse_tool_calls([
+                    {"id": call.id, "name": call.function.name, "arguments": call.function.arguments}
+                    for call in openai_message.tool_calls
+                ])
+
+                # Run every requested tool at once
+                results = await self._run_tools(history, tool_calls, chatbot_service)
+
+                # Get final response
+                final_response = await self.openai_service.get_simple_completion(history, cache_stamp=cache_stamp)
+
+                if final_response["success"]:
+                    history.append({
+                        "role": "assistant",
+                        "content": final_response["response"]
+                    })
+                    self.router.metrics.record_llm_function_turn(time.perf_counter() - llm_started)
+
+                    return ChatResponse(
+                        response=final_response["response"],
+                        session_id=session_id,
+                        **self._tool_fields(tool_calls, results)
+                    )
+                else:
+                    # If final response fails, provide a fallback
+                    history.append({
+                        "role": "assistant",
+                        "content": FINAL_RESPONSE_FAILURE_RESPONSE
+                    })
+                    return ChatResponse(
+                        response=FINAL_RESPONSE_FAILURE_RESPONSE,
+                        session_id=session_id
+                    )
+            except Exception:
+                # If tool calling fails, provide a fallback response
+                history.append({
+                    "role": "assistant",
+                    "content": FUNCTION_FAILURE_RESPONSE
+                })
+                return ChatResponse(
+                    response=FUNCTION_FAILURE_RESPONSE,
+                    session_id=session_id
+                )
+        else:
+            # Simple response without tool calling
+            history.append({
+                "role": "assistant",
+                "content": openai_message.content
+            })
+
+            return ChatResponse(
+                response=openai_message.content,
+                session_id=session_id
+            )
+
+    async def stream_turn(self, message: ChatMessage, chatbot_service: AsyncChatbotService) -> AsyncIterator[Dict[str, Any]]:
+        """Run one turn, yielding events as the model produces them.
+
+        Events are dicts with an ``event`` name and a ``data`` payload:
+        ``session``, ``token``, ``function_called`` and ``function_result``
+        (once per tool call) and a final ``done`` carrying the same fields
+        as ChatResponse. If a completion fails after some of its tokens were
+        sent, a ``reset`` event tells the client to discard them before the
+        fallback reply arrives in ``done``.
+        """
+        # Generate or get session ID
+        session_id = message.session_id or str(uuid.uuid4())
+        async with self.locks.hold(session_id):
+            history = await self._start_turn(session_id, message)
+            try:
+                async for event in self._stream_turn(session_id, history, chatbot_service):
+                    yield event
+            finally:
+                await self.sessions.save(session_id, history)
+
+    async def _stream_turn(self, session_id: str, history: List[Dict], chatbot_service: AsyncChatbotService) -> AsyncIterator[Dict[str, Any]]:
+        yield {"event": "session", "data": {"session_id": session_id}}
+
+        def done(response: str, tool_fields: Dict[str, Any] = None) -> Dict[str, Any]:
+            history.append({
+                "role": "assistant",
+                "content": response
+            })
+            return {
+                "event": "done",
+                "data": ChatResponse(
+                    response=response,
+                    session_id=session_id,
+                    **(tool_fields or {})
+                ).model_dump()
+            }
+
+        def tool_events(tool_calls: List[Dict[str, Any]], results: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+            if results is None:
+                return [{"event": "function_called", "data": {"name": call["name"], "arguments": call["parsed_arguments"]}}
+                        for call in tool_calls]
+            return [{"event": "function_result", "data": {"name": call["name"], "result": result}}
+                    for call, result in zip(tool_calls, results)]
+
+        # Answer clear directory questions without a model round-trip
+        routed = await self._try_route(history, chatbot_service)
+        if routed:
+            for event in tool_events(routed["tool_calls"]) + tool_events(routed["tool_calls"], routed["results"]):
+                yield event
+            yield {"event": "token", "data": {"content": routed["reply"]}}
+            yield {
+                "event": "done",
+                "data": ChatResponse(
+                    response=routed["reply"],
+                    session_id=session_id,
+                    **self._tool_fields(routed["tool_calls"], routed["results"])
+                ).model_dump()
+            }
+            return
+
+        # Stream the first completion; tokens only arrive for plain answers
+        llm_started = time.perf_counter()
+        completion = None
+        streamed = False
+        async for event in self.openai_service.stream_completion(history, allow_tool_calls=True):
+            if event["type"] == "token":
+                streamed = True
+                yield {"event": "token", "data": {"content": event["content"]}}
+            elif event["type"] == "complete":
+                completion = event
+            elif event["type"] == "error":
+                break
+
+        if completion is None:
+            if streamed:
+                yield RESET_EVENT
+            # If OpenAI fails, provide a fallback response
+            yield done(OPENAI_FAILURE_RESPONSE)
+            return
+
+        if not completion["tool_calls"]:
+            # Simple response without tool calling
+            yield done(completion["content"])
+            return
+
+        try:
+            tool_calls = self._parse_tool_calls(completion["tool_calls"])
+            for event in tool_events(tool_calls):
+                yield event
+
+            # Run every requested tool at once
+            results = await self._run_tools(history, tool_calls, chatbot_service)
+            for event in tool_events(tool_calls, results):
+                yield event
+
+            # Stream the final response
+            final_completion = None
+            async for event in self.openai_service.stream_completion(history):
+                if event["type"] == "token":
+                    streamed = True
+                    yield {"event": "token", "data": {"content": event["content"]}}
+                elif event["type"] == "complete":
+                    final_completion = event
+                elif event["type"] == "error":
+                    break
+        except Exception:
+            if streamed:
+                yield RESET_EVENT
+            # If tool calling fails, provide a fallback response
+            yield done(FUNCTION_FAILURE_RESPONSE)
+            return
+
+        if final_completion is None:
+            if streamed:
+                yield RESET_EVENT
+            # If final response fails, provide a fallback
+            yield done(FINAL_RESPONSE_FAILURE_RESPONSE)
+            return
+
+        self.router.metrics.record_llm_function_turn(time.perf_counter() - llm_started)
+        yield done(final_completion["content"], self._tool_fields(tool_calls, results))
@@ -0,0 +1,118 @@
+import zlib
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import COMPRESSION_MIN_BYTES, COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY
+
+try:
+    import brotli
+except ImportError:  # optional; only gzip is offered without it
+    brotli = None
+
+# Only these are compressed; event streams pass through so chat replies aren't held back
+COMPRESSIBLE_MEDIA_TYPES = {"application/json", "application/x-ndjson", "text/csv"}
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """br if the client accepts it and brotli is installed, else gzip if accepted, else None"""
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class StreamCompressor:
+    """Compresses a body chunk by chunk; every chunk is flushed so it can be decoded on arrival"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + (self._compressor.finish() if final else self._compressor.flush())
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """br or gzip for JSON, NDJSON and CSV responses of at least minimum_size bytes
+
+    Streamed responses are always compressed, one flushed block per chunk,
+    so rows still reach the client as they are produced. A compressed body
+    is no longer byte-identical to the uncompressed one, so strong ETags are
+    sent weak; If-None-Match compares weakly and still matches them.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", "")) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        compressor: Optional[StreamCompressor] = None
+
+        async def send_compressed(message: Message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether to compress
+                start = message
+                return
+            if start is not None:
+                if message["type"] == "http.response.body":
+                    compressor = self._compressor_for(start, message, encoding)
+                    if compressor is not None:
+                        message = self._compressed(message, compressor)
+                        headers = MutableHeaders(raw=start["headers"])
+                        headers["Content-Encoding"] = encoding
+                        if message.get("more_body", False):
+                            del headers["Content-Length"]
+                        else:
+                            headers["Content-Length"] = str(len(message["body"]))
+                        etag = headers.get("etag")
+                        if etag and not etag.startswith("W/"):
+                            headers["ETag"] = "W/" + etag
+                await send(start)
+                start = None
+            elif compressor is not None and message["type"] == "http.response.body":
+                message = self._compressed(message, compressor)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compressor_for(self, start: Message, first_body: Message, encoding: str) -> Optional[StreamCompressor]:
+        headers = MutableHeaders(raw=start["headers"])
+        media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+        if media_type not in COMPRESSIBLE_MEDIA_TYPES or "content-encoding" in headers or start["status"] in (204, 206, 304):
+            return None
+        # Caches must keep compressed and plain copies apart
+        headers.add_vary_header("Accept-Encoding")
+        if len(first_body.get("body", b"")) < self.minimum_size and not first_body.get("more_body", False):
+            return None
+        return StreamCompressor(encoding)
+
+    @staticmethod
+    def _compressed(message: Message, compressor: StreamCompressor) -> Message:
+        final = not message.get("more_body", False)
+        return {**message, "body": compressor.compress(message.get("body", b""), final)}
@@ -5,3 +5,89 @@ load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./doctors_clinic.db")
+# Same database through an async driver; derived for SQLite, set it explicitly for other databases
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1))
+# "production" applies the pool and SQLite settings below; "default" keeps SQLAlchemy's defaults
+DB_ENGINE_PROFILE = os.getenv("DB_ENGINE_PROFILE", "production")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# SQLite pragmas set on every new connection; WAL lets readers run while a booking is written
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# OpenAI client settings
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+
+# Provider circuit breaker: open after this many consecutive failures, probe again after the recovery time
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_RECOVERY_SECONDS = float(os.getenv("LLM_BREAKER_RECOVERY_SECONDS", "15"))
+# Adaptive timeout: this multiple of the latency percentile, between the minimum and OPENAI_TIMEOUT
+LLM_TIMEOUT_PERCENTILE = float(os.getenv("LLM_TIMEOUT_PERCENTILE", "99"))
+LLM_TIMEOUT_MULTIPLIER = float(os.getenv("LLM_TIMEOUT_MULTIPLIER", "2"))
+LLM_TIMEOUT_MIN_SECONDS = float(os.getenv("LLM_TIMEOUT_MIN_SECONDS", "2"))
+# Hedged requests: send a second copy once a call is slower than this percentile
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+
+# Chat-completions backend: "openai" or "mock" (see mock_llm.py)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+# Optional base URL of any chat-completions compatible server
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")
+
+# Mock backend behaviour
+MOCK_LLM_LATENCY = os.getenv("MOCK_LLM_LATENCY", "lognormal:0.8:0.4")
+MOCK_LLM_ERROR_RATE = float(os.getenv("MOCK_LLM_ERROR_RATE", "0"))
+MOCK_LLM_SEED = int(os.getenv("MOCK_LLM_SEED", "42"))
+MOCK_LLM_TOKEN_INTERVAL = float(os.getenv("MOCK_LLM_TOKEN_INTERVAL", "0.02"))
+
+# Chat session storage: "memory" (per worker) or "sqlite" (shared by workers)
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "./chat_sessions.db")
+# How long a turn waits for the previous turn of the same session
+SESSION_LOCK_TIMEOUT = float(os.getenv("SESSION_LOCK_TIMEOUT", "60"))
+# Lease a worker takes on a session in the sqlite store; must outlast the longest turn,
+# and is how long a crashed worker's session stays blocked
+SESSION_LEASE_SECONDS = float(os.getenv("SESSION_LEASE_SECONDS", "300"))
+SESSION_LEASE_POLL_INTERVAL = float(os.getenv("SESSION_LEASE_POLL_INTERVAL", "0.05"))
+
+# Prompt history limits (tokens); older turns are summarized past the budget
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "3000"))
+HISTORY_MEMORY_MAX_TOKENS = int(os.getenv("HISTORY_MEMORY_MAX_TOKENS", "400"))
+
+# Slot bitmaps for availability checks; other workers' writes show up within the refresh interval
+SCHEDULE_SLOT_MINUTES = int(os.getenv("SCHEDULE_SLOT_MINUTES", "15"))
+SCHEDULE_REFRESH_SECONDS = float(os.getenv("SCHEDULE_REFRESH_SECONDS", "1"))
+SCHEDULE_MAX_DATES = int(os.getenv("SCHEDULE_MAX_DATES", "366"))
+# Doctor name and specialty indexes; directory changes from other workers show up within the refresh interval
+DIRECTORY_REFRESH_SECONDS = float(os.getenv("DIRECTORY_REFRESH_SECONDS", "5"))
+# Lowest score (0-1) at which a doctor name lookup counts as a match
+NAME_MATCH_MIN_SCORE = float(os.getenv("NAME_MATCH_MIN_SCORE", "0.5"))
+
+# List endpoints: rows per page by default and at most
+PAGE_DEFAULT_LIMIT = int(os.getenv("PAGE_DEFAULT_LIMIT", "100"))
+PAGE_MAX_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", "1000"))
+# Rows fetched and written per chunk by the streaming exports
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "1000"))
+# Rows validated and inserted per executemany by the bulk endpoints, and row errors they report at most
+INGEST_BATCH_ROWS = int(os.getenv("INGEST_BATCH_ROWS", "1000"))
+INGEST_MAX_ERRORS = int(os.getenv("INGEST_MAX_ERRORS", "1000"))
+# Seconds clients may reuse a directory listing before revalidating it by ETag
+DIRECTORY_CACHE_MAX_AGE = int(os.getenv("DIRECTORY_CACHE_MAX_AGE", "0"))
+# JSON/NDJSON/CSV responses at least this large are sent br (with brotli installed) or gzip compressed
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+# LLM response cache; identical requests in flight are always coalesced, 0 disables caching
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "60"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
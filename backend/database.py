@@ -1,13 +1,62 @@
-from sqlalchemy import create_engine
+from typing import Any, Dict
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
-from config import DATABASE_URL
+from config import (
+    DATABASE_URL, ASYNC_DATABASE_URL, DB_ENGINE_PROFILE, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+    SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_BUSY_TIMEOUT_MS, SQLITE_CACHE_SIZE_KB, SQLITE_MMAP_SIZE
+)
 from models import Base
+from migrations import run_migrations
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# Run on every new SQLite connection under the production profile
+SQLITE_PRAGMAS = [
+    f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}",
+    f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}",
+    f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+    # Negative sizes are in KiB rather than pages
+    f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}",
+    f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+]
+
+def _is_sqlite_file(url: str) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+def _engine_options(url: str) -> Dict[str, Any]:
+    sqlite = make_url(url).get_backend_name() == "sqlite"
+    options: Dict[str, Any] = {"connect_args": {"check_same_thread": False}} if sqlite else {}
+    # In-memory SQLite keeps its own single-connection pool
+    if DB_ENGINE_PROFILE == "production" and (_is_sqlite_file(url) or not sqlite):
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
+
+def _apply_sqlite_pragmas(engine: Engine):
+    if DB_ENGINE_PROFILE != "production" or engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+        cursor.close()
+
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+_apply_sqlite_pragmas(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Used by the API so queries don't block the event loop; scripts keep the sync engine
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL))
+_apply_sqlite_pragmas(async_engine.sync_engine)
+# Objects stay readable after commit; reloading them would need another await
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 def create_tables():
     Base.metadata.create_all(bind=engine)
+    # Bring tables that already existed up to the current schema
+    run_migrations(engine)
 
 def get_db():
     db = SessionLocal()
@@ -15,3 +64,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,47 @@
+import csv
+import io
+import json
+from datetime import date
+from typing import Any, AsyncIterator, List
+
+# Export format -> media type
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _json_default(value: Any) -> Any:
+    # Only called for values json can't encode itself, so plain rows pay nothing
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+async def ndjson_chunks(columns: List[str], batches: AsyncIterator[List[tuple]]) -> AsyncIterator[str]:
+    """One JSON object per row and line, one chunk per batch"""
+    async for batch in batches:
+        yield "".join(json.dumps(dict(zip(columns, row)), default=_json_default) + "\n" for row in batch)
+
+
+async def csv_chunks(columns: List[str], batches: AsyncIterator[List[tuple]]) -> AsyncIterator[str]:
+    """A header line right away, then one chunk of CSV lines per batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> str:
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    writer.writerow(columns)
+    yield flush()
+    async for batch in batches:
+        # Datetimes come out as "2026-04-20 08:00:00", which spreadsheets read as dates
+        writer.writerows(batch)
+        yield flush()
+
+
+def export_chunks(export_format: str, columns: List[str], batches: AsyncIterator[List[tuple]]) -> AsyncIterator[str]:
+    """Text chunks of an export in "ndjson" or "csv" from batches of rows in column order"""
+    if export_format == "csv":
+        return csv_chunks(columns, batches)
+    return ndjson_chunks(columns, batches)
@@ -0,0 +1,172 @@
+import json
+import re
+from typing import Dict, List, Any
+
+from config import LLM_MODEL, HISTORY_TOKEN_BUDGET, HISTORY_MEMORY_MAX_TOKENS
+
+try:
+    import tiktoken
+except ImportError:  # optional; fall back to a character-based estimate
+    tiktoken = None
+
+MEMORY_PREFIX = "Summary of the earlier conversation:"
+
+# Longest excerpt of a message kept in the summary
+SUMMARY_EXCERPT_CHARS = 160
+# List items kept when shrinking a function result from an older turn
+FUNCTION_RESULT_MAX_ITEMS = 5
+# Last item of a list that was already shrunk, counting the items left out
+SHRUNK_MARKER = re.compile(r"\.\.\. and \d+ more")
+
+
+class TokenCounter:
+    """Counts prompt tokens, with tiktoken when it is installed"""
+
+    # Role and separator tokens the API adds around every message
+    MESSAGE_OVERHEAD = 4
+
+    def __init__(self, model: str = LLM_MODEL):
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("cl100k_base")
+
+    def count_text(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+        # About four characters per token for English text
+        return len(text) // 4 + 1
+
+    def count_message(self, message: Dict[str, Any]) -> int:
+        tokens = self.MESSAGE_OVERHEAD + self.count_text(message.get("content") or "")
+        if message.get("function_call"):
+            tokens += self.count_text(json.dumps(message["function_call"]))
+        if message.get("tool_calls"):
+            tokens += self.count_text(json.dumps(message["tool_calls"]))
+        if message.get("name"):
+            tokens += self.count_text(message["name"])
+        return tokens
+
+    def count(self, messages: List[Dict[str, Any]]) -> int:
+        return sum(self.count_message(m) for m in messages)
+
+
+class HistoryManager:
+    """Keeps a chat history within a prompt token budget.
+
+    The history is split into turns, each starting at a user message, so
+    tool calls always stay with their results. When the budget is
+    exceeded, function results in older turns are shortened first. If
+    that is not enough, the oldest turns are folded into a compact memory
+    message placed right after the system prompt. The newest turn is
+    never touched.
+    """
+
+    def __init__(self, token_budget: int = HISTORY_TOKEN_BUDGET,
+                 memory_max_tokens: int = HISTORY_MEMORY_MAX_TOKENS,
+                 counter: TokenCounter = None):
+        self.token_budget = token_budget
+        self.memory_max_tokens = memory_max_tokens
+        self.counter = counter or TokenCounter()
+
+    @staticmethod
+    def _split_turns(messages: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        turns = []
+        for message in messages:
+            if message["role"] == "user" or not turns:
+                turns.append([])
+            turns[-1].append(message)
+        return turns
+
+    @staticmethod
+    def _excerpt(text: str) -> str:
+        text = " ".join((text or "").split())
+        if len(text) > SUMMARY_EXCERPT_CHARS:
+            return text[:SUMMARY_EXCERPT_CHARS - 3] + "..."
+        return text
+
+    def _summarize_turn(self, turn: List[Dict[str, Any]]) -> List[str]:
+        """Describe one turn in a few short lines"""
+        lines = []
+        for message in turn:
+            if message["role"] == "user":
+                lines.append(f"- Patient: {self._excerpt(message['content'])}")
+            elif message["role"] == "assistant" and message.get("tool_calls"):
+                for call in message["tool_calls"]:
+                    function = call["function"]
+                    lines.append(f"- Looked up {function['name']}({self._excerpt(function.get('arguments'))})")
+            elif message["role"] == "assistant" and message.get("function_call"):
+                call = message["function_call"]
+                lines.append(f"- Looked up {call['name']}({self._excerpt(call.get('arguments'))})")
+            elif message["role"] in ("tool", "function"):
+                lines.append(f"  Result: {self._excerpt(message.get('content'))}")
+            elif message["role"] == "assistant" and message.get("content"):
+                lines.append(f"- Assistant: {self._excerpt(message['content'])}")
+        return lines
+
+    @staticmethod
+    def _is_shrunk(value: List[Any]) -> bool:
+        return (len(value) == FUNCTION_RESULT_MAX_ITEMS + 1 and isinstance(value[-1], str)
+                and SHRUNK_MARKER.fullmatch(value[-1]) is not None)
+
+    @staticmethod
+    def _shrink_value(value: Any) -> Any:
+        # Compaction runs on every turn, so lists shrunk earlier keep their count
+        if isinstance(value, list) and len(value) > FUNCTION_RESULT_MAX_ITEMS and not HistoryManager._is_shrunk(value):
+            return value[:FUNCTION_RESULT_MAX_ITEMS] + [f"... and {len(value) - FUNCTION_RESULT_MAX_ITEMS} more"]
+        if isinstance(value, dict):
+            return {key: HistoryManager._shrink_value(item) for key, item in value.items()}
+        return value
+
+    def _shrink_function_results(self, turn: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        shrunk = []
+        for message in turn:
+            if message["role"] in ("tool", "function") and message.get("content"):
+                try:
+                    result = json.loads(message["content"])
+                except ValueError:
+                    shrunk.append(message)
+                    continue
+                message = dict(message, content=json.dumps(self._shrink_value(result)))
+            shrunk.append(message)
+        return shrunk
+
+    def _memory_message(self, lines: List[str]) -> Dict[str, Any]:
+        # Keep the most recent lines when the summary itself grows too large
+        kept = []
+        tokens = self.counter.count_text(MEMORY_PREFIX)
+        for line in reversed(lines):
+            line_tokens = self.counter.count_text(line) + 1
+            if tokens + line_tokens > self.memory_max_tokens:
+                break
+            kept.append(line)
+            tokens += line_tokens
+        return {"role": "system", "content": "\n".join([MEMORY_PREFIX] + list(reversed(kept)))}
+
+    def compact(self, history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return a history that fits the token budget, or the same one if it already does"""
+        if self.counter.count(history) <= self.token_budget:
+            return history
+
+        system, rest = history[0], history[1:]
+        memory_lines = []
+        if rest and rest[0]["role"] == "system" and (rest[0].get("content") or "").startswith(MEMORY_PREFIX):
+            memory_lines = rest[0]["content"].split("\n")[1:]
+            rest = rest[1:]
+
+        turns = self._split_turns(rest)
+        turns = [self._shrink_function_results(turn) for turn in turns[:-1]] + turns[-1:]
+
+        def total() -> int:
+            memory = [self._memory_message(memory_lines)] if memory_lines else []
+            return self.counter.count([system] + memory + [m for turn in turns for m in turn])
+
+        while len(turns) > 1 and total() > self.token_budget:
+            memory_lines.extend(self._summarize_turn(turns.pop(0)))
+
+        memory = [self._memory_message(memory_lines)] if memory_lines else []
+        return [system] + memory + [m for turn in turns for m in turn]
@@ -0,0 +1,32 @@
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names the tag; weak comparison, as RFC 9110 asks for here"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def cache_headers(name: str, version: int, max_age: int) -> Dict[str, str]:
+    """ETag and Cache-Control for a listing that changes only when a data version does
+
+    The tag is strong: every URL renders the same bytes for as long as the
+    version stands. Caches key tags by URL, so the query needs no place in it.
+    """
+    return {
+        "ETag": f'"{name}-{version}"',
+        "Cache-Control": f"public, max-age={max_age}, must-revalidate",
+    }
+
+
+def not_modified(request: Request, response: Response, headers: Dict[str, str]) -> Optional[Response]:
+    """An empty 304 if the client holds the current version, else None with the headers set on the response"""
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
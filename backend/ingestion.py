@@ -0,0 +1,93 @@
+import codecs
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+# (row number, record, parse error); exactly one of record and error is None
+ParsedRow = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+
+async def body_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[List[str]]:
+    """Complete lines of a streamed UTF-8 body, one list per chunk received
+
+    A byte order mark, as spreadsheet programs write, is dropped. Invalid
+    UTF-8 raises UnicodeDecodeError.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        lines = (pending + decoder.decode(chunk)).split("\n")
+        # The last piece may be the start of a line the next chunk finishes
+        pending = lines.pop()
+        if lines:
+            yield lines
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield [pending]
+
+
+async def ndjson_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[List[ParsedRow]]:
+    """One JSON object per non-blank line"""
+    row = 0
+    async for lines in body_lines(chunks):
+        parsed = []
+        for line in lines:
+            if not line.strip():
+                continue
+            row += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                parsed.append((row, None, f"Invalid JSON: {e}"))
+                continue
+            if isinstance(record, dict):
+                parsed.append((row, record, None))
+            else:
+                parsed.append((row, None, "Expected a JSON object"))
+        yield parsed
+
+
+async def csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[List[ParsedRow]]:
+    """Rows keyed by the header line; row 1 is the first line after it
+
+    Empty cells are left out, so fields with defaults get them. Quoted
+    cells may span lines.
+    """
+    header: Optional[List[str]] = None
+    row = 0
+    # Lines of a record whose quoted cell is still open, and their quote count
+    partial: List[str] = []
+    quotes = 0
+    async for lines in body_lines(chunks):
+        records = []
+        for line in lines:
+            if not partial and '"' not in line:
+                records.append(line)
+                continue
+            partial.append(line)
+            quotes += line.count('"')
+            if quotes % 2 == 0:
+                records.append("\n".join(partial))
+                partial, quotes = [], 0
+        parsed = []
+        for cells in csv.reader(records):
+            if not cells or cells == [""]:
+                continue
+            if header is None:
+                header = [name.strip() for name in cells]
+                continue
+            row += 1
+            if len(cells) != len(header):
+                parsed.append((row, None, f"Expected {len(header)} columns, got {len(cells)}"))
+            else:
+                parsed.append((row, {name: cell for name, cell in zip(header, cells) if cell != ""}, None))
+        yield parsed
+    if partial:
+        yield [(row + 1, None, "Unterminated quoted cell")]
+
+
+def ingest_rows(ingest_format: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[List[ParsedRow]]:
+    """Batches of parsed rows of a streamed "ndjson" or "csv" body"""
+    if ingest_format == "csv":
+        return csv_rows(chunks)
+    return ndjson_rows(chunks)
@@ -1,6 +1,8 @@
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from database import SessionLocal, create_tables
-from models import Doctor, DoctorAvailability, Patient, Appointment
+from models import Doctor, DoctorAvailability, Patient, Appointment, minute_of_day, slot_start_of
+from services import DataVersionService
 from datetime import datetime, timedelta
 
 def init_database():
@@ -222,29 +224,28 @@ def init_database():
             }
         ]
         
-        doctors = []
-        for doctor_data in doctors_data:
-            doctor = Doctor(**doctor_data)
-            db.add(doctor)
-            db.flush()  # Get the ID
-            doctors.append(doctor)
+        # One multi-row INSERT per table; RETURNING gives the IDs in input order
+        doctor_ids = db.scalars(
+            insert(Doctor).returning(Doctor.id, sort_by_parameter_order=True), doctors_data
+        ).all()
         
         # Create doctor availability
         availability_data = []
-        for doctor in doctors:
+        for doctor_id in doctor_ids:
             # Each doctor is available Monday to Friday, 9 AM to 5 PM
             for day in range(5):  # Monday to Friday
                 availability_data.append({
-                    "doctor_id": doctor.id,
+                    "doctor_id": doctor_id,
                     "day_of_week": day,
                     "start_time": "09:00",
                     "end_time": "17:00",
+                    # Bulk inserts skip the model validators that fill these in
+                    "start_minute": minute_of_day("09:00"),
+                    "end_minute": minute_of_day("17:00"),
                     "is_available": True
                 })
         
-        for avail_data in availability_data:
-            availability = DoctorAvailability(**avail_data)
-            db.add(availability)
+        db.execute(insert(DoctorAvailability), availability_data)
         
         # Create sample patients
         patients_data = [
@@ -260,26 +261,23 @@ def init_database():
             }
         ]
         
-        patients = []
-        for patient_data in patients_data:
-            patient = Patient(**patient_data)
-            db.add(patient)
-            db.flush()
-            patients.append(patient)
+        patient_ids = db.scalars(
+            insert(Patient).returning(Patient.id, sort_by_parameter_order=True), patients_data
+        ).all()
         
         # Create sample appointments
         tomorrow = datetime.now() + timedelta(days=1)
         appointments_data = [
             {
-                "doctor_id": doctors[0].id,  # Dr. Sarah Johnson
-                "patient_id": patients[0].id,
+                "doctor_id": doctor_ids[0],  # Dr. Sarah Johnson
+                "patient_id": patient_ids[0],
                 "appointment_date": tomorrow.replace(hour=10, minute=0, second=0, microsecond=0),
                 "status": "scheduled",
                 "notes": "Regular checkup"
             },
             {
-                "doctor_id": doctors[1].id,  # Dr. Michael Chen
-                "patient_id": patients[1].id,
+                "doctor_id": doctor_ids[1],  # Dr. Michael Chen
+                "patient_id": patient_ids[1],
                 "appointment_date": tomorrow.replace(hour=14, minute=30, second=0, microsecond=0),
                 "status": "scheduled",
                 "notes": "Knee pain consultation"
@@ -287,9 +285,12 @@ def init_database():
         ]
         
         for appointment_data in appointments_data:
-            appointment = Appointment(**appointment_data)
-            db.add(appointment)
+            appointment_data["slot_start"] = slot_start_of(appointment_data["appointment_date"])
+        db.execute(insert(Appointment), appointments_data)
         
+        data_versions = DataVersionService(db)
+        data_versions.bump(DataVersionService.DIRECTORY)
+        data_versions.bump(DataVersionService.APPOINTMENTS)
         db.commit()
         print("Database initialized successfully with sample data")
         
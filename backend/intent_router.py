@@ -0,0 +1,129 @@
+import re
+import threading
+from typing import Dict, List, Any, Optional
+
+from specialty_index import SPECIALTY_STEMS, SPECIALTY_PHRASES
+
+# The message must open as an explicit request for a list of doctors:
+# "list/show ...", "which/any ... do you have", "are there any ...", "do you have a ..."
+DIRECTORY_PATTERN = re.compile(
+    r"^(?:(?:please|can you|could you|would you)\s+)*(?:list|show)\b"
+    r"|^(?:which|any)\b.*\bdo you have\b"
+    r"|^(?:are there|is there|do you have)\s+(?:any|a|an)\b"
+)
+# ...and must not involve anything the model needs to reason about, such as
+# what a specialty treats or who the doctors are beyond their names
+BLOCKING_PATTERN = re.compile(
+    r"\d|\b(book|booking|appointment|schedule|reschedule|cancel|available|availability|free|"
+    r"today|tomorrow|tonight|morning|afternoon|evening|week|monday|tuesday|wednesday|thursday|"
+    r"friday|saturday|sunday|pain|hurt|hurts|ache|symptom|symptoms|rash|fever|not|"
+    r"don't|dont|without|except|recommend|best|should|"
+    r"qualification|qualifications|qualified|experience|experienced|degree|degrees|head|chief|"
+    r"treat|treats|treatment|cost|costs|fee|fees|price)\b"
+)
+MAX_ROUTED_WORDS = 12
+
+
+class RouterMetrics:
+    """Hit rate and estimated latency saved by the intent router"""
+
+    # Weight of the newest sample in the moving average of LLM turn latency
+    EWMA_ALPHA = 0.2
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hits = 0
+        self.hits_by_intent: Dict[str, int] = {}
+        self.router_seconds = 0.0
+        self.latency_saved_seconds = 0.0
+        # Moving average of LLM time spent on a turn that called a function
+        self.llm_function_turn_seconds: Optional[float] = None
+
+    def record_miss(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_hit(self, intent: str, seconds: float):
+        with self._lock:
+            self.requests += 1
+            self.hits += 1
+            self.hits_by_intent[intent] = self.hits_by_intent.get(intent, 0) + 1
+            self.router_seconds += seconds
+            if self.llm_function_turn_seconds is not None:
+                self.latency_saved_seconds += max(self.llm_function_turn_seconds - seconds, 0.0)
+
+    def record_llm_function_turn(self, seconds: float):
+        with self._lock:
+            if self.llm_function_turn_seconds is None:
+                self.llm_function_turn_seconds = seconds
+            else:
+                self.llm_function_turn_seconds += self.EWMA_ALPHA * (seconds - self.llm_function_turn_seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.requests if self.requests else 0.0,
+                "hits_by_intent": dict(self.hits_by_intent),
+                "avg_router_ms": 1000 * self.router_seconds / self.hits if self.hits else 0.0,
+                "avg_llm_function_turn_ms": 1000 * self.llm_function_turn_seconds
+                if self.llm_function_turn_seconds is not None else None,
+                "estimated_latency_saved_seconds": round(self.latency_saved_seconds, 3),
+                "llm_calls_saved": 2 * self.hits
+            }
+
+
+class IntentRouter:
+    """Answers unambiguous directory questions without calling the model.
+
+    Only messages phrased as a request for the list of doctors in one
+    specialty are routed; questions about a specialty or its doctors, and
+    anything mentioning dates, bookings, symptoms or negation, go to the
+    LLM as before.
+    """
+
+    def __init__(self):
+        self.metrics = RouterMetrics()
+
+    @staticmethod
+    def _find_specialties(text: str) -> List[str]:
+        found = set()
+        for phrase, specialty in SPECIALTY_PHRASES.items():
+            if re.search(rf"\b{phrase}\b", text):
+                found.add(specialty)
+        for word in re.findall(r"[a-z]+", text):
+            for stem, specialty in SPECIALTY_STEMS.items():
+                if word.startswith(stem):
+                    found.add(specialty)
+        return sorted(found)
+
+    def classify(self, text: str) -> Optional[Dict[str, Any]]:
+        """Return the function call for a high-confidence intent, or None"""
+        lowered = " ".join(text.lower().split())
+        if len(lowered.split()) > MAX_ROUTED_WORDS:
+            return None
+        if not DIRECTORY_PATTERN.search(lowered) or BLOCKING_PATTERN.search(lowered):
+            return None
+
+        specialties = self._find_specialties(lowered)
+        if len(specialties) != 1:
+            return None
+        return {"name": "find_doctors_by_specialty", "arguments": {"specialty": specialties[0]}}
+
+    @staticmethod
+    def render(function_name: str, arguments: Dict[str, Any], result: Dict[str, Any]) -> Optional[str]:
+        """Phrase a function result as the assistant reply, or None to defer to the LLM"""
+        if function_name != "find_doctors_by_specialty":
+            return None
+        doctors = result.get("doctors") or []
+        if not doctors:
+            return None
+
+        specialty = arguments["specialty"]
+        lines = [f"We have {len(doctors)} {specialty} specialist{'s' if len(doctors) != 1 else ''} at Super Clinic:"]
+        lines += [f"- {d['name']} ({d['department']})" for d in doctors]
+        lines.append("Would you like to book an appointment with one of them? "
+                     "If so, please share your preferred date and time, your full name and phone number.")
+        return "\n".join(lines)
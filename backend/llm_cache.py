@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Awaitable, Callable
+
+from config import LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES
+
+
+class CompletionCache:
+    """Coalesces identical in-flight LLM requests and caches their results briefly.
+
+    Requests are identified by a hash of the normalized payload plus a
+    stamp of the data versions the answer may depend on, so any write to
+    the doctor directory or appointment book produces new keys. Only
+    successful results are cached; failures are shared with requests that
+    were already waiting, then forgotten.
+    """
+
+    def __init__(self, ttl_seconds: float = LLM_CACHE_TTL_SECONDS, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # key -> (result, expiry time), oldest first
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def _normalize(value: Any) -> Any:
+        if isinstance(value, str):
+            return " ".join(value.split())
+        if isinstance(value, list):
+            return [CompletionCache._normalize(item) for item in value]
+        if isinstance(value, dict):
+            return {key: CompletionCache._normalize(item) for key, item in value.items()}
+        return value
+
+    def key(self, payload: Dict[str, Any], stamp: str) -> str:
+        """Cache key for a request payload; whitespace differences do not matter"""
+        normalized = json.dumps(self._normalize(payload), sort_keys=True, default=str)
+        return hashlib.sha256(f"{stamp}\n{normalized}".encode()).hexdigest()
+
+    def _lookup(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        result, expires = entry
+        if time.monotonic() > expires:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def _store(self, key: str, result: Dict[str, Any]):
+        if self.ttl_seconds <= 0:
+            return
+        self._entries[key] = (result, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_call(self, key: str, call: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Return a cached result, join an identical in-flight call, or make the call"""
+        cached = self._lookup(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # The leading request was cancelled; make our own call
+                if inflight.cancelled():
+                    return await call()
+                raise
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters re-raise it; mark it retrieved in case there are none
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+        if result.get("success"):
+            self._store(key, result)
+        future.set_result(result)
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "upstream_calls_saved_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0
+        }
@@ -0,0 +1,214 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Dict, Any, Optional, Awaitable, Callable
+
+from config import (
+    OPENAI_TIMEOUT, LLM_BREAKER_FAILURE_THRESHOLD, LLM_BREAKER_RECOVERY_SECONDS,
+    LLM_TIMEOUT_PERCENTILE, LLM_TIMEOUT_MULTIPLIER, LLM_TIMEOUT_MIN_SECONDS,
+    LLM_HEDGE_ENABLED, LLM_HEDGE_PERCENTILE
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the provider while the circuit is open"""
+
+
+class CircuitBreaker:
+    """Stops calling the provider after repeated failures.
+
+    closed: requests flow and consecutive failures are counted.
+    open: requests fail immediately until the recovery time has passed.
+    half_open: a single probe request is let through; its success closes
+    the circuit again, its failure re-opens it for another recovery period.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURE_THRESHOLD,
+                 recovery_seconds: float = LLM_BREAKER_RECOVERY_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_seconds:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now; counts the rejection if not"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self._state = self.CLOSED
+        self._failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.times_opened += 1
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def release(self):
+        """Forget a request that was abandoned before it had an outcome"""
+        self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected
+        }
+
+
+class LatencyTracker:
+    """Recent successful call latencies and the timeouts derived from them"""
+
+    # Samples needed before percentiles replace the static timeout
+    MIN_SAMPLES = 20
+
+    def __init__(self, window: int = 200, percentile: float = LLM_TIMEOUT_PERCENTILE,
+                 multiplier: float = LLM_TIMEOUT_MULTIPLIER, min_timeout: float = LLM_TIMEOUT_MIN_SECONDS,
+                 max_timeout: float = OPENAI_TIMEOUT):
+        self.samples = deque(maxlen=window)
+        self.percentile_target = percentile
+        self.multiplier = multiplier
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if len(self.samples) < self.MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def timeout(self) -> float:
+        """Per-attempt timeout: a multiple of the tail latency, within bounds"""
+        tail = self.percentile(self.percentile_target)
+        if tail is None:
+            return self.max_timeout
+        return min(self.max_timeout, max(self.min_timeout, tail * self.multiplier))
+
+
+class ResilientCaller:
+    """Runs provider calls behind a circuit breaker with adaptive timeouts.
+
+    With hedging enabled, a second identical request is sent when the first
+    is slower than the hedge percentile, and whichever answers first wins.
+    Only provider failures (timeouts, connection errors, 429 and 5xx) count
+    against the breaker.
+    """
+
+    def __init__(self, is_provider_failure: Callable[[BaseException], bool],
+                 hedge_enabled: bool = LLM_HEDGE_ENABLED, hedge_percentile: float = LLM_HEDGE_PERCENTILE):
+        self.is_provider_failure = is_provider_failure
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+    def _record_outcome(self, error: Optional[BaseException], started: float, track_latency: bool):
+        if error is None:
+            self.breaker.record_success()
+            if track_latency:
+                self.latency.record(time.monotonic() - started)
+        elif self.is_provider_failure(error):
+            self.breaker.record_failure()
+        else:
+            # The provider answered, it just did not like the request
+            self.breaker.record_success()
+
+    async def _timed(self, call: Callable[[], Awaitable[Any]], timeout: float, track_latency: bool) -> Any:
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(call(), timeout)
+        except asyncio.CancelledError:
+            # A losing hedge or a client disconnect says nothing about the provider
+            self.breaker.release()
+            raise
+        except Exception as e:
+            self._record_outcome(e, started, track_latency)
+            raise
+        self._record_outcome(None, started, track_latency)
+        return result
+
+    async def _hedged(self, call: Callable[[], Awaitable[Any]], timeout: float, hedge_delay: float) -> Any:
+        tasks = [asyncio.ensure_future(self._timed(call, timeout, True))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if done or self.breaker.state != CircuitBreaker.CLOSED:
+                return await tasks[0]
+
+            self.hedges_sent += 1
+            tasks.append(asyncio.ensure_future(self._timed(call, timeout, True)))
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is tasks[1]:
+                            self.hedges_won += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def call(self, call: Callable[[], Awaitable[Any]], streaming: bool = False) -> Any:
+        """Run one provider call; raises CircuitOpenError without calling when the circuit is open.
+
+        Streaming calls only time out while the stream is being opened, so
+        they are neither hedged nor used for the latency percentiles.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("LLM provider circuit is open, failing fast")
+        timeout = self.latency.timeout()
+        if self.hedge_enabled and not streaming:
+            hedge_delay = self.latency.percentile(self.hedge_percentile)
+            if hedge_delay is not None and hedge_delay < timeout:
+                return await self._hedged(call, timeout, hedge_delay)
+        return await self._timed(call, timeout, not streaming)
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50 = self.latency.percentile(50)
+        p95 = self.latency.percentile(95)
+        return {
+            **self.breaker.snapshot(),
+            "timeout_seconds": round(self.latency.timeout(), 3),
+            "latency_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won
+        }
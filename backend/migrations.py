@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations for existing SQLite databases.
+
+create_all() only creates missing tables. Every change to an existing
+table is a numbered step here. Steps run in order, each in its own
+transaction, and are recorded in schema_migrations. Steps must also be
+safe on fresh databases whose tables create_all() just built from the
+current models.
+
+Run ``python migrations.py`` to migrate DATABASE_URL and list the applied
+steps.
+"""
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy.engine import Connection, Engine
+
+
+def _column_names(connection: Connection, table: str) -> set:
+    return {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table})")}
+
+
+def add_availability_minutes(connection: Connection):
+    """Mirror start_time/end_time as integer minutes of the day"""
+    columns = _column_names(connection, "doctor_availability")
+    for column in ("start_minute", "end_minute"):
+        if column not in columns:
+            connection.exec_driver_sql(f"ALTER TABLE doctor_availability ADD COLUMN {column} INTEGER")
+    for column, source in (("start_minute", "start_time"), ("end_minute", "end_time")):
+        connection.exec_driver_sql(
+            f"UPDATE doctor_availability SET {column} = "
+            f"CAST(substr({source}, 1, instr({source}, ':') - 1) AS INTEGER) * 60 + "
+            f"CAST(substr({source}, instr({source}, ':') + 1) AS INTEGER) "
+            f"WHERE {column} IS NULL AND instr({source}, ':') > 0"
+        )
+
+
+def add_hot_path_indexes(connection: Connection):
+    """Indexes for the appointment conflict, working-hours and patient phone lookups"""
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_appointments_doctor_date_status "
+        "ON appointments (doctor_id, appointment_date, status)"
+    )
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_doctor_availability_doctor_day "
+        "ON doctor_availability (doctor_id, day_of_week, is_available)"
+    )
+    connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_patients_phone ON patients (phone)")
+    # Booked slots for a date are loaded across all doctors
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_appointments_date_status ON appointments (appointment_date, status)"
+    )
+
+
+def add_appointment_slots(connection: Connection):
+    """Give appointments a slot_start and make scheduled (doctor, slot) pairs unique"""
+    from models import slot_start_of
+
+    if "slot_start" not in _column_names(connection, "appointments"):
+        connection.exec_driver_sql("ALTER TABLE appointments ADD COLUMN slot_start DATETIME")
+
+    taken = set(connection.exec_driver_sql(
+        "SELECT doctor_id, slot_start FROM appointments WHERE status = 'scheduled' AND slot_start IS NOT NULL"
+    ).fetchall())
+    rows = connection.exec_driver_sql(
+        "SELECT id, doctor_id, appointment_date, status FROM appointments "
+        "WHERE slot_start IS NULL AND appointment_date IS NOT NULL ORDER BY id"
+    ).fetchall()
+    updates = []
+    for appointment_id, doctor_id, appointment_date, status in rows:
+        # Stored in SQLAlchemy's SQLite DateTime format
+        slot_start = slot_start_of(datetime.fromisoformat(appointment_date)).strftime("%Y-%m-%d %H:%M:%S.%f")
+        if status == "scheduled":
+            if (doctor_id, slot_start) in taken:
+                # An existing double booking; the later one keeps no slot so the index can be built
+                continue
+            taken.add((doctor_id, slot_start))
+        updates.append((slot_start, appointment_id))
+    if updates:
+        connection.exec_driver_sql("UPDATE appointments SET slot_start = ? WHERE id = ?", updates)
+
+    connection.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_appointments_doctor_slot "
+        "ON appointments (doctor_id, slot_start) WHERE status = 'scheduled'"
+    )
+
+
+def add_patient_appointments_index(connection: Connection):
+    """Index for listing a patient's appointments by date"""
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_appointments_patient_date ON appointments (patient_id, appointment_date)"
+    )
+
+
+# (version, name, step); append new steps, never renumber or edit applied ones
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "availability_minutes", add_availability_minutes),
+    (2, "hot_path_indexes", add_hot_path_indexes),
+    (3, "appointment_slots", add_appointment_slots),
+    (4, "patient_appointments_index", add_patient_appointments_index),
+]
+
+
+def applied_versions(connection: Connection) -> set:
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TEXT NOT NULL)"
+    )
+    return {row[0] for row in connection.exec_driver_sql("SELECT version FROM schema_migrations")}
+
+
+def run_migrations(engine: Engine) -> List[str]:
+    """Apply pending steps in order and return their names"""
+    if engine.dialect.name != "sqlite":
+        return []
+
+    with engine.begin() as connection:
+        done = applied_versions(connection)
+
+    applied = []
+    for version, name, step in MIGRATIONS:
+        if version in done:
+            continue
+        with engine.begin() as connection:
+            step(connection)
+            connection.exec_driver_sql(
+                "INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)",
+                (version, name, datetime.utcnow().isoformat())
+            )
+        applied.append(name)
+    return applied
+
+
+if __name__ == "__main__":
+    from database import engine
+    from models import Base
+
+    Base.metadata.create_all(bind=engine)
+    newly_applied = run_migrations(engine)
+    for version, name, _ in MIGRATIONS:
+        print(f"{version:4d}  {name:30s} {'applied now' if name in newly_applied else 'applied'}")
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI chat-completions API.
+
+Replies are a deterministic function of the request: messages that ask for
+doctors, availability or bookings get calls for the tools defined in
+OpenAIService._define_functions (several at once when a message names
+several doctors), tool results get a templated summary, and anything else
+gets a short canned answer. Both the tools API and legacy function calling
+are understood. Latency and error
+injection are drawn from a seeded RNG so load tests are reproducible.
+
+Run standalone with ``python mock_llm.py`` and point LLM_BASE_URL at
+http://localhost:8001/v1, or set LLM_PROVIDER=mock to serve it in-process.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from config import LLM_MODEL, MOCK_LLM_LATENCY, MOCK_LLM_ERROR_RATE, MOCK_LLM_SEED, MOCK_LLM_TOKEN_INTERVAL
+
+SPECIALTY_KEYWORDS = {
+    "cardio": "Cardiology",
+    "heart": "Cardiology",
+    "ortho": "Orthopedics",
+    "bone": "Orthopedics",
+    "ankle": "Orthopedics",
+    "neuro": "Neurology",
+    "derma": "Dermatology",
+    "skin": "Dermatology",
+    "rash": "Dermatology",
+    "pediatric": "Pediatrics",
+    "child": "Pediatrics",
+    "gyn": "Gynecology",
+    "ophthalm": "Ophthalmology",
+    "eye": "Ophthalmology",
+    "ent": "ENT",
+    "psychiat": "Psychiatry",
+    "gastro": "Gastroenterology",
+    "urolog": "Urology",
+    "pulmon": "Pulmonology",
+    "endocrin": "Endocrinology",
+    "nephro": "Nephrology",
+    "onco": "Oncology",
+    "rheumat": "Rheumatology",
+}
+
+DOCTOR_PATTERN = re.compile(r"\bdr\.?\s+([a-z]+(?:\s+[a-z]+)?)", re.IGNORECASE)
+DATE_PATTERN = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+TIME_PATTERN = re.compile(r"\b(\d{1,2})(?::(\d{2}))?\s*(am|pm)?\b", re.IGNORECASE)
+PHONE_PATTERN = re.compile(r"\+?\d[\d\s-]{8,}\d")
+NAME_PATTERN = re.compile(r"\bmy name is\s+([a-z]+(?:\s+[a-z]+)?)", re.IGNORECASE)
+
+
+class LatencyModel:
+    """Samples response latencies from a configured distribution.
+
+    Specs look like ``fixed:0.5``, ``uniform:0.2:1.5`` or
+    ``lognormal:<median>:<sigma>`` (all in seconds).
+    """
+
+    def __init__(self, spec: str, rng: random.Random):
+        parts = spec.split(":")
+        self.kind = parts[0]
+        self.params = [float(p) for p in parts[1:]]
+        self.rng = rng
+        if self.kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return self.rng.uniform(self.params[0], self.params[1])
+        median, sigma = self.params
+        return self.rng.lognormvariate(math.log(median), sigma)
+
+
+class MockChatCompletions:
+    """Builds chat-completions responses without calling a real model"""
+
+    def __init__(self, latency: str = MOCK_LLM_LATENCY, error_rate: float = MOCK_LLM_ERROR_RATE,
+                 seed: int = MOCK_LLM_SEED, token_interval: float = MOCK_LLM_TOKEN_INTERVAL):
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.latency = LatencyModel(latency, self.rng)
+        self.error_rate = error_rate
+        self.token_interval = token_interval
+
+    def draw(self) -> Tuple[float, bool]:
+        """Draw the latency and failure decision for the next request"""
+        with self.rng_lock:
+            return self.latency.sample(), self.rng.random() < self.error_rate
+
+    def _function_calls(self, text: str, function_names: List[str]) -> List[Dict[str, Any]]:
+        """Pick the function calls for the user's text; several doctors give parallel checks"""
+        lowered = text.lower()
+        doctors = [f"Dr. {match.group(1).title()}" for match in DOCTOR_PATTERN.finditer(text)]
+        date = self._parse_date(lowered)
+        time_of_day = self._parse_time(lowered)
+
+        if "book" in lowered and doctors and date and time_of_day and "book_appointment" in function_names:
+            name = NAME_PATTERN.search(text)
+            # Dates such as 2026-10-19 would otherwise pass for a phone number
+            phone = PHONE_PATTERN.search(DATE_PATTERN.sub(" ", text))
+            if name and phone:
+                return [{"name": "book_appointment", "arguments": {
+                    "doctor_name": doctors[0],
+                    "patient_name": name.group(1).title(),
+                    "patient_phone": re.sub(r"[\s-]", "", phone.group(0)),
+                    "appointment_date": date,
+                    "appointment_time": time_of_day
+                }}]
+
+        if doctors and date and time_of_day and "check_doctor_availability" in function_names:
+            return [{"name": "check_doctor_availability", "arguments": {
+                "doctor_name": doctor,
+                "date": date,
+                "time": time_of_day
+            }} for doctor in doctors]
+
+        if date and time_of_day and "get_available_doctors" in function_names:
+            return [{"name": "get_available_doctors", "arguments": {"date": date, "time": time_of_day}}]
+
+        if "find_doctors_by_specialty" in function_names:
+            for word in re.findall(r"[a-z]+", lowered):
+                for keyword, specialty in SPECIALTY_KEYWORDS.items():
+                    # "ent" is too short to match as a prefix ("entire", "enter")
+                    matched = word == keyword if keyword == "ent" else word.startswith(keyword)
+                    if matched:
+                        return [{"name": "find_doctors_by_specialty", "arguments": {"specialty": specialty}}]
+        return []
+
+    @staticmethod
+    def _parse_date(lowered: str) -> Optional[str]:
+        match = DATE_PATTERN.search(lowered)
+        if match:
+            return match.group(1)
+        if "tomorrow" in lowered:
+            return (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+        if "today" in lowered:
+            return datetime.now().strftime("%Y-%m-%d")
+        return None
+
+    @staticmethod
+    def _parse_time(lowered: str) -> Optional[str]:
+        for match in TIME_PATTERN.finditer(DATE_PATTERN.sub(" ", lowered)):
+            hour, minute, meridiem = match.group(1), match.group(2), match.group(3)
+            if minute is None and meridiem is None:
+                continue
+            hour = int(hour)
+            if meridiem and meridiem.lower() == "pm" and hour < 12:
+                hour += 12
+            if hour > 23:
+                continue
+            return f"{hour:02d}:{minute or '00'}"
+        return None
+
+    @staticmethod
+    def _summarize_result(name: str, content: str) -> str:
+        """Phrase a function result the way the assistant would"""
+        try:
+            result = json.loads(content)
+        except (TypeError, ValueError):
+            return "I've processed your request."
+
+        if "doctors" in result or "available_doctors" in result:
+            doctors = result.get("doctors", result.get("available_doctors", []))
+            if not doctors:
+                return "I couldn't find any matching doctors. Would you like to try another specialty or time?"
+            names = ", ".join(d["name"] for d in doctors)
+            return f"I found {len(doctors)} doctor(s): {names}. Would you like to book an appointment?"
+        if "available" in result:
+            if result["available"]:
+                return "Good news, the doctor is available at that time. Shall I book it for you?"
+            return f"Sorry, that slot isn't available ({result.get('reason', 'unavailable')})."
+        if "success" in result:
+            return result.get("message", "Done.")
+        if "error" in result:
+            return f"Sorry, something went wrong: {result['error']}"
+        return "I've processed your request."
+
+    def build_reply(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the assistant message (content, tool_calls or function_call) for a request"""
+        messages = body.get("messages", [])
+        last = messages[-1] if messages else {"role": "user", "content": ""}
+        tools = body.get("tools") or []
+        function_names = [f["name"] for f in body.get("functions") or []]
+        function_names += [t["function"]["name"] for t in tools]
+        if body.get("tool_choice") == "none":
+            function_names = []
+
+        if last.get("role") == "tool":
+            # Summarize every result of the preceding parallel tool calls
+            results = []
+            for message in reversed(messages):
+                if message.get("role") != "tool":
+                    break
+                results.append(self._summarize_result(None, message.get("content")))
+            return {"role": "assistant", "content": " ".join(reversed(results))}
+
+        if last.get("role") == "function":
+            return {"role": "assistant", "content": self._summarize_result(last.get("name"), last.get("content"))}
+
+        text = last.get("content") or ""
+        calls = self._function_calls(text, function_names) if function_names else []
+        if calls and tools:
+            return {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {
+                        # Derived from the call itself so identical requests get identical replies
+                        "id": "call_" + hashlib.sha1(f"{index}:{json.dumps(call, sort_keys=True)}".encode()).hexdigest()[:24],
+                        "type": "function",
+                        "function": {"name": call["name"], "arguments": json.dumps(call["arguments"])}
+                    }
+                    for index, call in enumerate(calls)
+                ]
+            }
+        if calls:
+            return {
+                "role": "assistant",
+                "content": None,
+                "function_call": {"name": calls[0]["name"], "arguments": json.dumps(calls[0]["arguments"])}
+            }
+        return {
+            "role": "assistant",
+            "content": "I can help you find a doctor, check availability or book an appointment. What would you like to do?"
+        }
+
+    @staticmethod
+    def _usage(body: Dict[str, Any], reply: Dict[str, Any]) -> Dict[str, int]:
+        # Roughly four characters per token, like the tokenizer on English text
+        prompt_tokens = len(json.dumps(body.get("messages", []))) // 4
+        completion_tokens = len(json.dumps(reply)) // 4
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+
+    @staticmethod
+    def _finish_reason(reply: Dict[str, Any]) -> str:
+        if reply.get("tool_calls"):
+            return "tool_calls"
+        if reply.get("function_call"):
+            return "function_call"
+        return "stop"
+
+    def completion(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a full chat.completion object"""
+        reply = self.build_reply(body)
+        return {
+            "id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", LLM_MODEL),
+            "choices": [{
+                "index": 0,
+                "message": reply,
+                "finish_reason": self._finish_reason(reply)
+            }],
+            "usage": self._usage(body, reply)
+        }
+
+    def chunks(self, body: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Split a reply into chat.completion.chunk objects"""
+        reply = self.build_reply(body)
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+            return {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": body.get("model", LLM_MODEL),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+
+        if reply.get("tool_calls"):
+            result = [chunk({"role": "assistant", "content": None})]
+            for index, call in enumerate(reply["tool_calls"]):
+                arguments = call["function"]["arguments"]
+                result.append(chunk({"tool_calls": [{
+                    "index": index, "id": call["id"], "type": "function",
+                    "function": {"name": call["function"]["name"], "arguments": ""}
+                }]}))
+                result += [chunk({"tool_calls": [{"index": index, "function": {"arguments": arguments[i:i + 16]}}]})
+                           for i in range(0, len(arguments), 16)]
+            result.append(chunk({}, "tool_calls"))
+            return result
+
+        if reply.get("function_call"):
+            arguments = reply["function_call"]["arguments"]
+            pieces = [arguments[i:i + 16] for i in range(0, len(arguments), 16)]
+            result = [chunk({"role": "assistant", "content": None,
+                             "function_call": {"name": reply["function_call"]["name"], "arguments": ""}})]
+            result += [chunk({"function_call": {"arguments": piece}}) for piece in pieces]
+            result.append(chunk({}, "function_call"))
+            return result
+
+        words = re.findall(r"\S+\s*", reply["content"])
+        result = [chunk({"role": "assistant", "content": ""})]
+        result += [chunk({"content": word}) for word in words]
+        result.append(chunk({}, "stop"))
+        return result
+
+
+app = FastAPI(title="Mock LLM", version="1.0.0")
+mock = MockChatCompletions()
+
+
+def _error_response() -> JSONResponse:
+    return JSONResponse(
+        status_code=500,
+        content={"error": {"message": "Injected mock upstream error", "type": "server_error", "code": None}}
+    )
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    """Chat-completions endpoint compatible with the OpenAI client"""
+    body = await request.json()
+    latency, fail = mock.draw()
+
+    if not body.get("stream"):
+        await asyncio.sleep(latency)
+        if fail:
+            return _error_response()
+        return mock.completion(body)
+
+    if fail:
+        await asyncio.sleep(latency)
+        return _error_response()
+
+    async def event_stream():
+        # Latency is the time to first token; later tokens follow at a steady pace
+        await asyncio.sleep(latency)
+        for index, chunk in enumerate(mock.chunks(body)):
+            if index:
+                await asyncio.sleep(mock.token_interval)
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.get("/v1/models")
+async def list_models():
+    return {"object": "list", "data": [{"id": LLM_MODEL, "object": "model", "owned_by": "mock"}]}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -1,10 +1,27 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text
+import re
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Index, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
-from datetime import datetime
+from sqlalchemy.orm import relationship, validates
+from datetime import datetime, timedelta
+from config import SCHEDULE_SLOT_MINUTES
 
 Base = declarative_base()
 
+# "HH:MM" on a 24-hour clock, 00:00 to 23:59
+TIME_OF_DAY = re.compile(r"([01][0-9]|2[0-3]):([0-5][0-9])")
+
+def minute_of_day(value: str) -> int:
+    """Minutes since midnight for a "HH:MM" time; raises ValueError for anything else"""
+    match = TIME_OF_DAY.fullmatch(value) if isinstance(value, str) else None
+    if match is None:
+        raise ValueError(f"Invalid time {value!r}: expected HH:MM between 00:00 and 23:59")
+    return int(match.group(1)) * 60 + int(match.group(2))
+
+def slot_start_of(when: datetime) -> datetime:
+    """Start of the fixed-size appointment slot containing a moment"""
+    minute = (when.hour * 60 + when.minute) // SCHEDULE_SLOT_MINUTES * SCHEDULE_SLOT_MINUTES
+    return datetime.combine(when.date(), datetime.min.time()) + timedelta(minutes=minute)
+
 class Doctor(Base):
     __tablename__ = "doctors"
     
@@ -22,7 +39,7 @@ class Patient(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    phone = Column(String)
+    phone = Column(String, index=True)
     email = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
     
@@ -36,6 +53,8 @@ class Appointment(Base):
     doctor_id = Column(Integer, ForeignKey("doctors.id"))
     patient_id = Column(Integer, ForeignKey("patients.id"))
     appointment_date = Column(DateTime)
+    # Start of the slot appointment_date falls in; unique per doctor among scheduled appointments
+    slot_start = Column(DateTime)
     status = Column(String, default="scheduled")  # scheduled, completed, cancelled
     notes = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -43,6 +62,24 @@ class Appointment(Base):
     # Relationships
     doctor = relationship("Doctor", back_populates="appointments")
     patient = relationship("Patient", back_populates="appointments")
+    
+    # Conflict checks filter on all three; slot loads on date and status
+    __table_args__ = (
+        Index("ix_appointments_doctor_date_status", "doctor_id", "appointment_date", "status"),
+        Index("ix_appointments_date_status", "appointment_date", "status"),
+        # A patient's appointments in date order
+        Index("ix_appointments_patient_date", "patient_id", "appointment_date"),
+        # The database itself refuses a second scheduled appointment in a doctor's slot
+        Index(
+            "ux_appointments_doctor_slot", "doctor_id", "slot_start", unique=True,
+            sqlite_where=text("status = 'scheduled'"), postgresql_where=text("status = 'scheduled'")
+        ),
+    )
+    
+    @validates("appointment_date")
+    def _sync_slot_start(self, key, value):
+        self.slot_start = slot_start_of(value) if value else None
+        return value
 
 class DoctorAvailability(Base):
     __tablename__ = "doctor_availability"
@@ -52,7 +89,30 @@ class DoctorAvailability(Base):
     day_of_week = Column(Integer)  # 0=Monday, 6=Sunday
     start_time = Column(String)  # Format: "09:00"
     end_time = Column(String)    # Format: "17:00"
+    # The same times as minutes since midnight, kept in sync with the strings for range queries
+    start_minute = Column(Integer)
+    end_minute = Column(Integer)
     is_available = Column(Boolean, default=True)
     
     # Relationship
     doctor = relationship("Doctor")
+    
+    __table_args__ = (
+        Index("ix_doctor_availability_doctor_day", "doctor_id", "day_of_week", "is_available"),
+    )
+    
+    @validates("start_time", "end_time")
+    def _sync_minutes(self, key, value):
+        minutes = minute_of_day(value) if value else None
+        if key == "start_time":
+            self.start_minute = minutes
+        else:
+            self.end_minute = minutes
+        return value
+
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+    
+    # One counter per group of tables, bumped in the same transaction as the write
+    name = Column(String, primary_key=True)  # "directory" or "appointments"
+    version = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,309 @@
+import re
+from typing import Dict, Iterable, List, Any, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from config import DIRECTORY_REFRESH_SECONDS, NAME_MATCH_MIN_SCORE
+from models import Doctor
+from versioned_index import VersionedIndex
+
+# Words that say nothing about which doctor is meant
+TITLE_WORDS = {"dr", "doctor", "prof", "professor", "mr", "mrs", "ms", "miss"}
+# Scores closer than this to the best one make a lookup ambiguous
+AMBIGUITY_MARGIN = 0.05
+# Two tokens are considered the same word above this similarity
+TOKEN_MATCH_SCORE = 0.6
+
+
+def normalize_name(name: str) -> List[str]:
+    """Lowercase name tokens without punctuation or titles"""
+    tokens = re.findall(r"[a-z0-9]+", (name or "").lower())
+    return [token for token in tokens if token not in TITLE_WORDS]
+
+
+def token_trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def dice(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def name_score(shared: int, query_grams: int, name_grams: int, covered: int, query_tokens: int) -> float:
+    """Similarity of a non-identical name from its trigram overlap and the query words it covers
+
+    Always just below an exact match, however similar.
+    """
+    return min(0.6 * 2 * shared / (query_grams + name_grams) + 0.4 * (covered / query_tokens), 0.99)
+
+
+def add_to_counts(planes: List[int], mask: int):
+    """Add one to the bit-sliced counter of every position set in mask; planes[i] holds bit i of the counts"""
+    carry = mask
+    for i, plane in enumerate(planes):
+        planes[i], carry = plane ^ carry, plane & carry
+        if not carry:
+            return
+    planes.append(carry)
+
+
+def count_masks(planes: List[int]) -> Dict[int, int]:
+    """Mask of the positions with each nonzero count of a bit-sliced counter"""
+    anywhere = 0
+    for plane in planes:
+        anywhere |= plane
+    counts = {0: anywhere} if anywhere else {}
+    # Split the positions with any count by each bit of the count, highest first
+    for plane in reversed(planes):
+        unset = ~plane
+        split = {}
+        for count, mask in counts.items():
+            ones = mask & plane
+            if ones:
+                split[2 * count + 1] = ones
+            if ones != mask:
+                split[2 * count] = mask & unset
+        counts = split
+    return counts
+
+
+def positions_mask(positions: List[int]) -> int:
+    """Bitmap with the given bits set, built in one pass rather than one big-int OR per bit"""
+    if not positions:
+        return 0
+    bits = bytearray(max(positions) // 8 + 1)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, "little")
+
+
+def lowest_positions(mask: int, limit: int) -> List[int]:
+    positions = []
+    while mask and len(positions) < limit:
+        low = mask & -mask
+        positions.append(low.bit_length() - 1)
+        mask ^= low
+    return positions
+
+
+def scan_entries(doctors: Iterable[Tuple[int, str]]) -> List[Tuple[int, List[str], List[Set[str]]]]:
+    """(id, tokens, trigrams of each token) of (id, name) pairs, for scan_scores"""
+    entries = []
+    for doctor_id, name in doctors:
+        tokens = normalize_name(name)
+        entries.append((doctor_id, tokens, [token_trigrams(token) for token in tokens]))
+    return entries
+
+
+def scan_scores(entries: List[Tuple[int, List[str], List[Set[str]]]], name: str, min_score: float,
+                limit: int = 5) -> List[Tuple[int, float]]:
+    """(id, score) of the best matches found by scoring every doctor in turn
+
+    DoctorNameIndex.search must give the same answer. Used by the tests and
+    benchmark_name_index.py; far too slow to answer lookups with.
+    """
+    tokens = normalize_name(name)
+    grams = [token_trigrams(token) for token in tokens]
+    all_grams = set().union(*grams)
+    scored = []
+    for doctor_id, doctor_tokens, doctor_grams in entries:
+        if tokens == doctor_tokens:
+            score = 1.0
+        else:
+            doctor_all_grams = set().union(*doctor_grams)
+            covered = sum(
+                1 for query_grams in grams
+                if max((dice(query_grams, g) for g in doctor_grams), default=0.0) >= TOKEN_MATCH_SCORE
+            )
+            score = name_score(len(all_grams & doctor_all_grams), len(all_grams), len(doctor_all_grams),
+                               covered, len(tokens))
+        if score >= min_score:
+            scored.append((score, doctor_id))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [(doctor_id, round(score, 3)) for score, doctor_id in scored[:limit]]
+
+
+class DoctorNameIndex(VersionedIndex):
+    """Trigram index over normalized doctor names.
+
+    Doctors get positions in id order, and every trigram and every word of
+    the directory a bitmap over those positions. A lookup adds up the
+    bitmaps of its trigrams, and of the words that match each query word,
+    in bit-sliced counters. That gives every doctor's exact trigram overlap
+    and number of covered query words at once, which with the name's
+    precomputed trigram count is all its score depends on. Doctors are
+    then taken in groups of equal score, best first and by id within a
+    group, until the best few are known; no candidate is scored one by
+    one. The index is rebuilt when the directory version changes.
+    """
+
+    def __init__(self, refresh_seconds: float = DIRECTORY_REFRESH_SECONDS, min_score: float = NAME_MATCH_MIN_SCORE):
+        super().__init__(refresh_seconds)
+        self.min_score = min_score
+        # Replaced as a whole on rebuild, so lookups can use it without the lock
+        self._built = self._build([])
+        self.rebuilds = 0
+
+    def _load(self, db: Session, stale: Set[str]) -> Dict[str, Any]:
+        self.rebuilds += 1
+        return self._build(db.query(Doctor.id, Doctor.name).order_by(Doctor.id).all())
+
+    def _install(self, loaded: Dict[str, Any], stale: Set[str]):
+        self._built = loaded
+
+    @staticmethod
+    def _build(doctors: List[Tuple[int, str]]) -> Dict[str, Any]:
+        """Bitmaps over doctor positions; doctors must come in id order"""
+        ids, names = [], []
+        # name -> positions; trigram -> positions; trigram count -> positions; word -> positions
+        exact: Dict[str, List[int]] = {}
+        gram_positions: Dict[str, List[int]] = {}
+        size_positions: Dict[int, List[int]] = {}
+        word_positions: Dict[str, List[int]] = {}
+        word_grams: Dict[str, Set[str]] = {}
+        for position, (doctor_id, name) in enumerate(doctors):
+            ids.append(doctor_id)
+            names.append(name)
+            tokens = normalize_name(name)
+            exact.setdefault(" ".join(tokens), []).append(position)
+            all_grams = set()
+            for token in tokens:
+                if token not in word_grams:
+                    word_grams[token] = token_trigrams(token)
+                word_positions.setdefault(token, []).append(position)
+                all_grams |= word_grams[token]
+            for gram in all_grams:
+                gram_positions.setdefault(gram, []).append(position)
+            size_positions.setdefault(len(all_grams), []).append(position)
+
+        word_postings: Dict[str, List[str]] = {}
+        for word, grams in word_grams.items():
+            for gram in grams:
+                # Words matching above TOKEN_MATCH_SCORE always share more than the
+                # "  k" trigram, which only says which letter a word starts with
+                if not gram.startswith("  "):
+                    word_postings.setdefault(gram, []).append(word)
+        return {
+            "ids": ids,
+            "names": names,
+            "exact": {name: positions_mask(positions) for name, positions in exact.items()},
+            "grams": {gram: positions_mask(positions) for gram, positions in gram_positions.items()},
+            # Smallest names first: for the same overlap they score highest
+            "sizes": sorted((size, positions_mask(positions)) for size, positions in size_positions.items()),
+            "words": {word: (word_grams[word], positions_mask(positions)) for word, positions in word_positions.items()},
+            "word_postings": word_postings,
+        }
+
+    @staticmethod
+    def _covering(built: Dict[str, Any], grams: Set[str]) -> int:
+        """Doctors with a word similar enough to count as the query word with these trigrams"""
+        mask = 0
+        seen = set()
+        for gram in grams:
+            for word in built["word_postings"].get(gram, ()):
+                if word not in seen:
+                    seen.add(word)
+                    word_grams, word_mask = built["words"][word]
+                    if dice(grams, word_grams) >= TOKEN_MATCH_SCORE:
+                        mask |= word_mask
+        return mask
+
+    def _counts(self, built: Dict[str, Any], grams: List[Set[str]],
+                all_grams: Set[str]) -> Tuple[Dict[int, int], Dict[int, int]]:
+        """Doctors by number of shared trigrams, and by number of covered query words"""
+        shared: List[int] = []
+        for gram in all_grams:
+            mask = built["grams"].get(gram)
+            if mask:
+                add_to_counts(shared, mask)
+        covered: List[int] = []
+        for query_grams in grams:
+            mask = self._covering(built, query_grams)
+            if mask:
+                add_to_counts(covered, mask)
+
+        covered_counts = count_masks(covered)
+        # Covering a query word takes shared trigrams, so covered doctors are among these
+        uncovered = 0
+        for plane in shared:
+            uncovered |= plane
+        for plane in covered:
+            uncovered &= ~plane
+        if uncovered:
+            covered_counts[0] = uncovered
+        return count_masks(shared), covered_counts
+
+    def search(self, db: Session, name: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Best matching doctors with scores in [0, 1], best first"""
+        tokens = normalize_name(name)
+        if not tokens:
+            return []
+        grams = [token_trigrams(token) for token in tokens]
+        all_grams = set().union(*grams)
+
+        self._refresh(db)
+        with self._lock:
+            built = self._built
+        if not built["ids"]:
+            return []
+
+        def score_of(shared: int, size: int, covered: int) -> float:
+            return name_score(shared, len(all_grams), size, covered, len(grams))
+
+        exact = built["exact"].get(" ".join(tokens), 0)
+        found = [(1.0, position) for position in lowest_positions(exact, limit)]
+        not_exact = ~exact
+        shared_counts, covered_counts = self._counts(built, grams, all_grams)
+        # Each (covered, shared) pair, bounded by the score of its smallest names;
+        # the trigram and covered-word parts of a score simply add up
+        smallest = built["sizes"][0][0]
+        trigram_parts = {shared: score_of(shared, smallest, 0) for shared in shared_counts}
+        word_parts = {covered: score_of(0, smallest, covered) for covered in covered_counts}
+        pairs = sorted(
+            ((trigram_part + word_parts[covered], covered, shared)
+             for covered in covered_counts for shared, trigram_part in trigram_parts.items()),
+            reverse=True
+        )
+        for bound, covered, shared in pairs:
+            # Scores only fall from here; an equal one can still win on id
+            floor = found[limit - 1][0] if len(found) >= limit else self.min_score
+            if bound < floor:
+                break
+            mask = shared_counts[shared] & covered_counts[covered] & not_exact
+            if not mask:
+                continue
+            for size, size_mask in built["sizes"]:
+                if score_of(shared, size, covered) < floor:
+                    break
+                if mask & size_mask:
+                    # Within a group of equal scores the lowest ids come first
+                    found += [(score_of(shared, size, covered), position)
+                              for position in lowest_positions(mask & size_mask, limit)]
+            found.sort(key=lambda item: (-item[0], item[1]))
+
+        return [
+            {"id": built["ids"][position], "name": built["names"][position], "score": round(score, 3)}
+            for score, position in found[:limit]
+        ]
+
+    def resolve(self, db: Session, name: str) -> Tuple[Optional[int], List[Dict[str, Any]]]:
+        """The id of the doctor a name clearly refers to (or None), and the ranked candidates"""
+        candidates = self.search(db, name)
+        if not candidates:
+            return None, []
+        best = candidates[0]
+        if len(candidates) > 1 and candidates[1]["score"] >= best["score"] - AMBIGUITY_MARGIN:
+            return None, candidates
+        return best["id"], candidates
+
+    def snapshot(self) -> Dict[str, Any]:
+        built = self._built
+        return {"doctors": len(built["ids"]), "trigrams": len(built["grams"]), "words": len(built["words"]),
+                "rebuilds": self.rebuilds}
+
+
+# Shared by every session in this process
+doctor_name_index = DoctorNameIndex()
@@ -1,16 +1,85 @@
 import openai
+import httpx
+import asyncio
 import json
-from typing import Dict, List, Any, Optional
-from config import OPENAI_API_KEY
+from typing import Dict, List, Any, Optional, AsyncIterator
+from config import (
+    OPENAI_API_KEY, OPENAI_TIMEOUT, OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_PROVIDER, LLM_MODEL, LLM_BASE_URL
+)
 from datetime import datetime, timedelta
+from llm_cache import CompletionCache
+from llm_resilience import ResilientCaller, CircuitOpenError
 
 openai.api_key = OPENAI_API_KEY
 
+# Placeholder host for the in-process mock; requests never leave the process
+MOCK_LLM_BASE_URL = "http://mock-llm/v1"
+
+def llm_client_options() -> Dict[str, Any]:
+    """Connection options for the configured chat-completions backend"""
+    if LLM_PROVIDER == "openai":
+        return {"api_key": OPENAI_API_KEY, "base_url": LLM_BASE_URL}
+    if LLM_PROVIDER == "mock":
+        return {"api_key": "mock", "base_url": LLM_BASE_URL or MOCK_LLM_BASE_URL}
+    raise ValueError(f"Unknown LLM_PROVIDER: {LLM_PROVIDER}")
+
+def llm_transport(is_async: bool) -> Optional[httpx.BaseTransport]:
+    """Route requests to the in-process mock when no mock server URL is set"""
+    if LLM_PROVIDER != "mock" or LLM_BASE_URL:
+        return None
+
+    import mock_llm
+    if is_async:
+        return httpx.ASGITransport(app=mock_llm.app)
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        # Synchronous clients get the same replies, without streaming
+        import time
+        body = json.loads(request.content)
+        latency, fail = mock_llm.mock.draw()
+        time.sleep(latency)
+        if fail:
+            return httpx.Response(500, json={"error": {"message": "Injected mock upstream error", "type": "server_error"}})
+        return httpx.Response(200, json=mock_llm.mock.completion(body))
+    return httpx.MockTransport(handle)
+
+def is_provider_failure(error: BaseException) -> bool:
+    """Whether an error means the provider is unhealthy, as opposed to a bad request"""
+    if isinstance(error, (asyncio.TimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
 class OpenAIService:
     def __init__(self):
-        self.client = openai.OpenAI(api_key=OPENAI_API_KEY)
+        self.model = LLM_MODEL
+        transport = llm_transport(is_async=False)
+        self.client = openai.OpenAI(
+            http_client=httpx.Client(transport=transport) if transport else None,
+            **llm_client_options()
+        )
         self.functions = self._define_functions()
+        self.tools = self._define_tools()
+        
+    def _define_tools(self) -> List[Dict]:
+        """Wrap the function definitions for the tools API"""
+        return [{"type": "function", "function": function} for function in self.functions]
+    
+    def _tool_params(self, messages: List[Dict], tools: Optional[List[Dict]] = None, allow_calls: bool = True) -> Dict:
+        """Tool parameters for a request.
         
+        With allow_calls the model may call several tools in parallel.
+        Without it, tools are still sent when the history contains tool
+        calls (the API requires them) but the model must answer in text.
+        """
+        if allow_calls:
+            return {"tools": tools or self.tools, "tool_choice": "auto", "parallel_tool_calls": True}
+        if any(message.get("tool_calls") for message in messages):
+            return {"tools": tools or self.tools, "tool_choice": "none"}
+        return {}
+    
     def _define_functions(self) -> List[Dict]:
         """Define the functions available for the chatbot"""
         return [
@@ -104,18 +173,17 @@ class OpenAIService:
             }
         ]
     
-    def get_chat_completion(self, messages: List[Dict], functions: Optional[List[Dict]] = None) -> Dict:
+    def get_chat_completion(self, messages: List[Dict], tools: Optional[List[Dict]] = None) -> Dict:
         """Get chat completion from OpenAI with retry logic"""
         max_retries = 3
         for attempt in range(max_retries):
             try:
                 response = self.client.chat.completions.create(
-                    model="gpt-3.5-turbo",
+                    model=self.model,
                     messages=messages,
-                    functions=functions or self.functions,
-                    function_call="auto",
                     temperature=0.7,
-                    timeout=30  # Add timeout
+                    timeout=OPENAI_TIMEOUT,  # Add timeout
+                    **self._tool_params(messages, tools)
                 )
                 
                 return {
@@ -139,10 +207,11 @@ class OpenAIService:
         for attempt in range(max_retries):
             try:
                 response = self.client.chat.completions.create(
-                    model="gpt-3.5-turbo",
+                    model=self.model,
                     messages=messages,
                     temperature=0.7,
-                    timeout=30  # Add timeout
+                    timeout=OPENAI_TIMEOUT,  # Add timeout
+                    **self._tool_params(messages, allow_calls=False)
                 )
                 
                 return {
@@ -159,3 +228,152 @@ class OpenAIService:
                 # Wait before retry
                 import time
                 time.sleep(1 * (attempt + 1))  # Exponential backoff
+
+
+class AsyncOpenAIService(OpenAIService):
+    """Non-blocking variant of OpenAIService for use inside the event loop"""
+
+    def __init__(self):
+        self.model = LLM_MODEL
+        # One pooled HTTP client shared by every request in this worker
+        self.http_client = httpx.AsyncClient(
+            transport=llm_transport(is_async=True),
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS
+            ),
+            timeout=OPENAI_TIMEOUT
+        )
+        # Retries are handled below so the backoff never blocks the loop
+        self.client = openai.AsyncOpenAI(
+            http_client=self.http_client,
+            max_retries=0,
+            **llm_client_options()
+        )
+        self.functions = self._define_functions()
+        self.tools = self._define_tools()
+        self.cache = CompletionCache()
+        # Shared by every request, so an outage is detected once for all of them
+        self.resilience = ResilientCaller(is_provider_failure)
+
+    async def _cached_completion(self, cache_stamp: Optional[str], **kwargs) -> Dict:
+        """Create a completion through the cache when a data version stamp is given"""
+        if cache_stamp is None:
+            return await self._create_with_retry(**kwargs)
+        key = self.cache.key({"model": self.model, **kwargs}, cache_stamp)
+        return await self.cache.get_or_call(key, lambda: self._create_with_retry(**kwargs))
+
+    async def _create_with_retry(self, **kwargs) -> Dict:
+        """Call the chat completions API, retrying with asyncio.sleep backoff.
+
+        Calls go through the circuit breaker: while it is open this returns
+        an error immediately, and a retry loop stops as soon as it opens.
+        """
+        max_retries = 3
+        for attempt in range(max_retries):
+            try:
+                response = await self.resilience.call(
+                    lambda: self.client.chat.completions.create(
+                        model=self.model,
+                        temperature=0.7,
+                        timeout=OPENAI_TIMEOUT,
+                        **kwargs
+                    ),
+                    streaming=kwargs.get("stream", False)
+                )
+                return {"success": True, "response": response}
+            except CircuitOpenError as e:
+                return {"success": False, "error": str(e)}
+            except Exception as e:
+                if attempt == max_retries - 1 or not is_provider_failure(e):
+                    return {
+                        "success": False,
+                        "error": f"OpenAI API error after {attempt + 1} attempts: {str(e)}"
+                    }
+                # Wait before retry without blocking other requests
+                await asyncio.sleep(1 * (attempt + 1))
+
+    async def get_chat_completion(self, messages: List[Dict], tools: Optional[List[Dict]] = None,
+                                  cache_stamp: Optional[str] = None) -> Dict:
+        """Get chat completion from OpenAI with retry logic"""
+        result = await self._cached_completion(
+            cache_stamp,
+            messages=messages,
+            **self._tool_params(messages, tools)
+        )
+        if not result["success"]:
+            return result
+
+        response = result["response"]
+        return {
+            "success": True,
+            "response": response.choices[0].message,
+            "usage": response.usage
+        }
+
+    async def get_simple_completion(self, messages: List[Dict], cache_stamp: Optional[str] = None) -> Dict:
+        """Get simple completion without function calling with retry logic"""
+        result = await self._cached_completion(
+            cache_stamp,
+            messages=messages,
+            **self._tool_params(messages, allow_calls=False)
+        )
+        if not result["success"]:
+            return result
+
+        response = result["response"]
+        return {
+            "success": True,
+            "response": response.choices[0].message.content,
+            "usage": response.usage
+        }
+
+    async def stream_completion(self, messages: List[Dict], allow_tool_calls: bool = False) -> AsyncIterator[Dict]:
+        """Stream a completion, yielding token events and then one complete event.
+
+        Opening the stream is retried like the other calls; a failure after
+        the first chunk ends the stream with an error event instead.
+        """
+        result = await self._create_with_retry(
+            messages=messages,
+            stream=True,
+            **self._tool_params(messages, allow_calls=allow_tool_calls)
+        )
+        if not result["success"]:
+            yield {"type": "error", "error": result["error"]}
+            return
+
+        content_parts = []
+        # index -> {"id", "name", "arguments"}; parallel calls arrive interleaved
+        tool_calls: Dict[int, Dict[str, Any]] = {}
+        try:
+            async for chunk in result["response"]:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.tool_calls:
+                    # Tool call ids, names and arguments arrive in fragments
+                    for fragment in delta.tool_calls:
+                        call = tool_calls.setdefault(fragment.index, {"id": None, "name": None, "arguments": ""})
+                        if fragment.id:
+                            call["id"] = fragment.id
+                        if fragment.function and fragment.function.name:
+                            call["name"] = fragment.function.name
+                        if fragment.function and fragment.function.arguments:
+                            call["arguments"] += fragment.function.arguments
+                elif delta.content:
+                    content_parts.append(delta.content)
+                    yield {"type": "token", "content": delta.content}
+        except Exception as e:
+            yield {"type": "error", "error": f"OpenAI stream error: {str(e)}"}
+            return
+
+        yield {
+            "type": "complete",
+            "content": "".join(content_parts) if content_parts else None,
+            "tool_calls": [tool_calls[index] for index in sorted(tool_calls)]
+        }
+
+    async def aclose(self):
+        """Release pooled connections"""
+        await self.http_client.aclose()
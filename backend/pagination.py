@@ -0,0 +1,62 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import DateTime, Select, and_, or_, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class InvalidCursorError(ValueError):
+    """A page cursor that was not issued for this listing"""
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque cursor for the sort key of the last row of a page"""
+    payload = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: Sequence[Any]) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError(cursor)
+        # Only the first of several keys may be NULL; the last is the primary key
+        if None in values[1:] or (values[0] is None and len(keys) == 1):
+            raise ValueError(cursor)
+        return [None if value is None else datetime.fromisoformat(value) if isinstance(key.type, DateTime) else int(value)
+                for key, value in zip(keys, values)]
+    except (ValueError, TypeError):
+        raise InvalidCursorError("Invalid page cursor")
+
+
+def _after(keys: Sequence[Any], after: Sequence[Any]) -> Any:
+    """Rows past the key values of a cursor, with NULLs of the first key sorted first"""
+    if after[0] is None:
+        rest = keys[1] > after[1] if len(keys) == 2 else tuple_(*keys[1:]) > tuple_(*after[1:])
+        return or_(keys[0].is_not(None), and_(keys[0].is_(None), rest))
+    # A NULL first key never compares greater, so the rows left are all non-NULL
+    return keys[0] > after[0] if len(keys) == 1 else tuple_(*keys) > tuple_(*after)
+
+
+async def keyset_page(db: AsyncSession, statement: Select, keys: Sequence[Any], cursor: Optional[str],
+                      limit: int) -> Tuple[List[Any], Optional[str]]:
+    """One page of rows ordered by keys, after the row a cursor points at
+
+    Rows are found by seeking past the last key through an index instead of
+    skipping an offset, so every page costs the same however deep it is.
+    keys must be unique together (end them with the primary key) and be
+    among the selected columns. The first key may be NULL; those rows come
+    first, as SQLite sorts them anyway. Returns the result rows and the
+    cursor of the next page, or None on the last page.
+    """
+    if cursor:
+        after = decode_cursor(cursor, keys)
+        statement = statement.where(_after(keys, after))
+    # One extra row tells whether another page follows
+    rows = list((await db.execute(statement.order_by(keys[0].asc().nulls_first(), *keys[1:]).limit(limit + 1))).all())
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], encode_cursor([getattr(last, key.key) for key in keys])
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Capture EXPLAIN QUERY PLAN for the queries the services actually run.
+
+Representative service calls are made with SQL logging hooked in. Every
+SELECT they issue is then explained against the same database. A plan
+that scans a whole table where an index lookup is expected is reported.
+The script exits with status 1 if there is one, so it can run as a check
+after schema changes:
+
+    python query_plans.py
+"""
+import sys
+from datetime import date, timedelta
+from typing import Dict, List, Any
+
+from sqlalchemy import event
+
+from database import engine, SessionLocal, create_tables
+from models import Doctor
+from name_index import doctor_name_index
+from schedule_index import schedule_index
+from services import DoctorService, PatientService, AppointmentService
+from specialty_index import specialty_index
+
+# Tables that some calls legitimately read in full (index rebuilds)
+FULL_LOAD_TABLES = ("doctors", "doctor_availability", "data_versions")
+
+
+def _service_calls(db) -> List[tuple]:
+    """(label, callable, whether full-table loads are expected) for the hot service paths"""
+    doctor = db.query(Doctor).order_by(Doctor.id).first()
+    doctor_name = doctor.name if doctor else "Dr. Nobody"
+    doctor_id = doctor.id if doctor else 0
+    monday = date.today() + timedelta(days=7 - date.today().weekday())
+    doctors = DoctorService(db)
+
+    def rebuild_indexes():
+        for index in (schedule_index, doctor_name_index, specialty_index):
+            index.invalidate()
+        doctors.get_available_doctors(monday.isoformat(), "10:00")
+        doctors.get_doctor_by_name(doctor_name)
+        doctors.get_doctors_by_specialty("cardiology")
+
+    return [
+        ("index rebuilds", rebuild_indexes, True),
+        ("strict availability check", lambda: doctors.check_doctor_availability(
+            doctor_name, monday.isoformat(), "10:00", strict=True), False),
+        ("booked slots for a date", lambda: schedule_index.free_slots(db, doctor_id, monday + timedelta(days=1)), False),
+        ("patient by phone", lambda: PatientService(db).get_patient_by_phone("+0000000000"), False),
+        ("appointments by doctor", lambda: AppointmentService(db).get_appointments_by_doctor(doctor_id), False),
+    ]
+
+
+def capture_query_plans() -> List[Dict[str, Any]]:
+    """Explain every SELECT issued by the service calls"""
+    create_tables()
+    db = SessionLocal()
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    try:
+        calls = _service_calls(db)
+        reports = []
+        for label, call, full_loads_expected in calls:
+            captured.clear()
+            event.listen(engine, "before_cursor_execute", capture)
+            try:
+                call()
+            finally:
+                event.remove(engine, "before_cursor_execute", capture)
+
+            for statement, parameters in list(captured):
+                plan = [row[3] for row in db.connection().exec_driver_sql(
+                    f"EXPLAIN QUERY PLAN {statement}", parameters
+                ).fetchall()]
+                full_scans = [
+                    step for step in plan
+                    if step.startswith("SCAN ") and " USING " not in step and step != "SCAN CONSTANT ROW"
+                    and not (full_loads_expected and step.split()[1] in FULL_LOAD_TABLES)
+                ]
+                reports.append({"call": label, "sql": " ".join(statement.split()), "plan": plan, "full_scans": full_scans})
+        return reports
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    reports = capture_query_plans()
+    for report in reports:
+        print(f"[{report['call']}] {report['sql'][:160]}")
+        for step in report["plan"]:
+            print(f"    {step}")
+        if report["full_scans"]:
+            print("    !! unexpected full table scan")
+    sys.exit(1 if any(report["full_scans"] for report in reports) else 0)
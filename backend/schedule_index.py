@@ -0,0 +1,250 @@
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Any, Optional, Set
+
+from sqlalchemy import and_, exists, func
+from sqlalchemy.orm import Session
+
+from config import SCHEDULE_SLOT_MINUTES, SCHEDULE_REFRESH_SECONDS, SCHEDULE_MAX_DATES
+from models import Doctor, Appointment, DoctorAvailability, slot_start_of
+from versioned_index import VersionedIndex
+
+
+class ScheduleIndex(VersionedIndex):
+    """In-memory bitmaps of working and booked slots per doctor.
+
+    A day is cut into fixed-size slots; bit n of a mask stands for the slot
+    starting n * slot_minutes after midnight. Working hours are kept as one
+    mask per doctor and weekday, bookings as one mask per doctor and date,
+    so availability checks are a couple of bit operations.
+
+    The index tracks the data versions it was built from. Bookings made in
+    this process update it in place; writes from other workers are picked
+    up by comparing versions at most every ``refresh_seconds``, after which
+    the affected part is rebuilt on next use. Strict checks bypass the
+    bitmaps and ask the database directly.
+    """
+
+    FREE = "free"
+    BOOKED = "booked"
+    DAY_OFF = "day_off"
+    OUTSIDE_HOURS = "outside_hours"
+
+    VERSIONS = ("directory", "appointments")
+
+    def __init__(self, slot_minutes: int = SCHEDULE_SLOT_MINUTES, refresh_seconds: float = SCHEDULE_REFRESH_SECONDS,
+                 max_dates: int = SCHEDULE_MAX_DATES):
+        super().__init__(refresh_seconds)
+        self.slot_minutes = slot_minutes
+        self.max_dates = max_dates
+        # doctor_id -> directory entry, in id order
+        self._doctors: Dict[int, Dict[str, Any]] = {}
+        # doctor_id -> seven working masks, Monday first
+        self._working: Dict[int, List[int]] = {}
+        # date -> {doctor_id: booked mask}, least recently used first
+        self._booked: "OrderedDict[date, Dict[int, int]]" = OrderedDict()
+        self.rebuilds = 0
+        self.date_loads = 0
+
+    def slot_of(self, when: datetime) -> int:
+        return (when.hour * 60 + when.minute) // self.slot_minutes
+
+    def slot_label(self, slot: int) -> str:
+        minutes = slot * self.slot_minutes
+        return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+    def _hours_mask(self, start_minute: int, end_minute: int) -> int:
+        """Slots that lie entirely inside [start_minute, end_minute)"""
+        first = -(-start_minute // self.slot_minutes)  # round up to a slot boundary
+        last = end_minute // self.slot_minutes
+        if last <= first:
+            return 0
+        return ((1 << (last - first)) - 1) << first
+
+    def _load(self, db: Session, stale: Set[str]) -> Optional[tuple]:
+        return self._load_directory(db) if "directory" in stale else None
+
+    def _install(self, loaded: Optional[tuple], stale: Set[str]):
+        if "directory" in stale:
+            self._doctors, self._working = loaded
+        # Booked slots are rebuilt per date on next use
+        self._clear_bookings()
+
+    def _load_directory(self, db: Session) -> tuple:
+        """Directory entries and weekly working masks, built without touching shared state"""
+        self.rebuilds += 1
+        doctors = {
+            doctor.id: {"id": doctor.id, "name": doctor.name, "specialty": doctor.specialty, "department": doctor.department}
+            for doctor in db.query(Doctor).order_by(Doctor.id)
+        }
+        working = {doctor_id: [0] * 7 for doctor_id in doctors}
+        rows = db.query(
+            DoctorAvailability.doctor_id, DoctorAvailability.day_of_week,
+            DoctorAvailability.start_minute, DoctorAvailability.end_minute
+        ).filter(DoctorAvailability.is_available == True, DoctorAvailability.start_minute != None)
+        for doctor_id, day_of_week, start_minute, end_minute in rows:
+            if doctor_id in working and 0 <= day_of_week <= 6:
+                working[doctor_id][day_of_week] |= self._hours_mask(start_minute, end_minute)
+        return doctors, working
+
+    def _clear_bookings(self):
+        # Callers hold the lock; loads that started before this are not cached
+        self._booked.clear()
+        self._generation += 1
+
+    def _booked_on(self, db: Session, day: date) -> Dict[int, int]:
+        with self._lock:
+            masks = self._booked.get(day)
+            if masks is not None:
+                self._booked.move_to_end(day)
+                return masks
+            generation = self._generation
+
+        self.date_loads += 1
+        start = datetime.combine(day, datetime.min.time())
+        rows = db.query(Appointment.doctor_id, Appointment.appointment_date).filter(
+            Appointment.appointment_date >= start,
+            Appointment.appointment_date < start + timedelta(days=1),
+            Appointment.status == "scheduled"
+        )
+        masks = {}
+        for doctor_id, appointment_date in rows:
+            masks[doctor_id] = masks.get(doctor_id, 0) | (1 << self.slot_of(appointment_date))
+
+        with self._lock:
+            if self._generation == generation:
+                self._booked[day] = masks
+                while len(self._booked) > self.max_dates:
+                    self._booked.popitem(last=False)
+        return masks
+
+    def _database_slot_status(self, db: Session, doctor_id: int, when: datetime) -> str:
+        """slot_status answered by one query against the tables themselves"""
+        slot_start = slot_start_of(when)
+        slot_minute = slot_start.hour * 60 + slot_start.minute
+        working_day = and_(
+            DoctorAvailability.doctor_id == doctor_id,
+            DoctorAvailability.day_of_week == when.weekday(),
+            DoctorAvailability.is_available == True
+        )
+        covers_slot = and_(
+            DoctorAvailability.start_minute <= slot_minute,
+            DoctorAvailability.end_minute >= slot_minute + self.slot_minutes
+        )
+        booked = exists().where(
+            Appointment.doctor_id == doctor_id,
+            Appointment.slot_start == slot_start,
+            Appointment.status == "scheduled"
+        )
+        is_booked, working_rows, covering_rows = db.query(
+            booked,
+            db.query(func.count(DoctorAvailability.id)).filter(working_day).scalar_subquery(),
+            db.query(func.count(DoctorAvailability.id)).filter(working_day, covers_slot).scalar_subquery()
+        ).one()
+        if is_booked:
+            return self.BOOKED
+        if not working_rows:
+            return self.DAY_OFF
+        if not covering_rows:
+            return self.OUTSIDE_HOURS
+        return self.FREE
+
+    def slot_status(self, db: Session, doctor_id: int, when: datetime, strict: bool = False) -> str:
+        """FREE, BOOKED, DAY_OFF or OUTSIDE_HOURS for a doctor at a moment
+
+        strict skips the bitmaps, which may lag other workers' writes, and
+        checks the database instead; booking relies on it.
+        """
+        if strict:
+            return self._database_slot_status(db, doctor_id, when)
+        self._refresh(db)
+        booked = self._booked_on(db, when.date())
+        bit = 1 << self.slot_of(when)
+        with self._lock:
+            if booked.get(doctor_id, 0) & bit:
+                return self.BOOKED
+            working = self._working.get(doctor_id, [0] * 7)[when.weekday()]
+        if not working:
+            return self.DAY_OFF
+        if not working & bit:
+            return self.OUTSIDE_HOURS
+        return self.FREE
+
+    def available_doctors(self, db: Session, when: datetime) -> List[Dict[str, Any]]:
+        """Directory entries of every doctor with a free slot at that moment"""
+        self._refresh(db)
+        booked = self._booked_on(db, when.date())
+        bit = 1 << self.slot_of(when)
+        weekday = when.weekday()
+        with self._lock:
+            return [
+                dict(doctor) for doctor_id, doctor in self._doctors.items()
+                if self._working[doctor_id][weekday] & ~booked.get(doctor_id, 0) & bit
+            ]
+
+    def free_slots(self, db: Session, doctor_id: int, day: date, after: Optional[datetime] = None) -> List[str]:
+        """Start times of a doctor's free slots on a date, optionally only those after a moment"""
+        self._refresh(db)
+        booked = self._booked_on(db, day)
+        with self._lock:
+            free = self._working.get(doctor_id, [0] * 7)[day.weekday()] & ~booked.get(doctor_id, 0)
+        if after is not None and after.date() == day:
+            free &= ~((1 << (self.slot_of(after) + 1)) - 1)
+        return [self.slot_label(slot) for slot in range(free.bit_length()) if free >> slot & 1]
+
+    def next_free_slot(self, db: Session, doctor_id: int, after: datetime, days: int = 14) -> Optional[datetime]:
+        """Start of the doctor's first free slot after a moment, looking ahead up to a number of days"""
+        self._refresh(db)
+        with self._lock:
+            working = list(self._working.get(doctor_id, [0] * 7))
+        for offset in range(days + 1):
+            day = after.date() + timedelta(days=offset)
+            free = working[day.weekday()]
+            if not free:
+                continue
+            booked = self._booked_on(db, day)
+            with self._lock:
+                free &= ~booked.get(doctor_id, 0)
+            if offset == 0:
+                free &= ~((1 << (self.slot_of(after) + 1)) - 1)
+            if free:
+                # Lowest set bit is the earliest free slot
+                slot = (free & -free).bit_length() - 1
+                return datetime.combine(day, datetime.min.time()) + timedelta(minutes=slot * self.slot_minutes)
+        return None
+
+    def record_booking(self, doctor_id: int, when: datetime, appointments_version: int):
+        """Mark a slot booked after this process committed an appointment"""
+        with self._lock:
+            known = self._versions["appointments"]
+            if known is None or appointments_version != known + 1:
+                # Another worker wrote in between; rebuild booked slots on next use
+                self._clear_bookings()
+                self._versions["appointments"] = None
+                return
+            masks = self._booked.get(when.date())
+            if masks is not None:
+                masks[doctor_id] = masks.get(doctor_id, 0) | (1 << self.slot_of(when))
+            # Loads of other dates that started before this booking may miss it
+            self._generation += 1
+            self._versions["appointments"] = appointments_version
+
+    def forget_bookings(self):
+        """Reload booked slots on next use, e.g. after a booking lost a race"""
+        with self._lock:
+            self._clear_bookings()
+            self._versions["appointments"] = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "slot_minutes": self.slot_minutes,
+                "doctors": len(self._doctors),
+                "dates_loaded": len(self._booked),
+                "rebuilds": self.rebuilds,
+                "date_loads": self.date_loads
+            }
+
+
+# Shared by every session in this process
+schedule_index = ScheduleIndex()
@@ -1,7 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from datetime import datetime
 from typing import Optional, List
 
+from models import minute_of_day
+
 class DoctorBase(BaseModel):
     name: str
     specialty: str
@@ -57,7 +59,11 @@ class DoctorAvailabilityBase(BaseModel):
     is_available: bool = True
 
 class DoctorAvailabilityCreate(DoctorAvailabilityBase):
-    pass
+    @field_validator("start_time", "end_time")
+    @classmethod
+    def _time_of_day(cls, value: str) -> str:
+        minute_of_day(value)
+        return value
 
 class DoctorAvailability(DoctorAvailabilityBase):
     id: int
@@ -74,3 +80,4 @@ class ChatResponse(BaseModel):
     session_id: str
     function_called: Optional[str] = None
     function_result: Optional[dict] = None
+    tool_calls: Optional[List[dict]] = None
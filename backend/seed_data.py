@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Synthetic data for a large clinic, loaded in bulk.
+
+Generates doctors, their weekly working hours, patients and appointments
+over a date range. Specialties are skewed the way clinic demand is:
+general medicine and pediatrics have the most doctors, and each of those
+doctors is also busier than a rheumatologist. Within a specialty some
+doctors are more popular than others.
+
+Rows are written with executemany on the driver connection, in chunks and
+in one transaction, so a million appointments load in seconds:
+
+    python seed_data.py --doctors 2000 --patients 200000 --appointments 1000000
+
+Appointments are spread over distinct working slots of their doctor, so
+they satisfy the one-scheduled-appointment-per-slot index. Those before
+now are completed or cancelled, the rest mostly scheduled. New rows are
+added after existing ones; --reset clears the clinic tables first.
+SQLite only, like migrations.py.
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+from bisect import bisect_left
+from contextlib import contextmanager
+from itertools import islice, repeat
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from sqlalchemy.engine import Connection
+
+from config import SCHEDULE_SLOT_MINUTES
+from database import SessionLocal, create_tables
+from models import Doctor, Patient, Appointment, DoctorAvailability, minute_of_day
+from services import DataVersionService
+
+# Relative share of doctors and of demand per specialty
+SPECIALTY_WEIGHTS = {
+    "General Medicine": 20,
+    "Pediatrics": 12,
+    "Gynecology": 10,
+    "Orthopedics": 9,
+    "Cardiology": 8,
+    "Dermatology": 8,
+    "ENT": 6,
+    "Ophthalmology": 6,
+    "Gastroenterology": 5,
+    "Psychiatry": 4,
+    "Neurology": 4,
+    "Pulmonology": 3,
+    "Endocrinology": 3,
+    "Urology": 3,
+    "Nephrology": 2,
+    "Oncology": 2,
+    "Rheumatology": 1,
+}
+DEPARTMENTS = {"General Medicine": "Internal Medicine"}
+FIRST_NAMES = [
+    "Aarav", "Aditi", "Amit", "Anjali", "Arjun", "Deepa", "Farah", "Gaurav", "Isha", "Karan", "Kavita", "Lakshmi",
+    "Manoj", "Meera", "Naveen", "Neha", "Pooja", "Pradeep", "Priya", "Rahul", "Rajesh", "Ritu", "Rohan", "Sanjay",
+    "Shreya", "Sneha", "Sunil", "Sunita", "Tanvi", "Uday", "Varun", "Vidya", "Vikram", "Yash", "Zoya", "Harish",
+]
+LAST_NAMES = [
+    "Agarwal", "Bhatia", "Chopra", "Das", "Desai", "Gupta", "Iyer", "Jain", "Joshi", "Kapoor", "Khanna", "Krishnan",
+    "Kumar", "Malhotra", "Mehta", "Menon", "Nair", "Pandey", "Patel", "Rao", "Reddy", "Saxena", "Shah", "Sharma",
+    "Singh", "Sinha", "Tiwari", "Varma", "Venkatesh", "Verma", "Yadav", "Bose", "Ghosh", "Mishra", "Pillai", "Qureshi",
+]
+# Weekly working patterns: (weekdays, start, end)
+SHIFTS = [
+    ((0, 1, 2, 3, 4), "09:00", "17:00"),
+    ((0, 1, 2, 3, 4), "08:00", "14:00"),
+    ((0, 1, 2, 3, 4, 5), "10:00", "16:00"),
+    ((0, 2, 4), "12:00", "20:00"),
+    ((1, 3, 5), "08:00", "13:00"),
+]
+# Share of appointments before now that were cancelled, and of later ones
+PAST_CANCELLED = 0.08
+FUTURE_CANCELLED = 0.05
+CHUNK_SIZE = 50000
+# How SQLAlchemy stores DateTime in SQLite
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def bulk_insert(connection: Connection, table: str, columns: Tuple[str, ...], rows: Iterable[tuple],
+                chunk_size: int = CHUNK_SIZE) -> int:
+    """executemany in chunks of driver-ready tuples; returns the number of rows"""
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    rows, count = iter(rows), 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return count
+        connection.exec_driver_sql(sql, chunk)
+        count += len(chunk)
+
+
+@contextmanager
+def indexes_deferred(connection: Connection, table: str):
+    """Drop a table's secondary indexes for a load and build them again afterwards
+
+    Building an index once over sorted rows is much cheaper than updating
+    several of them for every inserted row.
+    """
+    indexes = connection.exec_driver_sql(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)
+    ).fetchall()
+    for name, _ in indexes:
+        connection.exec_driver_sql(f"DROP INDEX {name}")
+    yield
+    for _, sql in indexes:
+        connection.exec_driver_sql(sql)
+
+
+def shift_slots(shift: Tuple[Tuple[int, ...], str, str], start: date, days: int) -> List[str]:
+    """Start of every slot a shift covers in the date range, formatted for the database"""
+    weekdays, start_time, end_time = shift
+    first = -(-minute_of_day(start_time) // SCHEDULE_SLOT_MINUTES)
+    last = minute_of_day(end_time) // SCHEDULE_SLOT_MINUTES
+    slots = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        if day.weekday() in weekdays:
+            midnight = datetime.combine(day, datetime.min.time())
+            slots += [
+                (midnight + timedelta(minutes=slot * SCHEDULE_SLOT_MINUTES)).strftime(DATETIME_FORMAT)
+                for slot in range(first, last)
+            ]
+    return slots
+
+
+def doctor_names(rnd: random.Random, count: int) -> List[str]:
+    """Distinct names while the name space lasts, with a middle initial to widen it"""
+    initials = "ABCDEGHJKLMNPRSTV"
+    space = len(FIRST_NAMES) * len(initials) * len(LAST_NAMES)
+    picks = rnd.sample(range(space), count) if count <= space else [rnd.randrange(space) for _ in range(count)]
+    names = []
+    for pick in picks:
+        pick, first = divmod(pick, len(FIRST_NAMES))
+        last, initial = divmod(pick, len(initials))
+        names.append(f"Dr. {FIRST_NAMES[first]} {initials[initial]}. {LAST_NAMES[last]}")
+    return names
+
+
+def appointment_counts(weights: List[float], capacities: List[int], total: int) -> List[int]:
+    """Split a total in proportion to weights without exceeding any capacity"""
+    weight_sum = sum(weights) or 1.0
+    counts = [min(int(total * weight / weight_sum), capacity) for weight, capacity in zip(weights, capacities)]
+    left = total - sum(counts)
+    # What rounding and full calendars left over goes to the busiest doctors with room
+    for i in sorted(range(len(weights)), key=lambda i: -weights[i]):
+        if left <= 0:
+            break
+        extra = min(left, capacities[i] - counts[i])
+        counts[i] += extra
+        left -= extra
+    return counts
+
+
+def generate(connection: Connection, doctors: int, patients: int, appointments: int, start: date, days: int,
+             seed: int) -> Dict[str, int]:
+    rnd = random.Random(seed)
+    now = datetime.now().strftime(DATETIME_FORMAT)
+    next_id = {
+        table: (connection.exec_driver_sql(f"SELECT MAX(id) FROM {table}").scalar() or 0) + 1
+        for table in ("doctors", "doctor_availability", "patients", "appointments")
+    }
+
+    specialties = list(SPECIALTY_WEIGHTS)
+    doctor_rows, doctor_shifts, demand = [], [], []
+    for i, name in enumerate(doctor_names(rnd, doctors)):
+        specialty = rnd.choices(specialties, weights=list(SPECIALTY_WEIGHTS.values()))[0]
+        doctor_rows.append((next_id["doctors"] + i, name, specialty, DEPARTMENTS.get(specialty, specialty), now))
+        doctor_shifts.append(rnd.randrange(len(SHIFTS)))
+        # Busy specialties have more doctors and busier ones; popularity varies per doctor
+        demand.append(SPECIALTY_WEIGHTS[specialty] * rnd.lognormvariate(0, 0.5))
+
+    availability_rows = []
+    for (doctor_id, *_), shift in zip(doctor_rows, doctor_shifts):
+        weekdays, start_time, end_time = SHIFTS[shift]
+        for weekday in weekdays:
+            availability_rows.append((
+                next_id["doctor_availability"] + len(availability_rows), doctor_id, weekday, start_time, end_time,
+                minute_of_day(start_time), minute_of_day(end_time), 1
+            ))
+
+    slots = [shift_slots(shift, start, days) for shift in SHIFTS]
+    booked = appointment_counts(demand, [len(slots[shift]) for shift in doctor_shifts], appointments)
+    first_patient = next_id["patients"]
+
+    def appointment_rows() -> Iterator[tuple]:
+        # One doctor at a time as whole lists; per-row Python work is what limits the load rate
+        appointment_id = next_id["appointments"]
+        uniform = rnd.random
+        for (doctor_id, *_), shift, count in zip(doctor_rows, doctor_shifts, booked):
+            calendar = slots[shift]
+            # Distinct slots, in order, so each doctor's rows are adjacent in the indexes
+            whens = [calendar[slot] for slot in sorted(rnd.sample(range(len(calendar)), count))]
+            past = bisect_left(whens, now)
+            statuses = (
+                ["cancelled" if uniform() < PAST_CANCELLED else "completed" for _ in range(past)]
+                + ["cancelled" if uniform() < FUTURE_CANCELLED else "scheduled" for _ in range(count - past)]
+            )
+            patient_ids = [first_patient + int(uniform() * patients) for _ in range(count)]
+            yield from zip(
+                range(appointment_id, appointment_id + count), repeat(doctor_id), patient_ids, whens, whens,
+                statuses, repeat(now)
+            )
+            appointment_id += count
+
+    def patient_rows() -> Iterator[tuple]:
+        for i in range(patients):
+            name = f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}"
+            patient_id = first_patient + i
+            yield (patient_id, name, f"+91{9000000000 + patient_id}", f"patient{patient_id}@example.com", now)
+
+    counts = {
+        "doctors": bulk_insert(connection, "doctors", ("id", "name", "specialty", "department", "created_at"), doctor_rows),
+        "availability": bulk_insert(connection, "doctor_availability", (
+            "id", "doctor_id", "day_of_week", "start_time", "end_time", "start_minute", "end_minute", "is_available"
+        ), availability_rows),
+    }
+    with indexes_deferred(connection, "patients"):
+        counts["patients"] = bulk_insert(connection, "patients", ("id", "name", "phone", "email", "created_at"), patient_rows())
+    with indexes_deferred(connection, "appointments"):
+        counts["appointments"] = bulk_insert(connection, "appointments", (
+            "id", "doctor_id", "patient_id", "appointment_date", "slot_start", "status", "created_at"
+        ), appointment_rows() if patients else iter(()))
+    return counts
+
+
+def seed(doctors: int, patients: int, appointments: int, start: date, days: int, seed: int = 42,
+         reset: bool = False) -> Dict[str, int]:
+    """Generate and insert a synthetic clinic in one transaction; returns row counts per table"""
+    create_tables()
+    db = SessionLocal()
+    try:
+        if reset:
+            for model in (Appointment, DoctorAvailability, Patient, Doctor):
+                db.query(model).delete()
+        counts = generate(db.connection(), doctors, patients, appointments, start, days, seed)
+        data_versions = DataVersionService(db)
+        data_versions.bump(DataVersionService.DIRECTORY)
+        data_versions.bump(DataVersionService.APPOINTMENTS)
+        db.commit()
+        return counts
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load a synthetic large clinic into DATABASE_URL")
+    parser.add_argument("--doctors", type=int, default=2000)
+    parser.add_argument("--patients", type=int, default=200000)
+    parser.add_argument("--appointments", type=int, default=1000000)
+    parser.add_argument("--start", type=date.fromisoformat, default=date.today() - timedelta(days=180),
+                        help="first date of the range (default: 180 days ago)")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="delete existing doctors, patients and appointments first")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = seed(args.doctors, args.patients, args.appointments, args.start, args.days, args.seed, args.reset)
+    elapsed = time.perf_counter() - started
+    for table, count in counts.items():
+        print(f"{table:14s} {count:10d}")
+    if counts["appointments"] < args.appointments:
+        print(f"Only {counts['appointments']} appointments fit the doctors' working slots in the date range")
+    print(f"Loaded in {elapsed:.1f}s")
@@ -0,0 +1,43 @@
+from operator import attrgetter
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Type
+
+import orjson
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson, which writes datetimes itself and is several times faster"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+def schema_columns(schema: Type[BaseModel], model: Any) -> List[Any]:
+    """The model's columns for each field of a response schema, in the schema's field order"""
+    return [getattr(model, name) for name in schema.model_fields]
+
+
+def rows_to_dicts(rows: List[Any]) -> List[Dict[str, Any]]:
+    """Plain dicts from result rows, keyed by column label"""
+    if not rows:
+        return []
+    fields = rows[0]._fields
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def objects_to_dicts(objects: Iterable[Any], schema: Type[BaseModel]) -> List[Dict[str, Any]]:
+    """Plain dicts with the fields of a response schema, read off ORM objects"""
+    fields = list(schema.model_fields)
+    values = attrgetter(*fields)
+    return [dict(zip(fields, values(obj))) for obj in objects]
+
+
+def json_response(content: Any, headers: Optional[Mapping[str, str]] = None) -> FastJSONResponse:
+    """Encode trusted database output without response_model validation
+
+    Only for rows that came from the database through schema_columns or
+    objects_to_dicts: their types already match the schema, and the JSON is
+    the same bytes FastAPI would have produced after validating them.
+    """
+    return FastJSONResponse(content, headers=dict(headers) if headers else None)
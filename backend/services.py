@@ -1,10 +1,83 @@
+from sqlalchemy import Row, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from models import Doctor, Patient, Appointment, DoctorAvailability
+from database import AsyncSessionLocal
+from pydantic import TypeAdapter, ValidationError
+from pagination import keyset_page
+from ingestion import ParsedRow
+from serialization import schema_columns
+from models import Doctor, Patient, Appointment, DoctorAvailability, DataVersion, minute_of_day
+import schemas
 from schemas import DoctorCreate, PatientCreate, AppointmentCreate, DoctorAvailabilityCreate
-from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+from schedule_index import schedule_index
+from name_index import doctor_name_index
+from specialty_index import specialty_index
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Dict, Any, Tuple, AsyncIterator
+from functools import lru_cache
+import asyncio
 import re
 
+# Columns of list rows: exactly the fields of the response schemas, so rows
+# can be encoded without loading ORM objects or validating them
+DOCTOR_COLUMNS = schema_columns(schemas.Doctor, Doctor)
+PATIENT_COLUMNS = schema_columns(schemas.Patient, Patient)
+APPOINTMENT_COLUMNS = schema_columns(schemas.Appointment, Appointment)
+AVAILABILITY_COLUMNS = schema_columns(schemas.DoctorAvailability, DoctorAvailability)
+
+# Columns of export rows, in CSV order
+APPOINTMENT_EXPORT_COLUMNS = [
+    "appointment_id", "appointment_date", "status", "notes", "doctor_id", "doctor_name", "specialty",
+    "patient_id", "patient_name", "patient_phone",
+]
+SCHEDULE_EXPORT_COLUMNS = [
+    "availability_id", "doctor_id", "doctor_name", "specialty", "department", "day_of_week", "start_time",
+    "end_time", "is_available",
+]
+
+# Why a slot cannot be booked, by schedule_index status
+SLOT_UNAVAILABLE_REASONS = {
+    schedule_index.BOOKED: "Doctor already has an appointment at this time",
+    schedule_index.DAY_OFF: "Doctor not available on this day",
+    schedule_index.OUTSIDE_HOURS: "Time is outside doctor's working hours",
+}
+
+class DataVersionService:
+    """Version counters that let caches detect writes from any worker
+    
+    "directory" covers doctors and their availability, "appointments" the
+    appointment book. Bumps join the caller's transaction, so the new
+    version becomes visible exactly when the write is committed.
+    """
+    DIRECTORY = "directory"
+    APPOINTMENTS = "appointments"
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def get(self, name: str) -> int:
+        version = self.db.query(DataVersion.version).filter(DataVersion.name == name).scalar()
+        return version or 0
+    
+    def get_all(self) -> Dict[str, int]:
+        return dict(self.db.query(DataVersion.name, DataVersion.version).all())
+    
+    def stamp(self) -> str:
+        """Compact string identifying the current state of all versioned data"""
+        versions = self.get_all()
+        return ",".join(f"{name}:{versions.get(name, 0)}" for name in (self.DIRECTORY, self.APPOINTMENTS))
+    
+    def bump(self, name: str) -> int:
+        """Increment a version inside the current transaction and return the new value"""
+        updated = self.db.query(DataVersion).filter(DataVersion.name == name).update(
+            {DataVersion.version: DataVersion.version + 1}, synchronize_session=False
+        )
+        if not updated:
+            self.db.add(DataVersion(name=name, version=1))
+        self.db.flush()
+        return self.get(name)
+
 class DoctorService:
     def __init__(self, db: Session):
         self.db = db
@@ -12,24 +85,61 @@ class DoctorService:
     def create_doctor(self, doctor: DoctorCreate) -> Doctor:
         db_doctor = Doctor(**doctor.dict())
         self.db.add(db_doctor)
+        DataVersionService(self.db).bump(DataVersionService.DIRECTORY)
         self.db.commit()
+        schedule_index.invalidate()
+        doctor_name_index.invalidate()
+        specialty_index.invalidate()
         self.db.refresh(db_doctor)
         return db_doctor
     
+    def create_availability(self, availability: DoctorAvailabilityCreate) -> DoctorAvailability:
+        db_availability = DoctorAvailability(**availability.dict())
+        self.db.add(db_availability)
+        DataVersionService(self.db).bump(DataVersionService.DIRECTORY)
+        self.db.commit()
+        schedule_index.invalidate()
+        self.db.refresh(db_availability)
+        return db_availability
+    
     def get_doctor_by_name(self, name: str) -> Optional[Doctor]:
-        return self.db.query(Doctor).filter(Doctor.name.ilike(f"%{name}%")).first()
+        """The doctor a possibly misspelt name clearly refers to, or None if none or several match"""
+        doctor_id, _ = doctor_name_index.resolve(self.db, name)
+        return self.db.get(Doctor, doctor_id) if doctor_id is not None else None
+    
+    def search_doctors_by_name(self, name: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Ranked name matches with scores, best first"""
+        return doctor_name_index.search(self.db, name, limit)
     
     def get_doctors_by_specialty(self, specialty: str) -> List[Doctor]:
-        return self.db.query(Doctor).filter(Doctor.specialty.ilike(f"%{specialty}%")).all()
+        """Doctors in the specialty a term such as "skin doctor" or "ortho" refers to"""
+        doctor_ids = specialty_index.doctor_ids(self.db, specialty)
+        if not doctor_ids:
+            return []
+        return self.db.query(Doctor).filter(Doctor.id.in_(doctor_ids)).order_by(Doctor.id).all()
+    
+    def get_specialties(self) -> List[str]:
+        return specialty_index.specialties(self.db)
     
     def get_all_doctors(self) -> List[Doctor]:
         return self.db.query(Doctor).all()
     
-    def check_doctor_availability(self, doctor_name: str, date: str, time: str) -> Dict[str, Any]:
-        """Check if a doctor is available at a specific date and time"""
-        doctor = self.get_doctor_by_name(doctor_name)
-        if not doctor:
-            return {"available": False, "reason": "Doctor not found"}
+    def check_doctor_availability(self, doctor_name: str, date: str, time: str, strict: bool = False) -> Dict[str, Any]:
+        """Check if a doctor is available at a specific date and time
+        
+        With strict the working-hours and conflict checks run as one query
+        against the database, as booking requires; otherwise the in-memory
+        schedule answers and may lag writes from other workers by up to
+        SCHEDULE_REFRESH_SECONDS.
+        """
+        doctor_id, candidates = doctor_name_index.resolve(self.db, doctor_name)
+        if doctor_id is None:
+            result = {"available": False, "reason": "Doctor not found"}
+            if candidates:
+                result["reason"] = "Several doctors match that name"
+                result["candidates"] = [candidate["name"] for candidate in candidates]
+            return result
+        doctor = self.db.get(Doctor, doctor_id)
         
         # Parse date and time
         try:
@@ -37,53 +147,51 @@ class DoctorService:
         except ValueError:
             return {"available": False, "reason": "Invalid date or time format"}
         
-        # Check if there's already an appointment at this time
-        existing_appointment = self.db.query(Appointment).filter(
-            Appointment.doctor_id == doctor.id,
-            Appointment.appointment_date == appointment_datetime,
-            Appointment.status == "scheduled"
-        ).first()
-        
-        if existing_appointment:
-            return {"available": False, "reason": "Doctor already has an appointment at this time"}
-        
-        # Check doctor's general availability (day of week)
-        day_of_week = appointment_datetime.weekday()
-        availability = self.db.query(DoctorAvailability).filter(
-            DoctorAvailability.doctor_id == doctor.id,
-            DoctorAvailability.day_of_week == day_of_week,
-            DoctorAvailability.is_available == True
-        ).first()
-        
-        if not availability:
-            return {"available": False, "reason": "Doctor not available on this day"}
-        
-        # Check if time is within working hours
-        appointment_time = appointment_datetime.time()
-        start_time = datetime.strptime(availability.start_time, "%H:%M").time()
-        end_time = datetime.strptime(availability.end_time, "%H:%M").time()
-        
-        if not (start_time <= appointment_time <= end_time):
-            return {"available": False, "reason": "Time is outside doctor's working hours"}
+        status = schedule_index.slot_status(self.db, doctor.id, appointment_datetime, strict=strict)
+        if status == schedule_index.BOOKED:
+            if strict:
+                # The in-memory schedule may not have seen that booking yet
+                schedule_index.forget_bookings()
+            return {
+                "available": False,
+                "reason": SLOT_UNAVAILABLE_REASONS[status],
+                "next_available": self.next_available(doctor.id, appointment_datetime)
+            }
+        if status != schedule_index.FREE:
+            return {"available": False, "reason": SLOT_UNAVAILABLE_REASONS[status]}
         
         return {"available": True, "doctor": doctor}
     
     def get_available_doctors(self, date: str, time: str) -> List[Dict[str, Any]]:
         """Get all doctors available at a specific date and time"""
-        available_doctors = []
-        doctors = self.get_all_doctors()
-        
-        for doctor in doctors:
-            availability = self.check_doctor_availability(doctor.name, date, time)
-            if availability["available"]:
-                available_doctors.append({
-                    "id": doctor.id,
-                    "name": doctor.name,
-                    "specialty": doctor.specialty,
-                    "department": doctor.department
-                })
-        
-        return available_doctors
+        try:
+            appointment_datetime = datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M")
+        except ValueError:
+            return []
+        
+        return schedule_index.available_doctors(self.db, appointment_datetime)
+    
+    def next_available(self, doctor_id: int, after: datetime) -> Optional[Dict[str, str]]:
+        """Date and time of the doctor's next free slot within two weeks, if any"""
+        slot = schedule_index.next_free_slot(self.db, doctor_id, after)
+        if slot is None:
+            return None
+        return {"date": slot.strftime("%Y-%m-%d"), "time": slot.strftime("%H:%M")}
+    
+    def get_free_slots(self, doctor_id: int, date: Optional[str] = None) -> Dict[str, Any]:
+        """Free slot start times of a doctor on a date; for today only those still ahead"""
+        now = datetime.now()
+        try:
+            day = datetime.strptime(date, "%Y-%m-%d").date() if date else now.date()
+        except ValueError:
+            return {"error": "Invalid date format"}
+        
+        return {
+            "doctor_id": doctor_id,
+            "date": day.isoformat(),
+            "slot_minutes": schedule_index.slot_minutes,
+            "free_slots": schedule_index.free_slots(self.db, doctor_id, day, after=now)
+        }
 
 class PatientService:
     def __init__(self, db: Session):
@@ -125,9 +233,14 @@ class AppointmentService:
             return {"success": False, "message": "Appointment time is required to book an appointment."}
         
         # Check doctor availability
-        availability = self.doctor_service.check_doctor_availability(doctor_name, appointment_date, appointment_time)
+        availability = self.doctor_service.check_doctor_availability(
+            doctor_name, appointment_date, appointment_time, strict=True
+        )
         if not availability["available"]:
-            return {"success": False, "message": availability["reason"]}
+            result = {"success": False, "message": availability["reason"]}
+            if availability.get("next_available"):
+                result["next_available"] = availability["next_available"]
+            return result
         
         doctor = availability["doctor"]
         
@@ -141,17 +254,13 @@ class AppointmentService:
         
         # Create appointment
         appointment_datetime = datetime.strptime(f"{appointment_date} {appointment_time}", "%Y-%m-%d %H:%M")
-        appointment = Appointment(
-            doctor_id=doctor.id,
-            patient_id=patient.id,
-            appointment_date=appointment_datetime,
-            notes=notes,
-            status="scheduled"
-        )
-        
-        self.db.add(appointment)
-        self.db.commit()
-        self.db.refresh(appointment)
+        appointment = self._insert_appointment(doctor.id, patient.id, appointment_datetime, notes)
+        if appointment is None:
+            return {
+                "success": False,
+                "message": "Doctor already has an appointment at this time",
+                "next_available": self.doctor_service.next_available(doctor.id, appointment_datetime)
+            }
         
         return {
             "success": True,
@@ -163,6 +272,61 @@ class AppointmentService:
             "time": appointment_time
         }
     
+    def create_appointment(self, appointment: AppointmentCreate) -> Dict[str, Any]:
+        """Book an appointment for a known doctor and patient
+        
+        Returns the new appointment, or a message, the schedule_index status
+        that ruled the slot out as reason, and the doctor's next free slot.
+        A slot taken by a booking that won a race is reported as BOOKED.
+        """
+        doctor = self.db.get(Doctor, appointment.doctor_id)
+        if not doctor:
+            return {"success": False, "message": "Doctor not found"}
+        if not self.db.get(Patient, appointment.patient_id):
+            return {"success": False, "message": "Patient not found"}
+        
+        when = appointment.appointment_date
+        status = schedule_index.slot_status(self.db, doctor.id, when, strict=True)
+        db_appointment = None
+        if status == schedule_index.FREE:
+            db_appointment = self._insert_appointment(doctor.id, appointment.patient_id, when, appointment.notes)
+        if db_appointment is None:
+            if status == schedule_index.FREE:
+                # Free when checked, but another request committed first
+                status = schedule_index.BOOKED
+            elif status == schedule_index.BOOKED:
+                schedule_index.forget_bookings()
+            return {
+                "success": False,
+                "message": SLOT_UNAVAILABLE_REASONS[status],
+                "reason": status,
+                "next_available": self.doctor_service.next_available(doctor.id, when)
+            }
+        return {"success": True, "appointment": db_appointment}
+    
+    def _insert_appointment(self, doctor_id: int, patient_id: int, when: datetime, notes: Optional[str]) -> Optional[Appointment]:
+        """Insert a scheduled appointment, or return None if the slot was taken meanwhile"""
+        appointment = Appointment(
+            doctor_id=doctor_id,
+            patient_id=patient_id,
+            appointment_date=when,
+            notes=notes,
+            status="scheduled"
+        )
+        
+        self.db.add(appointment)
+        try:
+            appointments_version = DataVersionService(self.db).bump(DataVersionService.APPOINTMENTS)
+            self.db.commit()
+        except IntegrityError:
+            # Another request took the slot between the check and the insert
+            self.db.rollback()
+            schedule_index.forget_bookings()
+            return None
+        schedule_index.record_booking(doctor_id, when, appointments_version)
+        self.db.refresh(appointment)
+        return appointment
+    
     def get_appointments_by_doctor(self, doctor_id: int) -> List[Appointment]:
         return self.db.query(Appointment).filter(Appointment.doctor_id == doctor_id).all()
 
@@ -176,17 +340,26 @@ class ChatbotService:
         """Process function calls from the chatbot"""
         try:
             if function_name == "check_doctor_availability":
-                return self.doctor_service.check_doctor_availability(
+                result = self.doctor_service.check_doctor_availability(
                     arguments["doctor_name"],
                     arguments["date"],
                     arguments["time"]
                 )
+                if result.get("doctor"):
+                    # Tool results are sent back to the model as JSON
+                    doctor = result["doctor"]
+                    result = dict(result, doctor={"name": doctor.name, "specialty": doctor.specialty, "department": doctor.department})
+                return result
             
             elif function_name == "find_doctors_by_specialty":
                 doctors = self.doctor_service.get_doctors_by_specialty(arguments["specialty"])
-                return {
+                result = {
                     "doctors": [{"name": d.name, "specialty": d.specialty, "department": d.department} for d in doctors]
                 }
+                if not doctors:
+                    # Lets the model pick a valid specialty instead of guessing again
+                    result["available_specialties"] = self.doctor_service.get_specialties()
+                return result
             
             elif function_name == "book_appointment":
                 return self.appointment_service.book_appointment(
@@ -210,3 +383,302 @@ class ChatbotService:
         
         except Exception as e:
             return {"error": str(e)}
+    
+    def data_version_stamp(self) -> str:
+        """Version stamp of the data tool results are computed from"""
+        return DataVersionService(self.db).stamp()
+
+@lru_cache(maxsize=None)
+def _list_adapter(schema) -> TypeAdapter:
+    return TypeAdapter(List[schema])
+
+def _validated(schema, batch: List[ParsedRow]) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Dict[str, Any]]]:
+    """Parsed rows validated against a schema in one pass: (row, values) of the good ones and per-row errors"""
+    adapter = _list_adapter(schema)
+    errors = [{"row": row, "error": error} for row, _, error in batch if error is not None]
+    parsed = [(row, record) for row, record, error in batch if error is None]
+    try:
+        models = adapter.validate_python([record for _, record in parsed])
+    except ValidationError as e:
+        problems: Dict[int, List[str]] = {}
+        for problem in e.errors(include_url=False):
+            index, field = problem["loc"][0], ".".join(str(part) for part in problem["loc"][1:])
+            problems.setdefault(index, []).append(f"{field}: {problem['msg']}" if field else problem["msg"])
+        errors.extend({"row": parsed[index][0], "error": "; ".join(messages)} for index, messages in problems.items())
+        parsed = [item for index, item in enumerate(parsed) if index not in problems]
+        models = adapter.validate_python([record for _, record in parsed])
+    return list(zip([row for row, _ in parsed], adapter.dump_python(models))), errors
+
+class AsyncDoctorService:
+    """DoctorService for an AsyncSession
+    
+    Plain reads are native async queries. Index-backed lookups and writes
+    run the DoctorService code on the session's sync view via run_sync, so
+    their queries are awaited without a second implementation of them.
+    """
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def create_doctor(self, doctor: DoctorCreate) -> Doctor:
+        return await self.db.run_sync(lambda db: DoctorService(db).create_doctor(doctor))
+    
+    async def create_availability(self, availability: DoctorAvailabilityCreate) -> DoctorAvailability:
+        return await self.db.run_sync(lambda db: DoctorService(db).create_availability(availability))
+    
+    async def directory_version(self) -> int:
+        """Version of doctors and their availability, bumped by every write to either"""
+        version = await self.db.scalar(
+            select(DataVersion.version).where(DataVersion.name == DataVersionService.DIRECTORY)
+        )
+        return version or 0
+    
+    async def get_doctor_by_name(self, name: str) -> Optional[Doctor]:
+        return await self.db.run_sync(lambda db: DoctorService(db).get_doctor_by_name(name))
+    
+    async def search_doctors_by_name(self, name: str, limit: int = 5) -> List[Dict[str, Any]]:
+        return await self.db.run_sync(lambda db: DoctorService(db).search_doctors_by_name(name, limit))
+    
+    async def get_doctors_by_specialty(self, specialty: str) -> List[Doctor]:
+        return await self.db.run_sync(lambda db: DoctorService(db).get_doctors_by_specialty(specialty))
+    
+    async def get_specialties(self) -> List[str]:
+        return await self.db.run_sync(lambda db: DoctorService(db).get_specialties())
+    
+    async def list_doctors(self, specialty: Optional[str] = None, cursor: Optional[str] = None,
+                           limit: int = 100) -> Tuple[List[Row], Optional[str]]:
+        """A page of doctors in id order, optionally of one specialty, and the next page's cursor"""
+        statement = select(*DOCTOR_COLUMNS)
+        if specialty:
+            statement = statement.filter(Doctor.specialty == specialty)
+        return await keyset_page(self.db, statement, [Doctor.id], cursor, limit)
+    
+    async def list_availability(self, doctor_id: Optional[int] = None, cursor: Optional[str] = None,
+                                limit: int = 100) -> Tuple[List[Row], Optional[str]]:
+        """A page of availability rows in id order, optionally of one doctor, and the next page's cursor"""
+        statement = select(*AVAILABILITY_COLUMNS)
+        if doctor_id is not None:
+            statement = statement.filter(DoctorAvailability.doctor_id == doctor_id)
+        return await keyset_page(self.db, statement, [DoctorAvailability.id], cursor, limit)
+    
+    async def export_schedules(self, doctor_id: Optional[int] = None,
+                               batch_size: int = 1000) -> AsyncIterator[List[tuple]]:
+        """Working hours with doctor details, in batches of rows of SCHEDULE_EXPORT_COLUMNS from a server-side cursor"""
+        statement = select(
+            DoctorAvailability.id.label("availability_id"), DoctorAvailability.doctor_id,
+            Doctor.name.label("doctor_name"), Doctor.specialty, Doctor.department, DoctorAvailability.day_of_week,
+            DoctorAvailability.start_time, DoctorAvailability.end_time, DoctorAvailability.is_available
+        ).join(Doctor, Doctor.id == DoctorAvailability.doctor_id).order_by(DoctorAvailability.doctor_id, DoctorAvailability.id)
+        if doctor_id is not None:
+            statement = statement.filter(DoctorAvailability.doctor_id == doctor_id)
+        result = await self.db.stream(statement.execution_options(yield_per=batch_size))
+        async for rows in result.partitions(batch_size):
+            yield rows
+    
+    async def import_doctors(self, rows: AsyncIterator[List[ParsedRow]], batch_size: int = 1000,
+                             atomic: bool = False, max_errors: int = 1000) -> Dict[str, Any]:
+        """Create doctors from parsed rows; see _import"""
+        return await self._import(rows, self._doctor_values, Doctor.__table__, batch_size, atomic, max_errors)
+    
+    async def import_availability(self, rows: AsyncIterator[List[ParsedRow]], batch_size: int = 1000,
+                                  atomic: bool = False, max_errors: int = 1000) -> Dict[str, Any]:
+        """Create availability rows from parsed rows; see _import"""
+        return await self._import(
+            rows, self._availability_values, DoctorAvailability.__table__, batch_size, atomic, max_errors
+        )
+    
+    async def _import(self, rows: AsyncIterator[List[ParsedRow]], prepare, table, batch_size: int, atomic: bool,
+                      max_errors: int) -> Dict[str, Any]:
+        """Validate rows a batch at a time and insert the good ones with executemany, all in one transaction
+        
+        Returns the number of rows inserted and failed, and the errors of
+        the first max_errors failed rows in row order. With atomic, a single failed row
+        means nothing is inserted. The directory version is bumped once.
+        """
+        result: Dict[str, Any] = {"inserted": 0, "failed": 0, "errors": []}
+        
+        async def flush(batch: List[ParsedRow]):
+            values, errors = await prepare(batch)
+            # Parse, schema and database checks each add errors; report them by row
+            errors.sort(key=lambda error: error["row"])
+            result["failed"] += len(errors)
+            result["errors"].extend(errors[:max_errors - len(result["errors"])])
+            # Once an atomic import has failed, the rest is only validated
+            if values and not (atomic and result["failed"]):
+                await self.db.execute(insert(table), values)
+                result["inserted"] += len(values)
+        
+        batch: List[ParsedRow] = []
+        async for parsed in rows:
+            batch.extend(parsed)
+            if len(batch) >= batch_size:
+                await flush(batch)
+                batch = []
+        if batch:
+            await flush(batch)
+        
+        if atomic and result["failed"]:
+            await self.db.rollback()
+            result["inserted"] = 0
+        elif result["inserted"]:
+            await self.db.run_sync(lambda db: DataVersionService(db).bump(DataVersionService.DIRECTORY))
+            await self.db.commit()
+            schedule_index.invalidate()
+            doctor_name_index.invalidate()
+            specialty_index.invalidate()
+        return result
+    
+    async def _doctor_values(self, batch: List[ParsedRow]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        valid, errors = _validated(DoctorCreate, batch)
+        return [values for _, values in valid], errors
+    
+    async def _availability_values(self, batch: List[ParsedRow]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Validated availability rows with their minute columns, for doctors that exist"""
+        valid, errors = _validated(DoctorAvailabilityCreate, batch)
+        doctor_ids = {values["doctor_id"] for _, values in valid}
+        known = set((await self.db.scalars(select(Doctor.id).where(Doctor.id.in_(doctor_ids)))).all()) if doctor_ids else set()
+        rows = []
+        for row, values in valid:
+            # The schema already refused times that aren't HH:MM between 00:00 and 23:59
+            start_minute, end_minute = minute_of_day(values["start_time"]), minute_of_day(values["end_time"])
+            if values["doctor_id"] not in known:
+                errors.append({"row": row, "error": "Doctor not found"})
+            elif not 0 <= values["day_of_week"] <= 6:
+                errors.append({"row": row, "error": "day_of_week must be 0 (Monday) to 6 (Sunday)"})
+            elif start_minute >= end_minute:
+                errors.append({"row": row, "error": "start_time must be before end_time"})
+            else:
+                rows.append({**values, "start_minute": start_minute, "end_minute": end_minute})
+        return rows, errors
+    
+    async def check_doctor_availability(self, doctor_name: str, date: str, time: str, strict: bool = False) -> Dict[str, Any]:
+        return await self.db.run_sync(
+            lambda db: DoctorService(db).check_doctor_availability(doctor_name, date, time, strict=strict)
+        )
+    
+    async def get_available_doctors(self, date: str, time: str) -> List[Dict[str, Any]]:
+        return await self.db.run_sync(lambda db: DoctorService(db).get_available_doctors(date, time))
+    
+    async def get_free_slots(self, doctor_id: int, date: Optional[str] = None) -> Dict[str, Any]:
+        return await self.db.run_sync(lambda db: DoctorService(db).get_free_slots(doctor_id, date))
+
+class AsyncPatientService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def create_patient(self, patient: PatientCreate) -> Patient:
+        db_patient = Patient(**patient.dict())
+        self.db.add(db_patient)
+        await self.db.commit()
+        await self.db.refresh(db_patient)
+        return db_patient
+    
+    async def get_patient_by_phone(self, phone: str) -> Optional[Patient]:
+        return (await self.db.scalars(select(Patient).filter(Patient.phone == phone).limit(1))).first()
+    
+    async def list_patients(self, cursor: Optional[str] = None, limit: int = 100) -> Tuple[List[Row], Optional[str]]:
+        """A page of patients in id order and the next page's cursor"""
+        return await keyset_page(self.db, select(*PATIENT_COLUMNS), [Patient.id], cursor, limit)
+
+class AsyncAppointmentService:
+    """AppointmentService for an AsyncSession; bookings go through the sync code via run_sync"""
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def book_appointment(self, doctor_name: str, patient_name: str, patient_phone: str,
+                               appointment_date: str, appointment_time: str, notes: str = None) -> Dict[str, Any]:
+        return await self.db.run_sync(lambda db: AppointmentService(db).book_appointment(
+            doctor_name, patient_name, patient_phone, appointment_date, appointment_time, notes
+        ))
+    
+    async def create_appointment(self, appointment: AppointmentCreate) -> Dict[str, Any]:
+        return await self.db.run_sync(lambda db: AppointmentService(db).create_appointment(appointment))
+    
+    async def get_appointments_by_doctor(self, doctor_id: int) -> List[Appointment]:
+        return list((await self.db.scalars(select(Appointment).filter(Appointment.doctor_id == doctor_id))).all())
+    
+    async def list_appointments(self, doctor_id: Optional[int] = None, patient_id: Optional[int] = None,
+                                date_from: Optional[date] = None, date_to: Optional[date] = None,
+                                status: Optional[str] = None, cursor: Optional[str] = None,
+                                limit: int = 100) -> Tuple[List[Row], Optional[str]]:
+        """A page of appointments in date order and the next page's cursor
+        
+        Dates are inclusive. Each filter combination is served by an index
+        that starts with the filtered column and continues with the date.
+        """
+        statement = self._filtered(select(*APPOINTMENT_COLUMNS), doctor_id, patient_id, date_from, date_to, status)
+        return await keyset_page(self.db, statement, [Appointment.appointment_date, Appointment.id], cursor, limit)
+    
+    async def export_appointments(self, doctor_id: Optional[int] = None, patient_id: Optional[int] = None,
+                                  date_from: Optional[date] = None, date_to: Optional[date] = None,
+                                  status: Optional[str] = None, batch_size: int = 1000) -> AsyncIterator[List[tuple]]:
+        """Appointments with doctor and patient details in date order, in batches of rows of APPOINTMENT_EXPORT_COLUMNS
+        
+        Rows come from a server-side cursor, so only one batch is in memory
+        at a time however many rows match.
+        """
+        statement = self._filtered(
+            select(
+                Appointment.id.label("appointment_id"), Appointment.appointment_date, Appointment.status,
+                Appointment.notes, Appointment.doctor_id, Doctor.name.label("doctor_name"), Doctor.specialty,
+                Appointment.patient_id, Patient.name.label("patient_name"), Patient.phone.label("patient_phone")
+            ).outerjoin(Doctor, Doctor.id == Appointment.doctor_id).outerjoin(Patient, Patient.id == Appointment.patient_id),
+            doctor_id, patient_id, date_from, date_to, status
+        ).order_by(Appointment.appointment_date, Appointment.id)
+        result = await self.db.stream(statement.execution_options(yield_per=batch_size))
+        async for rows in result.partitions(batch_size):
+            yield rows
+    
+    @staticmethod
+    def _filtered(statement, doctor_id: Optional[int], patient_id: Optional[int], date_from: Optional[date],
+                  date_to: Optional[date], status: Optional[str]):
+        """Apply the appointment list filters; dates are inclusive"""
+        if doctor_id is not None:
+            statement = statement.filter(Appointment.doctor_id == doctor_id)
+        if patient_id is not None:
+            statement = statement.filter(Appointment.patient_id == patient_id)
+        if date_from:
+            statement = statement.filter(Appointment.appointment_date >= datetime.combine(date_from, datetime.min.time()))
+        if date_to:
+            statement = statement.filter(
+                Appointment.appointment_date < datetime.combine(date_to + timedelta(days=1), datetime.min.time())
+            )
+        if status:
+            statement = statement.filter(Appointment.status == status)
+        return statement
+
+class AsyncChatbotService:
+    """ChatbotService for an AsyncSession, as used by the chat engine"""
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def process_function_call(self, function_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.db.run_sync(lambda db: ChatbotService(db).process_function_call(function_name, arguments))
+    
+    async def data_version_stamp(self) -> str:
+        """Version stamp of the data tool results are computed from"""
+        return await self.db.run_sync(lambda db: DataVersionService(db).stamp())
+    
+    async def process_tool_calls(self, tool_calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Run the tool calls of one model turn concurrently
+        
+        Each call is a dict with "name" and "arguments". Results come back in
+        the same order. With several calls, each one gets its own session,
+        because a session runs one query at a time.
+        """
+        if len(tool_calls) == 1:
+            call = tool_calls[0]
+            return [await self.process_function_call(call["name"], call["arguments"])]
+        
+        async def run(call: Dict[str, Any]) -> Dict[str, Any]:
+            async with AsyncSessionLocal() as db:
+                return await AsyncChatbotService(db).process_function_call(call["name"], call["arguments"])
+        
+        return list(await asyncio.gather(*(run(call) for call in tool_calls)))
+    
+    async def release_connection(self):
+        """End the current transaction so the connection goes back to the pool.
+        
+        Called before awaiting the model again; the session reconnects on
+        its next query.
+        """
+        await self.db.close()
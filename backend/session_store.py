@@ -0,0 +1,286 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, AsyncIterator
+
+from config import (
+    SESSION_STORE, SESSION_TTL_SECONDS, SESSION_MAX_SESSIONS, SESSION_MAX_BYTES, SESSION_DB_PATH,
+    SESSION_LOCK_TIMEOUT, SESSION_LEASE_SECONDS, SESSION_LEASE_POLL_INTERVAL
+)
+
+
+class SessionStore(ABC):
+    """Storage for chat histories keyed by session ID.
+
+    ``get`` returns a list the caller may mutate freely; changes only
+    become visible to other requests once they are passed to ``save``.
+    Methods are coroutines so stores backed by I/O don't block the event loop.
+    """
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Optional[List[Dict]]:
+        ...
+
+    @abstractmethod
+    async def save(self, session_id: str, messages: List[Dict]):
+        ...
+
+    @abstractmethod
+    async def delete(self, session_id: str):
+        ...
+
+    @abstractmethod
+    async def count(self) -> int:
+        """Number of stored sessions"""
+
+    @asynccontextmanager
+    async def lease(self, session_id: str, timeout: float) -> AsyncIterator[None]:
+        """Exclusive hold on a session across every worker sharing the store.
+
+        Raises SessionBusyError after ``timeout`` seconds. Stores private to
+        one process need nothing beyond SessionLocks, so the default is a no-op.
+        """
+        yield
+
+
+class MemorySessionStore(SessionStore):
+    """In-process store with LRU eviction, a sliding TTL and a memory cap"""
+
+    def __init__(self, max_sessions: int = SESSION_MAX_SESSIONS, max_bytes: int = SESSION_MAX_BYTES,
+                 ttl_seconds: float = SESSION_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        # session_id -> (messages, size in bytes, last access time), oldest first
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def _pop(self, session_id: str):
+        _, size, _ = self._sessions.pop(session_id)
+        self._total_bytes -= size
+
+    def _evict(self, now: float):
+        # Least recently used entries sit at the front, so expired ones do too.
+        # The entry just saved always stays, even if it alone exceeds max_bytes,
+        # so a long conversation is never dropped right after its turn.
+        while len(self._sessions) > 1:
+            oldest_id, (_, _, last_access) = next(iter(self._sessions.items()))
+            over_capacity = len(self._sessions) > self.max_sessions or self._total_bytes > self.max_bytes
+            if not over_capacity and now - last_access <= self.ttl_seconds:
+                break
+            self._pop(oldest_id)
+
+    async def get(self, session_id: str) -> Optional[List[Dict]]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            messages, size, last_access = entry
+            now = time.monotonic()
+            if now - last_access > self.ttl_seconds:
+                self._pop(session_id)
+                return None
+            self._sessions[session_id] = (messages, size, now)
+            self._sessions.move_to_end(session_id)
+            return list(messages)
+
+    async def save(self, session_id: str, messages: List[Dict]):
+        # Serialized length is a cheap, stable proxy for the memory a history holds
+        size = len(json.dumps(messages))
+        now = time.monotonic()
+        with self._lock:
+            if session_id in self._sessions:
+                self._pop(session_id)
+            self._sessions[session_id] = (list(messages), size, now)
+            self._total_bytes += size
+            self._evict(now)
+
+    async def delete(self, session_id: str):
+        with self._lock:
+            if session_id in self._sessions:
+                self._pop(session_id)
+
+    async def count(self) -> int:
+        return len(self)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite-backed store shared by every worker that opens the same file
+
+    Queries run in a worker thread, so a slow disk or a lock held by another
+    worker never stalls the event loop. Turns of one session are serialized
+    across workers by a lease row; a lease left by a crashed worker expires
+    after SESSION_LEASE_SECONDS.
+    """
+
+    # Expired rows are swept once every this many saves
+    PURGE_INTERVAL = 500
+
+    def __init__(self, path: str = SESSION_DB_PATH, ttl_seconds: float = SESSION_TTL_SECONDS,
+                 lease_seconds: float = SESSION_LEASE_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._saves = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        # WAL lets workers read sessions while another one is writing
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chat_sessions ("
+            "session_id TEXT PRIMARY KEY, messages TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_chat_sessions_updated_at ON chat_sessions (updated_at)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chat_session_leases ("
+            "session_id TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @asynccontextmanager
+    async def lease(self, session_id: str, timeout: float) -> AsyncIterator[None]:
+        owner = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        while not await asyncio.to_thread(self._take_lease, session_id, owner):
+            if time.monotonic() >= deadline:
+                raise SessionBusyError(
+                    f"Session {session_id} is still processing a previous message, please try again shortly"
+                )
+            await asyncio.sleep(SESSION_LEASE_POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            await asyncio.to_thread(self._drop_lease, session_id, owner)
+
+    async def get(self, session_id: str) -> Optional[List[Dict]]:
+        return await asyncio.to_thread(self._get, session_id)
+
+    async def save(self, session_id: str, messages: List[Dict]):
+        await asyncio.to_thread(self._save, session_id, json.dumps(messages))
+
+    async def delete(self, session_id: str):
+        await asyncio.to_thread(self._delete, session_id)
+
+    async def count(self) -> int:
+        return await asyncio.to_thread(self._count)
+
+    def _get(self, session_id: str) -> Optional[List[Dict]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT messages FROM chat_sessions WHERE session_id = ? AND updated_at >= ?",
+                (session_id, time.time() - self.ttl_seconds)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _save(self, session_id: str, messages: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO chat_sessions (session_id, messages, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET messages = excluded.messages, updated_at = excluded.updated_at",
+                (session_id, messages, time.time())
+            )
+            self._saves += 1
+            if self._saves % self.PURGE_INTERVAL == 0:
+                self._conn.execute("DELETE FROM chat_sessions WHERE updated_at < ?", (time.time() - self.ttl_seconds,))
+            self._conn.commit()
+
+    def _delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def _count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
+
+    def _take_lease(self, session_id: str, owner: str) -> bool:
+        """Insert the lease row, or take over an expired one; False if another owner holds it"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO chat_session_leases (session_id, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE chat_session_leases.expires_at < ?",
+                (session_id, owner, now + self.lease_seconds, now)
+            )
+            self._conn.commit()
+            return cursor.rowcount == 1
+
+    def _drop_lease(self, session_id: str, owner: str):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM chat_session_leases WHERE session_id = ? AND owner = ?", (session_id, owner)
+            )
+            self._conn.commit()
+
+
+class SessionBusyError(Exception):
+    """Raised when a turn waited too long for the previous turn of its session"""
+
+
+class SessionLocks:
+    """Per-session locks so that turns for one session run one at a time.
+
+    asyncio.Lock wakes waiters in FIFO order, so queued turns run in the
+    order they arrived. Sessions never share a lock, and a lock is dropped
+    as soon as nobody holds or waits for it. The locks live in one process;
+    when a store is given, its lease also keeps other workers out.
+    """
+
+    def __init__(self, store: Optional[SessionStore] = None, timeout: float = SESSION_LOCK_TIMEOUT):
+        self.store = store
+        self.timeout = timeout
+        # session_id -> [lock, number of holders and waiters]
+        self._locks: Dict[str, list] = {}
+
+    @asynccontextmanager
+    async def hold(self, session_id: str) -> AsyncIterator[None]:
+        entry = self._locks.setdefault(session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        deadline = time.monotonic() + self.timeout
+        try:
+            try:
+                await asyncio.wait_for(entry[0].acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                raise SessionBusyError(
+                    f"Session {session_id} is still processing a previous message, please try again shortly"
+                )
+            try:
+                if self.store is None:
+                    yield
+                else:
+                    # Whatever is left of the timeout after queueing in this worker
+                    async with self.store.lease(session_id, max(deadline - time.monotonic(), 0)):
+                        yield
+            finally:
+                entry[0].release()
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[session_id]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+def create_session_store() -> SessionStore:
+    """Build the session store selected by SESSION_STORE"""
+    if SESSION_STORE == "memory":
+        return MemorySessionStore()
+    if SESSION_STORE == "sqlite":
+        return SQLiteSessionStore()
+    raise ValueError(f"Unknown SESSION_STORE: {SESSION_STORE}")
@@ -0,0 +1,199 @@
+import re
+from typing import Dict, List, Any, Set
+
+from sqlalchemy.orm import Session
+
+from config import DIRECTORY_REFRESH_SECONDS
+from models import Doctor
+from versioned_index import VersionedIndex
+
+# Stems of specialist words ("dermatologist", "dermatology") -> specialty
+SPECIALTY_STEMS = {
+    "cardiolog": "Cardiology",
+    "orthopedi": "Orthopedics",
+    "orthopaedi": "Orthopedics",
+    "neurolog": "Neurology",
+    "dermatolog": "Dermatology",
+    "pediatri": "Pediatrics",
+    "paediatri": "Pediatrics",
+    "gynecolog": "Gynecology",
+    "gynaecolog": "Gynecology",
+    "ophthalmolog": "Ophthalmology",
+    "psychiatr": "Psychiatry",
+    "gastroenterolog": "Gastroenterology",
+    "urolog": "Urology",
+    "pulmonolog": "Pulmonology",
+    "endocrinolog": "Endocrinology",
+    "nephrolog": "Nephrology",
+    "oncolog": "Oncology",
+    "rheumatolog": "Rheumatology",
+}
+# Whole-word or multi-word specialty names
+SPECIALTY_PHRASES = {
+    "ent": "ENT",
+    "general medicine": "General Medicine",
+    "general physician": "General Medicine",
+    "general physicians": "General Medicine",
+}
+# Everyday words patients use for a specialty
+SPECIALTY_SYNONYMS = {
+    "heart": "Cardiology",
+    "cardio": "Cardiology",
+    "skin": "Dermatology",
+    "derma": "Dermatology",
+    "ortho": "Orthopedics",
+    "bone": "Orthopedics",
+    "bones": "Orthopedics",
+    "joint": "Orthopedics",
+    "joints": "Orthopedics",
+    "neuro": "Neurology",
+    "brain": "Neurology",
+    "nerve": "Neurology",
+    "nerves": "Neurology",
+    "child": "Pediatrics",
+    "children": "Pediatrics",
+    "kids": "Pediatrics",
+    "baby": "Pediatrics",
+    "gyno": "Gynecology",
+    "obgyn": "Gynecology",
+    "women": "Gynecology",
+    "eye": "Ophthalmology",
+    "eyes": "Ophthalmology",
+    "ear": "ENT",
+    "nose": "ENT",
+    "throat": "ENT",
+    "otolaryngology": "ENT",
+    "mental health": "Psychiatry",
+    "gastro": "Gastroenterology",
+    "stomach": "Gastroenterology",
+    "digestive": "Gastroenterology",
+    "urinary": "Urology",
+    "bladder": "Urology",
+    "lung": "Pulmonology",
+    "lungs": "Pulmonology",
+    "chest": "Pulmonology",
+    "hormone": "Endocrinology",
+    "thyroid": "Endocrinology",
+    "diabetes": "Endocrinology",
+    "kidney": "Nephrology",
+    "kidneys": "Nephrology",
+    "cancer": "Oncology",
+    "arthritis": "Rheumatology",
+    "gp": "General Medicine",
+    "physician": "General Medicine",
+    "family doctor": "General Medicine",
+    "internal medicine": "General Medicine",
+}
+# Words around a specialty that do not change which one is meant
+FILLER_WORDS = {
+    "a", "an", "the", "for", "of", "in", "and", "or", "dr", "doctor", "doctors", "specialist", "specialists",
+    "specialty", "speciality", "department", "clinic", "expert", "experts",
+}
+# Shortest query word that may match a specialty by prefix ("cardio", "neuro")
+MIN_PREFIX_LENGTH = 4
+
+
+def normalize_terms(text: str) -> List[str]:
+    tokens = re.findall(r"[a-z0-9]+", (text or "").lower())
+    return [token for token in tokens if token not in FILLER_WORDS]
+
+
+class SpecialtyIndex(VersionedIndex):
+    """Vocabulary of specialty terms and an inverted index from specialty to doctors.
+
+    Canonical specialties are the distinct values in the doctors table.
+    Every known way of naming one (the name itself, its words, stems,
+    synonyms) maps to the canonical name, so a lookup is usually a single
+    dictionary hit on the normalized query. Rebuilt when the directory
+    version changes.
+    """
+
+    def __init__(self, refresh_seconds: float = DIRECTORY_REFRESH_SECONDS):
+        super().__init__(refresh_seconds)
+        # normalized term -> canonical specialties
+        self._terms: Dict[str, List[str]] = {}
+        # canonical specialty -> doctor ids, in id order
+        self._doctors: Dict[str, List[int]] = {}
+        self.rebuilds = 0
+
+    def _load(self, db: Session, stale: Set[str]) -> tuple:
+        return self._build(db.query(Doctor.id, Doctor.specialty).order_by(Doctor.id).all())
+
+    def _install(self, loaded: tuple, stale: Set[str]):
+        self._terms, self._doctors = loaded
+
+    def _build(self, doctors: List[tuple]) -> tuple:
+        self.rebuilds += 1
+        by_specialty: Dict[str, List[int]] = {}
+        for doctor_id, specialty in doctors:
+            if specialty:
+                by_specialty.setdefault(specialty, []).append(doctor_id)
+
+        # Known vocabulary only points at specialties some doctor actually has
+        canonical = {specialty.lower(): specialty for specialty in by_specialty}
+        terms: Dict[str, List[str]] = {}
+
+        def add(term: str, specialty: str):
+            specialty = canonical.get(specialty.lower())
+            key = " ".join(normalize_terms(term))
+            if specialty and key and specialty not in terms.setdefault(key, []):
+                terms[key].append(specialty)
+
+        for specialty in by_specialty:
+            add(specialty, specialty)
+            for word in normalize_terms(specialty):
+                if len(word) >= MIN_PREFIX_LENGTH:
+                    add(word, specialty)
+        for vocabulary in (SPECIALTY_PHRASES, SPECIALTY_SYNONYMS):
+            for term, specialty in vocabulary.items():
+                add(term, specialty)
+
+        return terms, by_specialty
+
+    def _match_word(self, word: str) -> List[str]:
+        if word in self._terms:
+            return self._terms[word]
+        found = [specialty for stem, specialty in SPECIALTY_STEMS.items() if word.startswith(stem)]
+        if not found and len(word) >= MIN_PREFIX_LENGTH:
+            # "cardio" for Cardiology, "pediatric" for Pediatrics
+            found = [specialty for specialty in self._doctors if specialty.lower().startswith(word)]
+        return [specialty for specialty in found if specialty in self._doctors]
+
+    def resolve(self, db: Session, text: str) -> List[str]:
+        """Canonical specialties a free-text specialty refers to, in order of mention"""
+        words = normalize_terms(text)
+        self._refresh(db)
+        with self._lock:
+            phrase = " ".join(words)
+            if phrase in self._terms:
+                return list(self._terms[phrase])
+
+            specialties: List[str] = []
+            i = 0
+            while i < len(words):
+                # Prefer two-word terms such as "family doctor" or "mental health"
+                pair = " ".join(words[i:i + 2])
+                if i + 1 < len(words) and pair in self._terms:
+                    matched, i = self._terms[pair], i + 2
+                else:
+                    matched, i = self._match_word(words[i]), i + 1
+                specialties += [specialty for specialty in matched if specialty not in specialties]
+            return specialties
+
+    def doctor_ids(self, db: Session, text: str) -> List[int]:
+        """Ids of doctors in the specialties a free-text specialty refers to"""
+        specialties = self.resolve(db, text)
+        with self._lock:
+            return sorted({doctor_id for specialty in specialties for doctor_id in self._doctors.get(specialty, [])})
+
+    def specialties(self, db: Session) -> List[str]:
+        self._refresh(db)
+        with self._lock:
+            return sorted(self._doctors)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"specialties": len(self._doctors), "terms": len(self._terms), "rebuilds": self.rebuilds}
+
+
+# Shared by every session in this process
+specialty_index = SpecialtyIndex()
@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# Keep tests offline and away from the development database; set before config is imported
+os.environ.setdefault("LLM_PROVIDER", "mock")
+os.environ.setdefault("MOCK_LLM_ERROR_RATE", "0")
+os.environ.setdefault("MOCK_LLM_LATENCY", "fixed:0")
+os.environ.setdefault("MOCK_LLM_TOKEN_INTERVAL", "0")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test_clinic.db')}")
@@ -0,0 +1,31 @@
+import asyncio
+
+import httpx
+import pytest
+
+from models import minute_of_day
+
+
+@pytest.mark.parametrize("value, minutes", [("00:00", 0), ("09:30", 570), ("23:59", 1439)])
+def test_minute_of_day(value, minutes):
+    assert minute_of_day(value) == minutes
+
+
+@pytest.mark.parametrize("value", ["9am", "9:00", "24:00", "25:00", "12:60", "", "09:00:00", None])
+def test_minute_of_day_rejects_bad_times(value):
+    with pytest.raises(ValueError, match="HH:MM between 00:00 and 23:59"):
+        minute_of_day(value)
+
+
+@pytest.mark.parametrize("start_time, end_time", [("9am", "17:00"), ("09:00", "25:00")])
+def test_creating_availability_with_bad_times_is_a_422(start_time, end_time):
+    import main
+
+    async def post():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+            return await client.post("/doctor-availability/", json={
+                "doctor_id": 1, "day_of_week": 0, "start_time": start_time, "end_time": end_time
+            })
+    response = asyncio.run(post())
+    assert response.status_code == 422
+    assert "HH:MM" in response.text
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+from datetime import date, datetime, timedelta
+
+import httpx
+import pytest
+
+from database import SessionLocal, create_tables
+from models import Doctor, Patient, DoctorAvailability
+from schemas import AppointmentCreate
+from schedule_index import schedule_index
+from services import AppointmentService
+
+
+@pytest.fixture
+def clinic():
+    """A doctor working Mondays 09:00-17:00, a patient, and next Monday's date"""
+    create_tables()
+    db = SessionLocal()
+    try:
+        doctor = Doctor(name="Dr. Race Tester", specialty="Cardiology", department="Cardiology")
+        patient = Patient(name="Pat Ient", phone="+910000000001")
+        db.add_all([doctor, patient])
+        db.flush()
+        db.add(DoctorAvailability(doctor_id=doctor.id, day_of_week=0, start_time="09:00", end_time="17:00"))
+        db.commit()
+        schedule_index.invalidate()
+        monday = date.today() + timedelta(days=7 - date.today().weekday())
+        yield doctor.id, patient.id, monday
+    finally:
+        db.close()
+
+
+def test_concurrent_bookings_of_one_slot_have_one_winner(clinic):
+    doctor_id, patient_id, monday = clinic
+    when = datetime.combine(monday, datetime.min.time()).replace(hour=10)
+    start = threading.Barrier(8)
+    results = []
+
+    def book():
+        db = SessionLocal()
+        try:
+            start.wait()
+            results.append(AppointmentService(db).create_appointment(
+                AppointmentCreate(doctor_id=doctor_id, patient_id=patient_id, appointment_date=when)
+            ))
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=book) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    winners = [r for r in results if r["success"]]
+    losers = [r for r in results if not r["success"]]
+    assert len(winners) == 1
+    assert len(losers) == 7
+    assert {r["reason"] for r in losers} == {schedule_index.BOOKED}
+    assert {r["next_available"]["time"] for r in losers} == {"10:15"}
+
+
+def test_booking_status_codes(clinic):
+    import main
+    doctor_id, patient_id, monday = clinic
+
+    async def book(when: datetime) -> httpx.Response:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+            return await client.post("/appointments/", json={
+                "doctor_id": doctor_id, "patient_id": patient_id, "appointment_date": when.isoformat()
+            })
+
+    def at(day: date, hour: int, minute: int = 0) -> datetime:
+        return datetime.combine(day, datetime.min.time()).replace(hour=hour, minute=minute)
+
+    assert asyncio.run(book(at(monday, 11))).status_code == 200
+
+    taken = asyncio.run(book(at(monday, 11)))
+    assert taken.status_code == 409
+    assert taken.json()["detail"]["reason"] == "booked"
+
+    # The last slot has to end by 17:00
+    assert asyncio.run(book(at(monday, 16, 45))).status_code == 200
+    closing = asyncio.run(book(at(monday, 17)))
+    assert closing.status_code == 422
+    assert closing.json()["detail"]["reason"] == "outside_hours"
+
+    day_off = asyncio.run(book(at(monday + timedelta(days=1), 11)))
+    assert day_off.status_code == 422
+    assert day_off.json()["detail"]["message"] == "Doctor not available on this day"
+
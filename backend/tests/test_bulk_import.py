@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from database import SessionLocal, create_tables
+from models import Doctor
+
+
+@pytest.fixture
+def doctor_id():
+    create_tables()
+    db = SessionLocal()
+    try:
+        doctor = Doctor(name="Dr. Bulk Tester", specialty="Dermatology", department="Dermatology")
+        db.add(doctor)
+        db.commit()
+        yield doctor.id
+    finally:
+        db.close()
+
+
+def _upload(path: str, body: str) -> httpx.Response:
+    import main
+
+    async def post() -> httpx.Response:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+            return await client.post(path, params={"atomic": "true"}, content=body.encode())
+
+    return asyncio.run(post())
+
+
+def test_doctor_import_errors_are_in_row_order():
+    # Schema errors are found after parse errors, but row 1 still comes first
+    body = "\n".join([
+        json.dumps({"name": "Dr. No Specialty"}), "{not json", json.dumps({"name": "Dr. Half", "specialty": "ENT"}),
+    ])
+    response = _upload("/doctors/bulk", body)
+    assert response.status_code == 422
+    assert [error["row"] for error in response.json()["detail"]["errors"]] == [1, 2, 3]
+
+
+def test_availability_times_out_of_range_get_the_hh_mm_error(doctor_id):
+    rows = [("25:00", "26:00"), ("10:00", "09:00"), ("09:00", "24:00"), ("9:00", "10:00")]
+    body = "\n".join(json.dumps({"doctor_id": doctor_id, "day_of_week": 0, "start_time": start, "end_time": end})
+                     for start, end in rows)
+    response = _upload("/doctor-availability/bulk", body)
+    assert response.status_code == 422
+    errors = response.json()["detail"]["errors"]
+    assert [error["row"] for error in errors] == [1, 2, 3, 4]
+    assert "expected HH:MM between 00:00 and 23:59" in errors[0]["error"]
+    assert errors[1]["error"] == "start_time must be before end_time"
+    assert "expected HH:MM" in errors[2]["error"]
+    assert "expected HH:MM" in errors[3]["error"]
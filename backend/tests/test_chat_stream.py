@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+
+import mock_llm
+from chat_engine import ChatEngine, OPENAI_FAILURE_RESPONSE, RESET_EVENT
+from openai_service import AsyncOpenAIService
+from schemas import ChatMessage
+from session_store import MemorySessionStore
+
+CARDIOLOGISTS = {"doctors": [{"id": 1, "name": "Dr. Heart One", "specialty": "Cardiology", "department": "Cardiology"}]}
+
+
+class FixedDirectory:
+    """The parts of AsyncChatbotService a turn uses, answering every tool call from a fixed directory"""
+
+    async def process_tool_calls(self, calls):
+        return [CARDIOLOGISTS for _ in calls]
+
+    async def process_function_call(self, name, arguments):
+        return CARDIOLOGISTS
+
+    async def data_version_stamp(self) -> str:
+        return "v1"
+
+    async def release_connection(self):
+        pass
+
+
+async def _with_engine(turns):
+    """Run turns(engine) against the in-process mock provider and a fresh session store"""
+    service = AsyncOpenAIService()
+    engine = ChatEngine(service, MemorySessionStore(), "You are a clinic assistant.")
+    try:
+        return await turns(engine)
+    finally:
+        await service.aclose()
+
+
+async def _stream(engine, text, session_id):
+    return [event async for event in engine.stream_turn(ChatMessage(message=text, session_id=session_id),
+                                                        FixedDirectory())]
+
+
+def _without_call_ids(history):
+    """History with tool call ids numbered in order; the intent router makes random ones"""
+    ids = {}
+    renamed = []
+    for message in history:
+        message = dict(message)
+        if message.get("tool_calls"):
+            message["tool_calls"] = [dict(call, id=ids.setdefault(call["id"], len(ids)))
+                                     for call in message["tool_calls"]]
+        if "tool_call_id" in message:
+            message["tool_call_id"] = ids[message["tool_call_id"]]
+        renamed.append(message)
+    return renamed
+
+
+def _names(events):
+    """Event names with each run of tokens shown once"""
+    names = []
+    for event in events:
+        if not (event["event"] == "token" and names and names[-1] == "token"):
+            names.append(event["event"])
+    return names
+
+
+def test_stream_events_of_a_turn_with_a_tool_call():
+    async def turns(engine):
+        return await _stream(engine, "I need a cardiologist", "s1")
+    events = asyncio.run(_with_engine(turns))
+
+    assert _names(events) == ["session", "function_called", "function_result", "token", "done"]
+    assert events[0]["data"] == {"session_id": "s1"}
+    assert events[1]["data"] == {"name": "find_doctors_by_specialty", "arguments": {"specialty": "Cardiology"}}
+    assert events[2]["data"] == {"name": "find_doctors_by_specialty", "result": CARDIOLOGISTS}
+    done = events[-1]["data"]
+    assert done["response"] == "".join(e["data"]["content"] for e in events if e["event"] == "token")
+    assert done["function_called"] == "find_doctors_by_specialty"
+
+
+@pytest.mark.parametrize("messages", [
+    ["hello"],
+    ["I need a cardiologist", "thanks"],
+    # Answered by the intent router without the model
+    ["Show me your cardiologists"],
+])
+def test_stream_and_blocking_turns_leave_the_same_history(messages):
+    async def turns(engine):
+        blocking, streamed = [], []
+        for text in messages:
+            blocking.append(await engine.run_turn(ChatMessage(message=text, session_id="blocking"), FixedDirectory()))
+            streamed.append((await _stream(engine, text, "streamed"))[-1]["data"])
+        return blocking, streamed, await engine.sessions.get("blocking"), await engine.sessions.get("streamed")
+    blocking, streamed, blocking_history, streamed_history = asyncio.run(_with_engine(turns))
+
+    assert _without_call_ids(streamed_history) == _without_call_ids(blocking_history)
+    for response, done in zip(blocking, streamed):
+        assert done == dict(response.model_dump(), session_id="streamed")
+
+
+def test_failure_after_partial_tokens_sends_reset_then_the_fallback():
+    async def turns(engine):
+        stream_completion = engine.openai_service.stream_completion
+
+        async def cut_stream(messages, allow_tool_calls=False):
+            # The mock's reply, with the connection dropping after the first few words
+            tokens = 0
+            async for event in stream_completion(messages, allow_tool_calls=allow_tool_calls):
+                if event["type"] != "token" or tokens == 3:
+                    break
+                tokens += 1
+                yield event
+            yield {"type": "error", "error": "OpenAI stream error: stream cut"}
+        engine.openai_service.stream_completion = cut_stream
+        return await _stream(engine, "hello", "s1"), await engine.sessions.get("s1")
+    events, history = asyncio.run(_with_engine(turns))
+
+    assert _names(events) == ["session", "token", "reset", "done"]
+    assert len([event for event in events if event["event"] == "token"]) == 3
+    assert events[-2] == RESET_EVENT
+    assert events[-1]["data"]["response"] == OPENAI_FAILURE_RESPONSE
+    # Only the fallback is kept, none of the discarded tokens
+    assert history[-2:] == [{"role": "user", "content": "hello"},
+                            {"role": "assistant", "content": OPENAI_FAILURE_RESPONSE}]
+
+
+def test_failure_before_any_token_sends_no_reset(monkeypatch):
+    monkeypatch.setattr(mock_llm.mock, "error_rate", 1.0)
+    # Retry backoff without the wait
+    sleep = asyncio.sleep
+    monkeypatch.setattr(asyncio, "sleep", lambda seconds, *args: sleep(0, *args))
+
+    async def turns(engine):
+        return await _stream(engine, "hello", "s1")
+    events = asyncio.run(_with_engine(turns))
+
+    assert _names(events) == ["session", "done"]
+    assert events[-1]["data"]["response"] == OPENAI_FAILURE_RESPONSE
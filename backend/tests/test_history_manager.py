@@ -0,0 +1,44 @@
+import json
+
+from history_manager import HistoryManager, MEMORY_PREFIX
+
+
+def _tool_turn(call_id: str, doctors: list) -> list:
+    return [
+        {"role": "user", "content": "Which cardiologists do you have?"},
+        {"role": "assistant", "content": None, "tool_calls": [
+            {"id": call_id, "type": "function", "function": {"name": "get_doctors", "arguments": "{}"}}
+        ]},
+        {"role": "tool", "tool_call_id": call_id, "content": json.dumps({"doctors": doctors})},
+        {"role": "assistant", "content": "We have several cardiologists."},
+    ]
+
+
+def test_compacting_twice_keeps_the_shrunk_result_count():
+    doctors = [{"id": i, "name": f"Dr. Doctor {i}"} for i in range(36)]
+    history = (
+        [{"role": "system", "content": "You are a clinic assistant."},
+         {"role": "user", "content": "Tell me about the clinic. " * 200},
+         {"role": "assistant", "content": "It is a clinic."}]
+        + _tool_turn("call_1", doctors)
+        + [{"role": "user", "content": "Thanks"}]
+    )
+    manager = HistoryManager()
+    # Just over budget: shrinking the old function result is enough
+    manager.token_budget = manager.counter.count(history) - 1
+
+    once = manager.compact(history)
+    assert once[1]["role"] == "user"
+    result = json.loads(next(m for m in once if m["role"] == "tool")["content"])
+    assert result["doctors"][:5] == doctors[:5]
+    assert result["doctors"][5:] == ["... and 31 more"]
+
+    # The next turn compacts the stored history again and folds the oldest turn
+    twice = manager.compact(once + [{"role": "assistant", "content": "You're welcome! " * 150}])
+    assert twice[1]["content"].startswith(MEMORY_PREFIX)
+    assert json.loads(next(m for m in twice if m["role"] == "tool")["content"]) == result
+
+
+def test_history_within_budget_is_returned_unchanged():
+    history = [{"role": "system", "content": "You are a clinic assistant."}] + _tool_turn("call_1", list(range(36)))
+    assert HistoryManager(token_budget=10_000).compact(history) is history
@@ -0,0 +1,80 @@
+import asyncio
+
+import httpx
+import pytest
+
+from database import SessionLocal, create_tables
+from http_cache import etag_matches
+from models import Doctor
+from services import DataVersionService
+
+
+@pytest.fixture
+def directory():
+    """Enough doctors that a page of them is compressed"""
+    create_tables()
+    db = SessionLocal()
+    try:
+        db.add_all(Doctor(name=f"Dr. Cache Tester {n}", specialty="Cardiology", department="Cardiology")
+                   for n in range(40))
+        DataVersionService(db).bump(DataVersionService.DIRECTORY)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _requests(*requests):
+    """Send (method, path, headers, json) requests in order to the app and return the responses"""
+    import main
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        return [await client.request(method, path, headers=headers, json=body)
+                for method, path, headers, body in requests]
+
+
+def test_etag_matching_is_weak_and_accepts_lists_and_star():
+    assert etag_matches('"directory-3"', '"directory-3"')
+    assert etag_matches('W/"directory-3"', '"directory-3"')
+    assert etag_matches('"directory-2", W/"directory-3"', '"directory-3"')
+    assert etag_matches("*", '"directory-3"')
+    assert not etag_matches('"directory-2"', '"directory-3"')
+    assert not etag_matches(None, '"directory-3"')
+
+
+def test_current_etag_gets_an_empty_304(directory):
+    plain = {"Accept-Encoding": "identity"}
+    first, again = asyncio.run(_requests(("GET", "/doctors/", plain, None), ("GET", "/doctors/", plain, None)))
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and not etag.startswith("W/")
+    assert again.headers["etag"] == etag
+
+    (cached,) = asyncio.run(_requests(("GET", "/doctors/", dict(plain, **{"If-None-Match": etag}), None)))
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+
+
+def test_weak_etag_from_the_compression_middleware_still_matches(directory):
+    gzip = {"Accept-Encoding": "gzip"}
+    (compressed,) = asyncio.run(_requests(("GET", "/doctors/", gzip, None)))
+    assert compressed.headers["content-encoding"] == "gzip"
+    weak = compressed.headers["etag"]
+    assert weak.startswith("W/")
+
+    (cached,) = asyncio.run(_requests(("GET", "/doctors/", dict(gzip, **{"If-None-Match": weak}), None)))
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+
+def test_creating_a_doctor_changes_the_etag(directory):
+    plain = {"Accept-Encoding": "identity"}
+    path = "/doctors/?specialty=Geriatrics"
+    before, created = asyncio.run(_requests(
+        ("GET", path, plain, None),
+        ("POST", "/doctors/", plain, {"name": "Dr. New Entry", "specialty": "Geriatrics", "department": "Geriatrics"}),
+    ))
+    assert created.status_code == 200
+
+    (after,) = asyncio.run(_requests(("GET", path, dict(plain, **{"If-None-Match": before.headers["etag"]}), None)))
+    assert after.status_code == 200
+    assert after.headers["etag"] != before.headers["etag"]
+    assert [doctor["name"] for doctor in after.json()] == ["Dr. New Entry"]
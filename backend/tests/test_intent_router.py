@@ -0,0 +1,44 @@
+import pytest
+
+from intent_router import IntentRouter
+
+
+@pytest.mark.parametrize("message, specialty", [
+    ("Show me your cardiologists", "Cardiology"),
+    ("List all dermatologists", "Dermatology"),
+    ("Can you show me the ENT doctors?", "ENT"),
+    ("Please list your pediatricians", "Pediatrics"),
+    ("Which neurologists do you have?", "Neurology"),
+    ("Any orthopedic surgeons do you have?", "Orthopedics"),
+    ("Are there any gynecologists?", "Gynecology"),
+    ("Is there a urologist at the clinic?", "Urology"),
+    ("Do you have any oncologists?", "Oncology"),
+])
+def test_list_requests_are_routed(message, specialty):
+    assert IntentRouter().classify(message) == {
+        "name": "find_doctors_by_specialty", "arguments": {"specialty": specialty},
+    }
+
+
+@pytest.mark.parametrize("message", [
+    # Questions about a specialty or its doctors, not requests for the list
+    "What does a dermatologist treat?",
+    "What qualifications do your cardiologists have?",
+    "Who is the head of cardiology?",
+    "What is a nephrologist?",
+    "Who is your best cardiologist?",
+    "Show me the qualifications of your cardiologists",
+    "How experienced are your neurologists?",
+    # Anything about booking, time or symptoms
+    "Which cardiologists are available tomorrow?",
+    "Show me cardiologists free on Monday",
+    "Do you have a dermatologist for a rash?",
+    "Can I book a cardiologist?",
+    # Not exactly one specialty
+    "Show me your cardiologists and neurologists",
+    "Show me your doctors",
+    # Too long to be sure of
+    "Show me every single cardiologist that you have got at this clinic in the city please",
+])
+def test_other_questions_go_to_the_model(message):
+    assert IntentRouter().classify(message) is None
@@ -0,0 +1,32 @@
+import asyncio
+import importlib
+
+import pytest
+
+
+class Closable:
+    """Stands in for the OpenAI service and the async engine, recording what shutdown calls"""
+
+    def __init__(self, calls: list):
+        self.calls = calls
+
+    async def aclose(self):
+        self.calls.append("openai_service.aclose")
+
+    async def dispose(self):
+        self.calls.append("async_engine.dispose")
+
+
+@pytest.mark.parametrize("app_module", ["main", "api.main"])
+def test_shutdown_closes_the_openai_client_and_the_engine(monkeypatch, app_module):
+    module = importlib.import_module(app_module)
+    calls = []
+    monkeypatch.setattr(module, "openai_service", Closable(calls))
+    monkeypatch.setattr(module, "async_engine", Closable(calls))
+
+    async def serve():
+        async with module.app.router.lifespan_context(module.app):
+            assert calls == []
+
+    asyncio.run(serve())
+    assert calls == ["openai_service.aclose", "async_engine.dispose"]
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from llm_cache import CompletionCache
+
+
+class Upstream:
+    """Counts calls and answers after a short delay, optionally failing"""
+
+    def __init__(self, fail: bool = False):
+        self.calls = 0
+        self.fail = fail
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.02)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return {"success": True, "response": f"answer {self.calls}"}
+
+
+def test_identical_concurrent_requests_share_one_call():
+    async def run():
+        cache = CompletionCache(ttl_seconds=60)
+        upstream = Upstream()
+        key = cache.key({"messages": [{"role": "user", "content": "hello"}]}, "v1")
+        results = await asyncio.gather(*(cache.get_or_call(key, upstream) for _ in range(10)))
+        return cache, upstream, results
+    cache, upstream, results = asyncio.run(run())
+    assert upstream.calls == 1
+    assert {r["response"] for r in results} == {"answer 1"}
+    assert (cache.misses, cache.coalesced) == (1, 9)
+    assert cache.snapshot()["inflight"] == 0
+
+
+def test_answers_are_reused_until_the_data_version_changes():
+    async def run():
+        cache = CompletionCache(ttl_seconds=60)
+        upstream = Upstream()
+        payload = {"messages": [{"role": "user", "content": "hello  there"}]}
+        first = await cache.get_or_call(cache.key(payload, "v1"), upstream)
+        # Whitespace differences map to the same key
+        again = await cache.get_or_call(cache.key({"messages": [{"role": "user", "content": "hello there"}]}, "v1"), upstream)
+        fresh = await cache.get_or_call(cache.key(payload, "v2"), upstream)
+        return cache, first, again, fresh
+    cache, first, again, fresh = asyncio.run(run())
+    assert again is first
+    assert fresh["response"] == "answer 2"
+    assert cache.hits == 1
+
+
+def test_ttl_zero_only_coalesces():
+    async def run():
+        cache = CompletionCache(ttl_seconds=0)
+        upstream = Upstream()
+        key = cache.key({"q": 1}, "v1")
+        await asyncio.gather(cache.get_or_call(key, upstream), cache.get_or_call(key, upstream))
+        await cache.get_or_call(key, upstream)
+        return upstream
+    assert asyncio.run(run()).calls == 2
+
+
+def test_failures_reach_every_waiter_and_are_not_cached():
+    async def run():
+        cache = CompletionCache(ttl_seconds=60)
+        upstream = Upstream(fail=True)
+        key = cache.key({"q": 1}, "v1")
+        results = await asyncio.gather(*(cache.get_or_call(key, upstream) for _ in range(3)), return_exceptions=True)
+        with pytest.raises(RuntimeError):
+            await cache.get_or_call(key, upstream)
+        return upstream, results
+    upstream, results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert upstream.calls == 2
+
+
+def test_waiters_make_their_own_call_when_the_leader_is_cancelled():
+    async def run():
+        cache = CompletionCache(ttl_seconds=60)
+        upstream = Upstream()
+        key = cache.key({"q": 1}, "v1")
+        leader = asyncio.ensure_future(cache.get_or_call(key, upstream))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(cache.get_or_call(key, upstream))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower, upstream
+    result, upstream = asyncio.run(run())
+    assert result["success"]
+    assert upstream.calls == 2
@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+import pytest
+
+from chat_engine import ChatEngine, OPENAI_FAILURE_RESPONSE
+from llm_resilience import CircuitBreaker, CircuitOpenError, ResilientCaller
+from openai_service import AsyncOpenAIService
+from schemas import ChatMessage
+from session_store import MemorySessionStore
+
+
+class ProviderDown(Exception):
+    pass
+
+
+def test_breaker_opens_after_threshold_and_probes_after_recovery():
+    breaker = CircuitBreaker(failure_threshold=3, recovery_seconds=0.05)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Exactly one probe goes through
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.snapshot()["times_opened"] == 2
+
+
+def test_open_circuit_fails_fast_without_calling():
+    calls = []
+
+    async def call():
+        calls.append(1)
+        raise ProviderDown()
+
+    async def run():
+        caller = ResilientCaller(lambda e: isinstance(e, ProviderDown), hedge_enabled=False)
+        caller.breaker.failure_threshold = 2
+        for _ in range(2):
+            with pytest.raises(ProviderDown):
+                await caller.call(call)
+        with pytest.raises(CircuitOpenError):
+            await caller.call(call)
+        return caller
+    caller = asyncio.run(run())
+    assert len(calls) == 2
+    assert caller.breaker.rejected == 1
+
+
+def test_bad_requests_do_not_open_the_circuit():
+    async def call():
+        raise ValueError("bad request")
+
+    async def run():
+        caller = ResilientCaller(lambda e: isinstance(e, ProviderDown), hedge_enabled=False)
+        for _ in range(caller.breaker.failure_threshold + 1):
+            with pytest.raises(ValueError):
+                await caller.call(call)
+        return caller
+    assert asyncio.run(run()).breaker.state == CircuitBreaker.CLOSED
+
+
+class NoDataChanges:
+    """The parts of AsyncChatbotService a turn without tool calls uses"""
+
+    async def data_version_stamp(self) -> str:
+        return "v1"
+
+    async def release_connection(self):
+        pass
+
+
+def test_chat_answers_with_the_fallback_while_the_circuit_is_open():
+    async def run():
+        service = AsyncOpenAIService()
+        calls = []
+
+        async def create(**kwargs):
+            calls.append(kwargs)
+            raise AssertionError("the provider must not be called while the circuit is open")
+        service.client.chat.completions.create = create
+        for _ in range(service.resilience.breaker.failure_threshold):
+            service.resilience.breaker.record_failure()
+
+        engine = ChatEngine(service, MemorySessionStore(), "You are a clinic assistant.")
+        try:
+            started = time.monotonic()
+            response = await engine.run_turn(ChatMessage(message="hello", session_id="s1"), NoDataChanges())
+            elapsed = time.monotonic() - started
+            history = await engine.sessions.get("s1")
+        finally:
+            await service.aclose()
+        return service, calls, response, elapsed, history
+    service, calls, response, elapsed, history = asyncio.run(run())
+    assert response.response == OPENAI_FAILURE_RESPONSE
+    assert calls == []
+    assert service.resilience.breaker.rejected == 1
+    # No retry backoff once the circuit is open
+    assert elapsed < 0.5
+    assert history[-1] == {"role": "assistant", "content": OPENAI_FAILURE_RESPONSE}
@@ -0,0 +1,89 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+
+from migrations import MIGRATIONS, run_migrations
+from models import Base
+
+# The tables as the app created them before any migration existed
+BASELINE_SCHEMA = [
+    "CREATE TABLE doctors (id INTEGER PRIMARY KEY, name VARCHAR, specialty VARCHAR, department VARCHAR, "
+    "created_at DATETIME)",
+    "CREATE TABLE patients (id INTEGER PRIMARY KEY, name VARCHAR, phone VARCHAR, email VARCHAR, created_at DATETIME)",
+    "CREATE TABLE appointments (id INTEGER PRIMARY KEY, doctor_id INTEGER REFERENCES doctors (id), "
+    "patient_id INTEGER REFERENCES patients (id), appointment_date DATETIME, status VARCHAR, notes TEXT, "
+    "created_at DATETIME)",
+    "CREATE TABLE doctor_availability (id INTEGER PRIMARY KEY, doctor_id INTEGER REFERENCES doctors (id), "
+    "day_of_week INTEGER, start_time VARCHAR, end_time VARCHAR, is_available BOOLEAN)",
+]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """A database with the baseline schema and data, including a double booking"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as connection:
+        for statement in BASELINE_SCHEMA:
+            connection.exec_driver_sql(statement)
+        connection.exec_driver_sql("INSERT INTO doctors (id, name, specialty, department) "
+                                   "VALUES (1, 'Dr. Old Schema', 'Cardiology', 'Cardiology')")
+        connection.exec_driver_sql("INSERT INTO patients (id, name, phone) VALUES (1, 'Pat Old', '+910000000003')")
+        connection.exec_driver_sql(
+            "INSERT INTO doctor_availability (doctor_id, day_of_week, start_time, end_time, is_available) "
+            "VALUES (1, 0, '09:00', '17:30', 1), (1, 2, '14:15', '18:00', 1)"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO appointments (id, doctor_id, patient_id, appointment_date, status) VALUES "
+            # 10:00 and 10:05 fall in the same slot: a double booking the old code allowed
+            "(1, 1, 1, '2030-01-07 10:00:00.000000', 'scheduled'), "
+            "(2, 1, 1, '2030-01-07 10:05:00.000000', 'scheduled'), "
+            "(3, 1, 1, '2030-01-07 10:10:00.000000', 'cancelled'), "
+            "(4, 1, 1, '2030-01-07 11:20:00.000000', 'scheduled'), "
+            "(5, 1, 1, NULL, 'scheduled')"
+        )
+    # What create_tables() does on startup
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def test_baseline_database_is_migrated(engine):
+    assert run_migrations(engine) == [name for _, name, _ in MIGRATIONS]
+
+    with engine.connect() as connection:
+        minutes = connection.exec_driver_sql(
+            "SELECT start_minute, end_minute FROM doctor_availability ORDER BY id"
+        ).fetchall()
+        slots = dict(connection.exec_driver_sql("SELECT id, slot_start FROM appointments").fetchall())
+        indexes = {row[1] for row in connection.exec_driver_sql(
+            "SELECT type, name FROM sqlite_master WHERE type = 'index'"
+        )}
+        applied = [row[0] for row in connection.exec_driver_sql("SELECT version FROM schema_migrations ORDER BY 1")]
+
+    assert minutes == [(9 * 60, 17 * 60 + 30), (14 * 60 + 15, 18 * 60)]
+    assert slots == {
+        1: "2030-01-07 10:00:00.000000",
+        # The later half of the double booking keeps no slot, so the unique index could be built
+        2: None,
+        # Cancelled appointments don't compete for the slot
+        3: "2030-01-07 10:00:00.000000",
+        4: "2030-01-07 11:15:00.000000",
+        5: None,
+    }
+    assert {
+        "ix_appointments_doctor_date_status", "ix_appointments_date_status", "ix_appointments_patient_date",
+        "ix_doctor_availability_doctor_day", "ix_patients_phone", "ux_appointments_doctor_slot",
+    } <= indexes
+    assert applied == [version for version, _, _ in MIGRATIONS]
+
+
+def test_migrated_database_refuses_a_second_booking_and_reruns_are_no_ops(engine):
+    run_migrations(engine)
+    assert run_migrations(engine) == []
+
+    with pytest.raises(IntegrityError):
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                "INSERT INTO appointments (doctor_id, patient_id, appointment_date, slot_start, status) "
+                "VALUES (1, 1, '2030-01-07 11:25:00.000000', '2030-01-07 11:15:00.000000', 'scheduled')"
+            )
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, Doctor, DataVersion
+from name_index import DoctorNameIndex, scan_entries, scan_scores
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(DataVersion(name="directory", version=1))
+    session.commit()
+    yield session
+    session.close()
+
+
+def add_doctors(db, names):
+    db.add_all(Doctor(name=name, specialty="General Medicine") for name in names)
+    version = db.get(DataVersion, "directory")
+    version.version += 1
+    db.commit()
+
+
+def test_misspelt_names_resolve(db):
+    add_doctors(db, ["Dr. Rajesh Kumar", "Dr. Priya Sharma", "Dr. Anjali Gupta"])
+    index = DoctorNameIndex(refresh_seconds=0)
+    doctor_id, candidates = index.resolve(db, "Dr Rajesh Kumaar")
+    assert candidates[0]["name"] == "Dr. Rajesh Kumar"
+    assert doctor_id == candidates[0]["id"]
+    assert index.search(db, "Dr. Priya Sharma")[0]["score"] == 1.0
+    assert index.search(db, "Zzyzx Qwerty") == []
+
+
+def test_equally_good_matches_are_ambiguous(db):
+    add_doctors(db, ["Dr. Rajesh Kumar", "Dr. Sunil Kumar"])
+    doctor_id, candidates = DoctorNameIndex(refresh_seconds=0).resolve(db, "Dr. Kumar")
+    assert doctor_id is None
+    assert {c["name"] for c in candidates} == {"Dr. Rajesh Kumar", "Dr. Sunil Kumar"}
+
+
+def test_rankings_match_a_full_scan(db):
+    # Few syllables, so many names are near misses of each other
+    rnd = random.Random(3)
+    syllables = ["ra", "ja", "esh", "ku", "mar", "pri", "ya", "an", "ji", "li", "sun", "il", "de", "sai"]
+
+    def word():
+        return "".join(rnd.choice(syllables) for _ in range(rnd.randint(1, 3))).title()
+    names = [f"Dr. {word()} {word()}" + (f" {word()}" if rnd.random() < 0.3 else "") for _ in range(400)]
+    add_doctors(db, names)
+    index = DoctorNameIndex(refresh_seconds=0)
+    entries = scan_entries(db.query(Doctor.id, Doctor.name).all())
+
+    queries = rnd.sample(names, 40) + [word() for _ in range(40)] + [f"{word()} {word()}" for _ in range(40)]
+    queries += [name[:-1] for name in rnd.sample(names, 40)]
+    for query in queries:
+        expected = scan_scores(entries, query, index.min_score)
+        assert [(c["id"], c["score"]) for c in index.search(db, query)] == expected, query
+
+
+def test_directory_changes_are_picked_up(db):
+    add_doctors(db, ["Dr. Rajesh Kumar"])
+    index = DoctorNameIndex(refresh_seconds=0)
+    assert index.search(db, "Meera Iyer") == []
+    add_doctors(db, ["Dr. Meera Iyer"])
+    assert index.search(db, "Meera Iyer")[0]["name"] == "Dr. Meera Iyer"
+    assert index.snapshot()["doctors"] == 2
@@ -0,0 +1,84 @@
+import asyncio
+import importlib
+from datetime import datetime
+
+import httpx
+import pytest
+
+from database import SessionLocal, AsyncSessionLocal, create_tables
+from models import Doctor, Patient, Appointment
+from pagination import InvalidCursorError, encode_cursor
+from services import AsyncAppointmentService
+
+
+@pytest.fixture
+def appointments():
+    """A doctor's appointments, three without a date; their ids in listing order"""
+    create_tables()
+    db = SessionLocal()
+    try:
+        doctor = Doctor(name="Dr. Page Tester", specialty="Neurology", department="Neurology")
+        patient = Patient(name="Page Patient", phone="+910000000002")
+        db.add_all([doctor, patient])
+        db.flush()
+        dated = [Appointment(doctor_id=doctor.id, patient_id=patient.id, appointment_date=datetime(2030, 1, day, 10))
+                 for day in (3, 1, 2)]
+        undated = [Appointment(doctor_id=doctor.id, patient_id=patient.id, appointment_date=None) for _ in range(3)]
+        db.add_all(dated + undated)
+        db.commit()
+        ordered = [a.id for a in undated] + [a.id for a in sorted(dated, key=lambda a: a.appointment_date)]
+        yield doctor.id, ordered
+    finally:
+        db.close()
+
+
+async def _every_page(doctor_id: int, limit: int) -> list:
+    pages = []
+    cursor = None
+    async with AsyncSessionLocal() as db:
+        while True:
+            rows, cursor = await AsyncAppointmentService(db).list_appointments(doctor_id=doctor_id, cursor=cursor,
+                                                                                limit=limit)
+            pages.append([row.id for row in rows])
+            if cursor is None:
+                return pages
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 4, 10])
+def test_undated_appointments_are_listed_first_and_once(appointments, limit):
+    doctor_id, ordered = appointments
+    pages = asyncio.run(_every_page(doctor_id, limit))
+    assert [appointment_id for page in pages for appointment_id in page] == ordered
+    assert all(len(page) == limit for page in pages[:-1])
+
+
+def test_cursor_with_a_null_primary_key_is_refused(appointments):
+    doctor_id, _ = appointments
+
+    async def listed():
+        async with AsyncSessionLocal() as db:
+            return await AsyncAppointmentService(db).list_appointments(doctor_id=doctor_id,
+                                                                       cursor=encode_cursor([None, None]))
+
+    with pytest.raises(InvalidCursorError):
+        asyncio.run(listed())
+
+
+@pytest.mark.parametrize("app_module", ["main", "api.main"])
+def test_list_endpoints_follow_the_next_cursor(appointments, app_module):
+    doctor_id, ordered = appointments
+    app = importlib.import_module(app_module).app
+
+    async def every_page():
+        pages = []
+        params = {"doctor_id": doctor_id, "limit": 4}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            while True:
+                response = await client.get("/appointments/", params=params)
+                assert response.status_code == 200
+                pages.append([appointment["id"] for appointment in response.json()])
+                if "x-next-cursor" not in response.headers:
+                    return pages
+                params["cursor"] = response.headers["x-next-cursor"]
+
+    assert asyncio.run(every_page()) == [ordered[:4], ordered[4:]]
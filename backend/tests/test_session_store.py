@@ -0,0 +1,162 @@
+import asyncio
+import json
+
+import pytest
+
+import session_store
+from session_store import MemorySessionStore, SQLiteSessionStore, SessionBusyError, SessionLocks
+
+
+async def _turns(locks: SessionLocks, session_ids, log):
+    """Run one short turn per session ID, logging when each starts and ends"""
+    async def turn(n, session_id):
+        async with locks.hold(session_id):
+            log.append(("start", session_id, n))
+            await asyncio.sleep(0.02)
+            log.append(("end", session_id, n))
+    await asyncio.gather(*(turn(n, session_id) for n, session_id in enumerate(session_ids)))
+
+
+def _overlaps(log, session_id):
+    """Largest number of turns of one session that were running at once"""
+    running = peak = 0
+    for event, sid, _ in log:
+        if sid == session_id:
+            running += 1 if event == "start" else -1
+            peak = max(peak, running)
+    return peak
+
+
+def test_turns_of_one_session_run_one_at_a_time_in_arrival_order():
+    log = []
+    asyncio.run(_turns(SessionLocks(MemorySessionStore()), ["a"] * 5, log))
+    assert _overlaps(log, "a") == 1
+    assert [n for event, _, n in log if event == "start"] == [0, 1, 2, 3, 4]
+
+
+def test_different_sessions_run_concurrently():
+    log = []
+    asyncio.run(_turns(SessionLocks(), ["a", "b", "c"], log))
+    assert [event for event, _, _ in log[:3]] == ["start"] * 3
+
+
+def test_waiting_past_the_timeout_raises_busy():
+    async def run():
+        locks = SessionLocks(timeout=0.05)
+        async with locks.hold("a"):
+            with pytest.raises(SessionBusyError):
+                async with locks.hold("a"):
+                    pass
+        # The lock is usable again once released, and nothing is left behind
+        async with locks.hold("a"):
+            pass
+        assert len(locks) == 0
+    asyncio.run(run())
+
+
+def test_sqlite_lease_serializes_workers(tmp_path):
+    # Two stores on one file stand in for two worker processes
+    path = str(tmp_path / "sessions.db")
+    workers = [SessionLocks(SQLiteSessionStore(path)) for _ in range(2)]
+    log = []
+
+    async def run():
+        await asyncio.gather(_turns(workers[0], ["a"] * 3, log), _turns(workers[1], ["a"] * 3, log))
+    asyncio.run(run())
+    assert _overlaps(log, "a") == 1
+    assert len(log) == 12
+
+
+def test_sqlite_lease_times_out_and_expires(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    holder = SQLiteSessionStore(path, lease_seconds=0.3)
+    other = SQLiteSessionStore(path)
+
+    async def run():
+        lease = holder.lease("a", 1)
+        # Entered but never left, as when a worker dies mid-turn
+        await lease.__aenter__()
+        with pytest.raises(SessionBusyError):
+            async with other.lease("a", 0.1):
+                pass
+        async with other.lease("a", 1):
+            pass
+    asyncio.run(run())
+
+
+class FakeClock:
+    """Stands in for the time module in session_store, so TTLs pass without sleeping"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def _history(text: str):
+    return [{"role": "user", "content": text}]
+
+
+def test_memory_store_evicts_least_recently_used_past_max_sessions():
+    store = MemorySessionStore(max_sessions=3)
+
+    async def run():
+        for session_id in "abc":
+            await store.save(session_id, _history(session_id))
+        # Reading a session makes it the most recently used
+        await store.get("a")
+        await store.save("d", _history("d"))
+        return {session_id: await store.get(session_id) for session_id in "abcd"}
+    found = asyncio.run(run())
+    assert found["b"] is None
+    assert found["a"] == _history("a")
+    assert found["c"] is not None and found["d"] is not None
+    assert len(store) == 3
+
+
+def test_memory_store_keeps_total_bytes_under_the_cap():
+    one = len(json.dumps(_history("x" * 100)))
+    store = MemorySessionStore(max_bytes=2 * one)
+
+    async def run():
+        for session_id in "abc":
+            await store.save(session_id, _history("x" * 100))
+        return [await store.get(session_id) for session_id in "abc"]
+    assert [found is not None for found in asyncio.run(run())] == [False, True, True]
+    assert store.total_bytes == 2 * one
+
+
+def test_memory_store_keeps_an_oversized_newest_session():
+    store = MemorySessionStore(max_bytes=50)
+
+    async def run():
+        await store.save("small", _history("hi"))
+        await store.save("long", _history("x" * 500))
+        return await store.get("small"), await store.get("long")
+    small, long = asyncio.run(run())
+    assert small is None
+    assert long == _history("x" * 500)
+    assert len(store) == 1
+
+
+def test_memory_store_ttl_slides_with_each_access(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(session_store, "time", clock)
+    store = MemorySessionStore(ttl_seconds=10)
+
+    async def run():
+        await store.save("a", _history("a"))
+        await store.save("b", _history("b"))
+        clock.now += 8
+        assert await store.get("b") is not None
+        clock.now += 8
+        # a was last used 16 seconds ago, b 8 seconds ago
+        assert await store.get("a") is None
+        assert await store.get("b") is not None
+        clock.now += 11
+        # Expired entries are also dropped when another session is saved
+        await store.save("c", _history("c"))
+        assert len(store) == 1
+        assert store.total_bytes == len(json.dumps(_history("c")))
+    asyncio.run(run())
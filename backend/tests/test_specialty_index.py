@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, Doctor, DataVersion
+from specialty_index import SpecialtyIndex
+
+SPECIALTIES = ["Cardiology", "Dermatology", "ENT", "Orthopedics", "Pediatrics", "General Medicine"]
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all(Doctor(name=f"Dr. {specialty} One", specialty=specialty, department=specialty)
+                    for specialty in SPECIALTIES)
+    session.add(DataVersion(name="directory", version=1))
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.mark.parametrize("text, specialties", [
+    ("Cardiology", ["Cardiology"]),
+    ("cardiologist", ["Cardiology"]),
+    ("heart doctor", ["Cardiology"]),
+    ("skin doctor", ["Dermatology"]),
+    ("dermatologists", ["Dermatology"]),
+    ("ENT specialist", ["ENT"]),
+    ("ear nose and throat", ["ENT"]),
+    ("ortho", ["Orthopedics"]),
+    ("orthopaedic surgeon", ["Orthopedics"]),
+    ("paediatrician", ["Pediatrics"]),
+    ("kids", ["Pediatrics"]),
+    ("family doctor", ["General Medicine"]),
+    ("GP", ["General Medicine"]),
+    ("skin or heart", ["Dermatology", "Cardiology"]),
+    # Known words for specialties no doctor has, and unknown words
+    ("neurologist", []),
+    ("astrologer", []),
+])
+def test_free_text_resolves_to_canonical_specialties(db, text, specialties):
+    assert SpecialtyIndex(refresh_seconds=0).resolve(db, text) == specialties
+
+
+def test_doctor_ids_follow_directory_changes(db):
+    index = SpecialtyIndex(refresh_seconds=0)
+    assert index.doctor_ids(db, "brain doctor") == []
+    db.add(Doctor(name="Dr. Neuro One", specialty="Neurology", department="Neurology"))
+    db.get(DataVersion, "directory").version += 1
+    db.commit()
+    neurologist = db.query(Doctor.id).filter(Doctor.specialty == "Neurology").scalar()
+    assert index.doctor_ids(db, "brain doctor") == [neurologist]
+    assert index.rebuilds == 2
+
+
+def test_changes_wait_for_the_refresh_interval_unless_invalidated(db):
+    index = SpecialtyIndex(refresh_seconds=3600)
+    assert index.resolve(db, "neurology") == []
+    db.add(Doctor(name="Dr. Neuro One", specialty="Neurology", department="Neurology"))
+    db.get(DataVersion, "directory").version += 1
+    db.commit()
+    assert index.resolve(db, "neurology") == []
+    index.invalidate()
+    assert index.resolve(db, "neurology") == ["Neurology"]
@@ -0,0 +1,67 @@
+import threading
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from models import DataVersion
+
+
+class VersionedIndex:
+    """In-memory data built from tables whose data_versions rows it tracks.
+
+    Subclasses name those versions in VERSIONS, load the data for the ones
+    that changed in _load and swap it in under the lock in _install. Other
+    workers' writes are picked up by comparing versions at most every
+    ``refresh_seconds``; invalidate() forces a rebuild on next use.
+    """
+
+    VERSIONS: Tuple[str, ...] = ("directory",)
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        # Versions the loaded data reflects; None until loaded, or when it must be loaded again
+        self._versions: Dict[str, Optional[int]] = dict.fromkeys(self.VERSIONS)
+        self._checked_at = 0.0
+        # Bumped by invalidate() and by subclasses whenever loaded data may be
+        # stale, so a load that overlaps it is not trusted as current
+        self._generation = 0
+
+    def _load(self, db: Session, stale: Set[str]) -> Any:
+        """Data for the stale versions, built without touching shared state"""
+        raise NotImplementedError
+
+    def _install(self, loaded: Any, stale: Set[str]):
+        """Swap in what _load returned; called with the lock held"""
+        raise NotImplementedError
+
+    def _refresh(self, db: Session):
+        # Queries run outside the lock: under an AsyncSession they suspend the
+        # calling greenlet, and another one on this thread may need the lock
+        with self._lock:
+            if None not in self._versions.values() and time.monotonic() - self._checked_at < self.refresh_seconds:
+                return
+            generation, known = self._generation, dict(self._versions)
+        rows = db.query(DataVersion.name, DataVersion.version).filter(DataVersion.name.in_(self.VERSIONS)).all()
+        versions = {name: 0 for name in self.VERSIONS}
+        versions.update((name, version or 0) for name, version in rows)
+        stale = {name for name in self.VERSIONS if versions[name] != known[name]}
+        loaded = self._load(db, stale) if stale else None
+
+        with self._lock:
+            # After an invalidation in the meantime, use what was loaded but check again next time
+            current = self._generation == generation
+            self._checked_at = time.monotonic()
+            # Versions this process moved on itself in the meantime need nothing
+            stale = {name for name in stale if versions[name] != self._versions[name]}
+            if stale:
+                self._install(loaded, stale)
+                for name in stale:
+                    self._versions[name] = versions[name] if current else None
+
+    def invalidate(self):
+        """Rebuild everything on next use, e.g. after a directory change in this process"""
+        with self._lock:
+            self._versions = dict.fromkeys(self.VERSIONS)
+            self._generation += 1
@@ -24,6 +24,7 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ messages, setMessages })
   const [inputMessage, setInputMessage] = useState('')
   const [isLoading, setIsLoading] = useState(false)
   const [sessionId, setSessionId] = useState<string | undefined>()
+  const [statusText, setStatusText] = useState<string | undefined>()
   const messagesEndRef = useRef<HTMLDivElement>(null)
   const inputRef = useRef<HTMLInputElement>(null)
 
@@ -56,11 +57,46 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ messages, setMessages })
     setInputMessage('')
     setIsLoading(true)
 
+    const botMessageId = (Date.now() + 1).toString()
+    const updateBotMessage = (update: Partial<ChatMessage>) => {
+      setMessages(prev => prev.map(m => (m.id === botMessageId ? { ...m, ...update } : m)))
+    }
+    let streamedContent = ''
+    let bubbleShown = false
+
     try {
-      const response = await chatApi.sendMessage(inputMessage.trim(), sessionId)
-      
+      const response = await chatApi.streamMessage(inputMessage.trim(), sessionId, {
+        onToken: (content) => {
+          if (!bubbleShown) {
+            // First token replaces the typing indicator with the reply bubble
+            bubbleShown = true
+            setIsLoading(false)
+            setMessages(prev => [...prev, {
+              id: botMessageId,
+              content: '',
+              role: 'assistant',
+              timestamp: new Date(),
+              sessionId
+            }])
+          }
+          streamedContent += content
+          updateBotMessage({ content: streamedContent })
+        },
+        onReset: () => {
+          // The fallback reply in the final response replaces the partial text
+          streamedContent = ''
+          updateBotMessage({ content: '' })
+        },
+        onFunctionCalled: (name) => {
+          setStatusText(`Running ${name.replace(/_/g, ' ')}...`)
+        },
+        onFunctionResult: () => {
+          setStatusText('Preparing response...')
+        }
+      })
+
       const botMessage: ChatMessage = {
-        id: (Date.now() + 1).toString(),
+        id: botMessageId,
         content: response.response,
         role: 'assistant',
         timestamp: new Date(),
@@ -69,7 +105,11 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ messages, setMessages })
         functionResult: response.function_result
       }
 
-      setMessages(prev => [...prev, botMessage])
+      if (bubbleShown) {
+        updateBotMessage(botMessage)
+      } else {
+        setMessages(prev => [...prev, botMessage])
+      }
       setSessionId(response.session_id)
       
       if (response.function_called) {
@@ -80,6 +120,7 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ messages, setMessages })
       toast.error('Failed to send message. Please try again.')
     } finally {
       setIsLoading(false)
+      setStatusText(undefined)
     }
   }
 
@@ -239,6 +280,9 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ messages, setMessages })
                       <div></div>
                       <div></div>
                     </div>
+                    {statusText && (
+                      <p className="text-xs text-slate-600 mt-2">🔧 {statusText}</p>
+                    )}
                   </div>
                 </div>
               </motion.div>
@@ -1,5 +1,5 @@
 import axios from 'axios'
-import { ChatResponse, Doctor, Appointment, BookingFormData } from '../types'
+import { ChatResponse, ChatStreamHandlers, Doctor, Appointment, BookingFormData } from '../types'
 
 const API_BASE_URL = (import.meta as any).env?.VITE_API_URL || 'https://doctor-chatbot-api-5v9h.onrender.com'
 
@@ -35,6 +35,21 @@ api.interceptors.response.use(
   }
 )
 
+// List endpoints answer a page at a time; this is the largest page they serve
+const PAGE_SIZE = 1000
+
+// Every row of a list endpoint, following X-Next-Cursor until the last page
+const getAllPages = async <T>(url: string): Promise<T[]> => {
+  const items: T[] = []
+  let cursor: string | undefined
+  do {
+    const response = await api.get<T[]>(url, { params: { limit: PAGE_SIZE, cursor } })
+    items.push(...response.data)
+    cursor = (response.headers['x-next-cursor'] as string | undefined) || undefined
+  } while (cursor)
+  return items
+}
+
 export const chatApi = {
   sendMessage: async (message: string, sessionId?: string): Promise<ChatResponse> => {
     const response = await api.post('/chat', {
@@ -43,13 +58,83 @@ export const chatApi = {
     })
     return response.data
   },
+
+  // Streams the reply over Server-Sent Events and resolves with the final response
+  streamMessage: async (
+    message: string,
+    sessionId: string | undefined,
+    handlers: ChatStreamHandlers = {}
+  ): Promise<ChatResponse> => {
+    console.log('🚀 API Request: POST /chat/stream')
+    const response = await fetch(`${API_BASE_URL}/chat/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ message, session_id: sessionId }),
+    })
+    if (!response.ok || !response.body) {
+      throw new Error(`Chat stream failed with status ${response.status}`)
+    }
+
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+    let finalResponse: ChatResponse | undefined
+
+    while (true) {
+      const { value, done } = await reader.read()
+      if (done) break
+      buffer += decoder.decode(value, { stream: true })
+
+      // Events are separated by a blank line
+      let boundary = buffer.indexOf('\n\n')
+      while (boundary !== -1) {
+        const rawEvent = buffer.slice(0, boundary)
+        buffer = buffer.slice(boundary + 2)
+        boundary = buffer.indexOf('\n\n')
+
+        let eventName = 'message'
+        let data = ''
+        for (const line of rawEvent.split('\n')) {
+          if (line.startsWith('event: ')) eventName = line.slice(7)
+          else if (line.startsWith('data: ')) data += line.slice(6)
+        }
+        const payload = data ? JSON.parse(data) : {}
+
+        switch (eventName) {
+          case 'session':
+            handlers.onSession?.(payload.session_id)
+            break
+          case 'token':
+            handlers.onToken?.(payload.content)
+            break
+          case 'reset':
+            handlers.onReset?.()
+            break
+          case 'function_called':
+            handlers.onFunctionCalled?.(payload.name, payload.arguments)
+            break
+          case 'function_result':
+            handlers.onFunctionResult?.(payload.name, payload.result)
+            break
+          case 'done':
+            finalResponse = payload
+            break
+          case 'error':
+            throw new Error(payload.detail || 'Chat stream error')
+        }
+      }
+    }
+
+    if (!finalResponse) {
+      throw new Error('Chat stream ended without a response')
+    }
+    console.log('✅ API Response: 200 /chat/stream')
+    return finalResponse
+  },
 }
 
 export const doctorApi = {
-  getAll: async (): Promise<Doctor[]> => {
-    const response = await api.get('/doctors/')
-    return response.data
-  },
+  getAll: async (): Promise<Doctor[]> => getAllPages<Doctor>('/doctors/'),
   
   getBySpecialty: async (specialty: string): Promise<Doctor[]> => {
     const response = await api.get(`/doctors/specialty/${encodeURIComponent(specialty)}`)
@@ -63,10 +148,7 @@ export const doctorApi = {
 }
 
 export const appointmentApi = {
-  getAll: async (): Promise<Appointment[]> => {
-    const response = await api.get('/appointments/')
-    return response.data
-  },
+  getAll: async (): Promise<Appointment[]> => getAllPages<Appointment>('/appointments/'),
   
   book: async (bookingData: BookingFormData): Promise<Appointment> => {
     const response = await api.post('/appointments/', bookingData)
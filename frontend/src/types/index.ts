@@ -46,11 +46,27 @@ export interface Appointment {
   patient?: Patient
 }
 
+export interface ToolCallResult {
+  name: string
+  arguments: any
+  result: any
+}
+
 export interface ChatResponse {
   response: string
   session_id: string
   function_called?: string
   function_result?: any
+  tool_calls?: ToolCallResult[]
+}
+
+export interface ChatStreamHandlers {
+  onSession?: (sessionId: string) => void
+  onToken?: (content: string) => void
+  // The tokens streamed so far belong to a failed completion and should be dropped
+  onReset?: () => void
+  onFunctionCalled?: (name: string, args: any) => void
+  onFunctionResult?: (name: string, result: any) => void
 }
 
 export interface ApiResponse<T> {